@@ -0,0 +1,226 @@
+"""In-process agents for Python bots.
+
+A Python bot can be run inside the emulator process instead of as a
+subprocess, skipping pipe I/O, process startup and line buffering. Bots are
+addressed as ``module:attr`` where module is an importable dotted path or a
+``.py`` file path, e.g. ``bots.lander:Bot`` or ``bots/lander.py:Bot``.
+
+The attribute is either:
+
+- a class, instantiated once per game (and per player). It must define
+  ``turn(lines) -> lines`` and may define ``init(lines)`` which receives
+  the initialization lines before the first turn.
+- a plain function ``turn(lines) -> lines``; on the first call it receives
+  the initialization lines followed by the first turn's lines. Its module
+  is loaded afresh per game and player, so module-level state is not
+  shared between players.
+
+Input lines are exactly what ``format_init_input``/``format_turn_input``
+produce, without newlines. The return value is a list of action lines (or a
+single string, split on newlines), one per action the model expects; fewer
+lines raise InvalidOutput when the runner asks for the next action.
+
+A class with ``structured = True`` skips text input entirely: it gets
+``init(env, player_id)`` and ``turn(state, player_id)`` with the model's own
+Environment and State objects, and still returns action lines.
+"""
+import importlib
+import importlib.util
+import inspect
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class InvalidOutput(ValueError):
+    """An in-process bot returned fewer action lines than the turn needs."""
+
+
+def load_bot(spec: str, fresh: bool = False) -> Any:
+    """Resolve 'module:attr' (or 'path/to/file.py:attr') to the bot object.
+
+    With fresh, the module is executed again as a new module object, so the
+    bot gets its own module-level state.
+    """
+    module_name, sep, attr = spec.rpartition(":")
+    if not sep or not module_name or not attr:
+        raise ValueError(f"Invalid agent module '{spec}', expected module:attr")
+
+    if module_name.endswith(".py") or os.sep in module_name:
+        path = os.path.abspath(module_name)
+        name = os.path.splitext(os.path.basename(path))[0]
+        module_spec = importlib.util.spec_from_file_location(name, path)
+        if module_spec is None:
+            raise ImportError(f"Cannot load agent module from {module_name}")
+    elif fresh:
+        module_spec = importlib.util.find_spec(module_name)
+        if module_spec is None:
+            raise ImportError(f"No module named '{module_name}'")
+    else:
+        module_spec = None
+        module = importlib.import_module(module_name)
+
+    if module_spec is not None:
+        module = importlib.util.module_from_spec(module_spec)
+        previous = sys.modules.get(module_spec.name)
+        sys.modules[module_spec.name] = module  # Visible while it runs, as for a normal import
+        try:
+            module_spec.loader.exec_module(module)
+        finally:
+            if previous is not None:
+                sys.modules[module_spec.name] = previous  # A loaded module of the same name wins
+
+    try:
+        obj = module
+        for part in attr.split("."):
+            obj = getattr(obj, part)
+    except AttributeError:
+        raise ImportError(f"Module '{module_name}' has no attribute '{attr}'")
+    if not callable(obj):
+        raise TypeError(f"Agent '{spec}' is not a class or function")
+    return obj
+
+
+class InProcessAgent:
+    """Drives a Python bot with the same protocol as a subprocess agent.
+
+    The bot runs synchronously, so the turn timeout cannot interrupt it: a
+    turn that overruns is reported as a timeout once the bot returns.
+
+    An exception raised by the bot ends it like a crashed subprocess: the
+    traceback goes to its stderr log and it gives no more output.
+    """
+
+    def __init__(self, bot: Any, player_id: int = 0):
+        from runner import StderrLog  # runner imports this module
+
+        self.player_id = player_id
+        self.stderr = StderrLog(f"P{player_id}")
+        self.is_class = inspect.isclass(bot)
+        self.pending_input: List[str] = []
+        self.pending_output: deque = deque()
+        self.state = None
+        self.finished = False
+        self.called = False  # Bot already ran for the current turn
+        self.bot = self._guard(bot) if self.is_class else bot
+        self.structured = self.is_class and getattr(self.bot, "structured", False)
+
+    def _guard(self, func: Callable, *args) -> Any:
+        """Call into the bot; an exception is logged and ends the bot."""
+        try:
+            return func(*args)
+        except Exception as e:
+            for chunk in traceback.format_exception(type(e), e, e.__traceback__.tb_next):  # Without this frame
+                for line in chunk.rstrip("\n").split("\n"):
+                    self.stderr.add(line)
+            self.finished = True
+            return None
+
+    def start(self, init_lines: List[str], env: Any) -> None:
+        if self.finished:
+            return
+        init = getattr(self.bot, "init", None) if self.is_class else None
+        if self.structured:
+            if init is not None:
+                self._guard(init, env, self.player_id)
+        elif init is not None:
+            self._guard(init, list(init_lines))
+        else:
+            self.pending_input.extend(init_lines)
+
+    def send_turn(self, turn_input: str, state: Any) -> None:
+        self.state = state
+        self.called = False
+        self.stderr.turn += 1
+        if turn_input and not self.structured:
+            self.pending_input.extend(turn_input.split("\n"))
+
+    def _call(self) -> Any:
+        self.called = True
+        if self.structured:
+            return self._guard(self.bot.turn, self.state, self.player_id)
+        lines, self.pending_input = self.pending_input, []
+        turn = self.bot.turn if self.is_class else self.bot
+        return self._guard(turn, lines)
+
+    def _collect(self, output: Any) -> None:
+        if output is None:
+            return
+        if isinstance(output, str):
+            output = output.split("\n")
+        self.pending_output.extend(str(line) for line in output)
+
+    def readline(self, timeout_ms: int) -> Optional[str]:
+        """Next action line, '' when the bot gave nothing (EOF), None on timeout.
+
+        Raises InvalidOutput when the bot already answered this turn with
+        fewer lines than are being read.
+        """
+        if self.pending_output:
+            return self.pending_output.popleft() + "\n"
+        if self.finished:
+            return ""
+        if self.called:
+            raise InvalidOutput("bot returned fewer action lines than the turn needs")
+        start = time.perf_counter()
+        self._collect(self._call())
+        if self.finished:
+            return ""  # The bot raised
+        if (time.perf_counter() - start) * 1000 > timeout_ms:
+            self.pending_output.clear()
+            return None
+        if not self.pending_output:
+            return ""
+        return self.pending_output.popleft() + "\n"
+
+    def read_all(self, timeout_ms: int) -> Tuple[str, bool]:
+        """Run the bot once on all pending input and return its whole answer."""
+        if self.finished:
+            return "", True
+        start = time.perf_counter()
+        self._collect(self._call())
+        self.finished = True
+        text = "\n".join(self.pending_output)
+        self.pending_output.clear()
+        return text, (time.perf_counter() - start) * 1000 <= timeout_ms
+
+    def close(self) -> None:
+        close = getattr(self.bot, "close", None) if self.is_class else None
+        if close is not None:
+            self._guard(close)
+
+
+class ModuleAgent:
+    """Picklable factory for in-process agents, given a 'module:attr' spec.
+
+    The module is imported lazily on first use, so factories can be sent to
+    worker processes. Call it with a player id to get a fresh InProcessAgent;
+    function bots come from a fresh copy of their module each time.
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        self._bot: Optional[Callable] = None
+
+    def __call__(self, player_id: int = 0) -> InProcessAgent:
+        if self._bot is None:
+            self._bot = load_bot(self.spec)
+        if inspect.isclass(self._bot):
+            return InProcessAgent(self._bot, player_id)
+        return InProcessAgent(load_bot(self.spec, fresh=True), player_id)
+
+    def __getstate__(self):
+        return {"spec": self.spec, "_bot": None}
+
+    def __str__(self) -> str:
+        return self.spec
+
+
+def load_agent(spec: str) -> ModuleAgent:
+    """Check that spec resolves to a bot and return an agent factory for it."""
+    agent = ModuleAgent(spec)
+    agent._bot = load_bot(spec)
+    return agent
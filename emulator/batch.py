@@ -0,0 +1,185 @@
+"""Run one agent over many test cases in parallel and summarize the results.
+
+Used for robustness sweeps over generated test cases (e.g. thousands of
+gen:<seed> Mars Lander terrains): reports the success rate, the most common
+failure reasons and, for models with a score hook, score statistics and a
+per-test-case leaderboard table.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import models
+import runner
+from result_cache import ResultCache
+
+# One model instance per worker process, reused across test cases
+_worker_models: Dict[str, models.GameModel] = {}
+
+# Numbers in failure reasons vary per game; strip them to group reasons
+REASON_DETAILS = re.compile(r"\s*\(.*\)|-?\d+")
+
+
+def run_case(job: tuple) -> dict:
+    """Run one test case in a worker. Returns a result record.
+
+    Failed cases keep the agent's last stderr lines.
+    """
+    model_name, program, test_name, max_turns, turn_timeout_ms = job
+
+    model = _worker_models.get(model_name)
+    if model is None:
+        model = _worker_models[model_name] = models.get_model(model_name)
+
+    stderr_tail = {}
+    try:
+        env, initial_state = model.load_test_case(test_name)
+        result, trajectory, turns = runner.run_program(
+            model, program, test_name, max_turns=max_turns, turn_timeout_ms=turn_timeout_ms,
+            stderr_tail=stderr_tail, test_case=(env, initial_state)
+        )
+    except (ValueError, OSError) as e:  # Unknown test case, or the agent could not be started
+        return {"test": test_name, "result": f"error: {e}", "turns": 0, "final": None, "score": None,
+                "stderr": []}
+    return {
+        "test": test_name,
+        "result": result,
+        "turns": turns,
+        "final": trajectory[-1],
+        "score": model.score(env, trajectory[-1], result),
+        "stderr": stderr_tail.get(0, []) if result != 'success' else [],
+    }
+
+
+def run_batch(
+    model_name: str,
+    program: runner.Program,
+    test_names: List[str],
+    workers: Optional[int] = None,
+    max_turns: int = 500,
+    turn_timeout_ms: int = 150,
+    progress: bool = False,
+    cache: Optional[ResultCache] = None
+) -> List[dict]:
+    """Run the agent on every test case in parallel worker processes, in order.
+
+    With a cache, stored results are reused and the games actually played
+    are stored, except timeouts (they depend on machine load) and errors.
+    """
+    results: Dict[str, dict] = {}
+    keys: Dict[str, str] = {}
+    if cache is not None:
+        model = models.get_model(model_name)
+        for name in test_names:
+            keys[name] = cache.key(model, program, name, max_turns, turn_timeout_ms)
+            record = cache.get(keys[name])
+            if record is not None:
+                results[name] = record
+    jobs = [(model_name, program, name, max_turns, turn_timeout_ms) for name in test_names if name not in results]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or not jobs:
+        outcomes = map(run_case, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=runner.configure,
+                                       initargs=runner.worker_config())
+        outcomes = executor.map(run_case, jobs, chunksize=max(1, len(jobs) // (workers * 8)))
+
+    try:
+        for i, outcome in enumerate(outcomes, 1):
+            results[outcome["test"]] = outcome
+            if cache is not None and not outcome["result"].startswith(('timeout', 'error')):
+                cache.put(keys[outcome["test"]], outcome)
+            if progress and (i % 10 == 0 or i == len(jobs)):
+                print(f"  {i}/{len(jobs)} test cases", end='\r', flush=True)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if progress and jobs:
+        print()
+    return [results[name] for name in test_names]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def distribution(values: List[float]) -> dict:
+    """Mean and percentiles of values."""
+    values = sorted(values)
+    return {
+        "mean": sum(values) / len(values),
+        "p10": percentile(values, 0.1),
+        "median": percentile(values, 0.5),
+        "p90": percentile(values, 0.9),
+    }
+
+
+def summarize(results: List[dict]) -> dict:
+    """Success rate, grouped failure reasons and, if the model scores games, score statistics.
+
+    The total score is taken over all test cases, the score distribution
+    and other metrics (landing speeds, fuel left, ...) over successful ones.
+    """
+    successes = [r for r in results if r["result"] == 'success']
+    reasons: Dict[str, int] = {}
+    for r in results:
+        if r["result"] != 'success':
+            reason = ' '.join(REASON_DETAILS.sub('', r["result"]).split())
+            reasons[reason] = reasons.get(reason, 0) + 1
+
+    summary: Dict[str, Any] = {
+        "cases": len(results),
+        "successes": len(successes),
+        "success_rate": len(successes) / len(results) if results else 0.0,
+        "failure_reasons": sorted(reasons.items(), key=lambda item: -item[1]),
+    }
+    if successes:
+        turns = sorted(r["turns"] for r in successes)
+        summary["turns"] = {"mean": sum(turns) / len(turns), "median": percentile(turns, 0.5), "max": turns[-1]}
+
+    scored = [r for r in results if r["score"]]
+    if scored:
+        summary["total_score"] = sum(r["score"]["score"] for r in scored)
+        scored_successes = [r for r in scored if r["result"] == 'success']
+        summary["scores"] = sorted(r["score"]["score"] for r in scored_successes)
+        if scored_successes:
+            summary["metrics"] = {name: distribution([r["score"][name] for r in scored_successes])
+                                  for name in scored_successes[0]["score"] if name != "score"}
+    return summary
+
+
+def format_histogram(values: List[float], bins: int = 10, width: int = 40) -> List[str]:
+    """Text histogram of values, one line per bin."""
+    if not values:
+        return []
+    lo, hi = min(values), max(values)
+    step = (hi - lo) / bins or 1
+    counts = [0] * bins
+    for v in values:
+        counts[min(bins - 1, int((v - lo) / step))] += 1
+    peak = max(counts)
+    return [f"{lo + i * step:8.0f} - {lo + (i + 1) * step:<8.0f} {'#' * (count * width // peak):<{width}} {count}"
+            for i, count in enumerate(counts)]
+
+
+def format_scores(results: List[dict]) -> List[str]:
+    """Leaderboard-style table: one row per test case with its score and metrics, then the total."""
+    scored = [r for r in results if r["score"]]
+    if not scored:
+        return []
+    names = list(scored[0]["score"])
+    width = max(len("test"), max(len(r["test"]) for r in results))
+    lines = [f"{'test':<{width}}  {'turns':>5}  " + "  ".join(f"{name:>8}" for name in names) + "  result"]
+    for r in results:
+        if r["score"]:
+            cells = "  ".join(f"{r['score'][name]:8.0f}" for name in names)
+        else:
+            cells = "  ".join(f"{'-':>8}" for _ in names)
+        lines.append(f"{r['test']:<{width}}  {r['turns']:5}  {cells}  {r['result']}")
+    total = sum(r["score"]["score"] for r in scored)
+    lines.append(f"{'TOTAL':<{width}}  {'':5}  {total:8.0f}")
+    return lines
@@ -0,0 +1,58 @@
+"""Benchmark state copying per model: clone_state, snapshot, restore.
+
+Times each operation on the initial state of every test case of every model
+and reports the mean cost per call next to copy.deepcopy as a reference.
+
+Usage (from the emulator directory):
+    python benchmarks/clone_state.py [--model NAME] [--number N]
+"""
+import argparse
+import copy
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import models  # noqa: E402
+
+
+def bench(func, number: int) -> float:
+    """Best-of-3 mean time per call in microseconds."""
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def bench_model(name: str, number: int):
+    model = models.get_model(name)
+    rows = []
+    for test_name in model.get_test_cases():
+        try:
+            _, state = model.load_test_case(test_name)
+        except ValueError:
+            continue  # e.g. test cases with unknown data
+        snap = model.snapshot(state)
+        rows.append((
+            test_name,
+            bench(lambda: model.clone_state(state), number),
+            bench(lambda: model.snapshot(state), number),
+            bench(lambda: model.restore(snap), number),
+            bench(lambda: copy.deepcopy(state), max(1, number // 10)),
+        ))
+        model.restore(snap)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark model state copying')
+    parser.add_argument('--model', '-m', action='append', help='Model to benchmark (default: all)')
+    parser.add_argument('--number', '-n', type=int, default=2000, help='Calls per timing run')
+    args = parser.parse_args()
+
+    print(f"{'model':<26} {'test case':<30} {'clone':>9} {'snapshot':>9} {'restore':>9} {'deepcopy':>9}  (us/call)")
+    for name in args.model or models.list_models():
+        for test_name, clone, snap, restore, deep in bench_model(name, args.number):
+            print(f"{name:<26} {test_name:<30} {clone:9.2f} {snap:9.2f} {restore:9.2f} {deep:9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Check and time Shadows of the Knight 2 warmer/colder evaluation.
+
+Classifies random (prev, curr, bomb) triples in a large building, plus
+equidistant ones that must come out SAME, with get_directions and with
+get_direction per triple. Exits with status 1 if the two disagree on any
+triple, then reports the time per triple of each.
+
+Usage (from the emulator directory):
+    python benchmarks/directions.py [--count N] [--size S] [--seed SEED]
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.shadows_of_the_knight_2 import get_direction, get_directions  # noqa: E402
+
+
+def make_triples(count: int, size: int, seed: int):
+    """(prev_x, prev_y, curr_x, curr_y, bomb_x, bomb_y) columns; every fourth triple is a tie."""
+    rng = random.Random(seed)
+    columns = ([], [], [], [], [], [])
+    for i in range(count):
+        bx, by = rng.randrange(size), rng.randrange(size)
+        px, py = rng.randrange(size), rng.randrange(size)
+        if i % 4 == 0:
+            cx, cy = 2 * bx - px, 2 * by - py  # Mirror of prev through the bomb
+        else:
+            cx, cy = rng.randrange(size), rng.randrange(size)
+        for column, value in zip(columns, (px, py, cx, cy, bx, by)):
+            column.append(value)
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time batch warmer/colder evaluation')
+    parser.add_argument('--count', '-n', type=int, default=100000, help='Triples to classify')
+    parser.add_argument('--size', type=int, default=10000, help='Building width and height')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    columns = make_triples(args.count, args.size, args.seed)
+    batch = get_directions(*columns)
+    scalar = [get_direction(*triple) for triple in zip(*columns)]
+    mismatches = [i for i, (a, b) in enumerate(zip(batch, scalar)) if a != b]
+    if mismatches:
+        i = mismatches[0]
+        print(f"MISMATCH on {len(mismatches)} triples, first {tuple(c[i] for c in columns)}: "
+              f"batch {batch[i]}, scalar {scalar[i]}")
+        sys.exit(1)
+
+    batch_time = min(timeit.repeat(lambda: get_directions(*columns), number=1, repeat=3))
+    scalar_time = min(timeit.repeat(lambda: [get_direction(*t) for t in zip(*columns)], number=1, repeat=3))
+    print(f"{args.count} triples agree ({batch.count('SAME')} SAME)")
+    print(f"get_directions: {batch_time / args.count * 1e9:8.1f} ns/triple")
+    print(f"get_direction:  {scalar_time / args.count * 1e9:8.1f} ns/triple")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark memory held by a Cellularena game trajectory.
+
+Plays a 100-turn game between two seeded random growers on a generated map
+and keeps every state, as the runner does with its trajectory, then reports
+the bytes held per state (tracemalloc) and the deep size of the final state
+and of a single entity.
+
+Usage (from the emulator directory):
+    python benchmarks/state_memory.py [--test gen:30x15:1] [--seed 1] [--proteins 50]
+"""
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import models  # noqa: E402
+from match import Match  # noqa: E402
+from profiling import deep_size  # noqa: E402
+from models.cellularena import Control, ORGAN_TYPES  # noqa: E402
+
+NEIGHBORS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# Organ types a grower picks from, with their protein costs
+COSTS = {"BASIC": "A", "HARVESTER": "CD", "TENTACLE": "BC", "SPORER": "BD"}
+
+
+def random_controls(state, env, rng: random.Random) -> list:
+    """One GROW per player from a random organ to a free neighbor cell, or WAIT."""
+    occupied = {(e.x, e.y): e for e in state.entities}
+    controls = []
+    for pid in range(env.num_players):
+        affordable = [t for t, cost in COSTS.items() if all(state.proteins[pid][p] > 0 for p in cost)]
+        moves = []
+        for e in state.entities:
+            if e.owner != pid or e.type not in ORGAN_TYPES:
+                continue
+            for dx, dy in NEIGHBORS:
+                x, y = e.x + dx, e.y + dy
+                target = occupied.get((x, y))
+                if 0 <= x < env.width and 0 <= y < env.height and (target is None or target.owner == -1
+                                                                   and target.type != "WALL"):
+                    moves.append((e.organ_id, x, y))
+        if affordable and moves:
+            organ_id, x, y = rng.choice(moves)
+            controls.append(Control(pid, "GROW", organ_id, x, y, rng.choice(affordable),
+                                    rng.choice("NESW")))
+        else:
+            controls.append(Control(pid, "WAIT"))
+    return controls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark memory held by a Cellularena trajectory')
+    parser.add_argument('--test', default='gen:30x15:1', help='Test case (default: gen:30x15:1)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the random growers')
+    parser.add_argument('--proteins', type=int, default=50, help='Starting proteins of each type')
+    args = parser.parse_args()
+
+    model = models.get_model("cellularena")
+    match = Match(model, args.test)
+    state = match.state
+    for pid in state.proteins:
+        state.proteins[pid] = {p: args.proteins for p in state.proteins[pid]}
+    rng = random.Random(args.seed)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    trajectory = [state]
+    while not match.done:
+        match.step(random_controls(match.state, match.env, rng))
+        trajectory.append(match.state)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    final = trajectory[-1]
+    print(f"Test case: {args.test}, {len(trajectory) - 1} turns ({match.result.status})")
+    print(f"Entities in final state: {len(final.entities)}")
+    print(f"Trajectory held: {held / 1024:.1f} KiB, {held / len(trajectory):.0f} bytes/state")
+    print(f"Final state deep size: {deep_size(final, set())} bytes")
+    print(f"Entity deep size: {deep_size(final.entities[-1], set())} bytes")
+
+
+if __name__ == '__main__':
+    main()
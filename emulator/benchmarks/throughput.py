@@ -0,0 +1,266 @@
+"""Simulation throughput benchmarks with regression gates.
+
+Measures, per registered model:
+- simulate: turns per second of model steps in games played back to back
+  on every test case (plus a few generated ones) with seeded random
+  controls;
+- construct: model construction time (test case loading included), per
+  construction over batches of them;
+- replay: trace states replayed per second, for models with traces;
+and for the runner, the per-turn overhead of run_program over bare
+simulate with a trivial echo agent, both in-process and as a subprocess.
+
+Metrics ending in ``per_sec`` are better when higher, all others (times)
+when lower. With --baseline, a metric that got worse by more than
+--threshold (a fraction) fails the run with exit code 1.
+
+Usage (from the emulator directory):
+    python benchmarks/throughput.py [--model NAME] [--seconds S] [--out FILE]
+    python benchmarks/throughput.py --baseline baseline.json [--threshold 0.2]
+"""
+import argparse
+import functools
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import agents  # noqa: E402
+import models  # noqa: E402
+import runner  # noqa: E402
+from match import Match  # noqa: E402
+from state_memory import random_controls  # noqa: E402
+
+# Generated test cases played on top of the recorded ones
+GENERATED = {
+    "mars_lander": ["gen:1", "gen:2", "gen:3"],
+    "there_is_no_spoon": ["gen:20x20:1"],
+    "cellularena": ["gen:1", "gen:30x15:2"],
+}
+
+# Trivial agent for the runner overhead: skips the Mars Lander surface,
+# then answers every turn with the same command
+ECHO_COMMAND = "0 3"
+ECHO_SOURCE = f"""
+import sys
+for _ in range(int(sys.stdin.readline())):
+    sys.stdin.readline()
+while sys.stdin.readline():
+    print({ECHO_COMMAND!r}, flush=True)
+"""
+ECHO_TEST_CASE = "test_case_01"
+
+
+def echo_bot(lines: List[str]) -> str:
+    return ECHO_COMMAND
+
+
+# Per model: (model, match, rng) -> controls for the next turn
+def _mars_policy(model, match, rng):
+    return model.parse_output(f"{rng.randrange(-45, 46)} {rng.randrange(5)}")
+
+
+def _position_policy(model, match, rng):
+    return model.parse_output(f"{rng.randrange(match.env.width)} {rng.randrange(match.env.height)}")
+
+
+def _fall_policy(model, match, rng):
+    return model.parse_output("WAIT")
+
+
+_solutions: Dict[int, list] = {}  # Reference solutions by id(env)
+
+
+def _spoon_policy(model, match, rng):
+    solution = _solutions.get(id(match.env))
+    if solution is None:
+        solution = _solutions[id(match.env)] = model.solve(match.env) or []
+    if not solution:
+        return model.parse_output("0 0 0 0 1")  # Fails the puzzle, ending the game
+    return model.parse_output(" ".join(map(str, solution[match.turn % len(solution)])))
+
+
+def _cellularena_policy(model, match, rng):
+    return random_controls(match.state, match.env, rng)
+
+
+POLICIES: Dict[str, Callable] = {
+    "mars_lander": _mars_policy,
+    "shadows_of_the_knight_1": _position_policy,
+    "shadows_of_the_knight_2": _position_policy,
+    "the_fall": _fall_policy,
+    "there_is_no_spoon": _spoon_policy,
+    "cellularena": _cellularena_policy,
+}
+
+
+def play_for(model, test_names: List[str], policy: Callable, seconds: float) -> float:
+    """Turns per second of games played back to back, cycling through test cases.
+
+    Only steps are timed, not the policy. Each test case is played once
+    untimed first, to warm up caches.
+    """
+    rng = random.Random(0)
+    matches = [Match(model, name, max_turns=200) for name in test_names]
+    for match in matches:
+        match.run(lambda m: policy(model, m, rng))
+    turns = 0
+    elapsed = 0.0
+    while elapsed < seconds:
+        for match in matches:
+            match.reset()
+            while not match.done:
+                controls = policy(model, match, rng)
+                start = time.perf_counter()
+                match.step(controls)
+                elapsed += time.perf_counter() - start
+            turns += match.turn
+    return turns / elapsed
+
+
+def bench_simulate(name: str, seconds: float) -> Optional[float]:
+    policy = POLICIES.get(name)
+    if policy is None:
+        return None
+    model = models.get_model(name)
+    test_names = list(model.get_test_cases()) + GENERATED.get(name, [])
+    return play_for(model, test_names, policy, seconds)
+
+
+def bench_construct(name: str, seconds: float) -> float:
+    """Construction time in milliseconds, per construction.
+
+    Constructions take well under a millisecond, so each sample times a
+    batch of them (sized to last about a tenth of the budget) and the best
+    of five samples is reported; single timings are mostly noise.
+    """
+    batch = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(batch):
+            models.get_model(name)
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds / 10 or batch >= 1 << 16:
+            break
+        batch *= 2
+    best = elapsed / batch
+    for _ in range(4):
+        start = time.perf_counter()
+        for _ in range(batch):
+            models.get_model(name)
+        best = min(best, (time.perf_counter() - start) / batch)
+    return best * 1000
+
+
+def bench_replay(name: str, seconds: float) -> Optional[float]:
+    model = models.get_model(name)
+    traces = [(trace_name, model.load_trace(trace_name)) for trace_name in model.list_traces()]
+    if not traces:
+        return None
+    states = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for trace_name, trace in traces:
+            _, trajectory, _ = runner.replay_trace(model, trace_name, trace)
+            states += len(trajectory)
+    return states / (time.perf_counter() - start)
+
+
+def bench_runner(program: runner.Program, seconds: float) -> float:
+    """Microseconds per turn that run_program adds on top of simulate."""
+    model = models.get_model("mars_lander")
+    control = model.parse_output(ECHO_COMMAND)
+    match = Match(model, ECHO_TEST_CASE)
+
+    turns = 0
+    runner_time = 0.0
+    while runner_time < seconds:
+        start = time.perf_counter()
+        _, _, used = runner.run_program(model, program, ECHO_TEST_CASE, turn_timeout_ms=5000)
+        runner_time += time.perf_counter() - start
+        turns += used
+
+    simulate_time = 0.0
+    simulate_turns = 0
+    while simulate_turns < turns:
+        match.reset()
+        start = time.perf_counter()
+        while not match.done:
+            match.step(control)
+        simulate_time += time.perf_counter() - start
+        simulate_turns += match.turn
+    return (runner_time / turns - simulate_time / simulate_turns) * 1e6
+
+
+def run_benchmarks(model_names: List[str], seconds: float, progress: bool = False) -> Dict[str, float]:
+    metrics = {}
+
+    def record(key: str, value: Optional[float]):
+        if value is not None:
+            metrics[key] = round(value, 3)
+            if progress:
+                print(f"  {key:<50} {value:12.2f}")
+
+    for name in model_names:
+        record(f"simulate.{name}.turns_per_sec", bench_simulate(name, seconds))
+        record(f"construct.{name}.ms", bench_construct(name, seconds))
+        record(f"replay.{name}.states_per_sec", bench_replay(name, seconds))
+    if "mars_lander" in model_names:
+        record("runner.inprocess.overhead_us_per_turn",
+               bench_runner(functools.partial(agents.InProcessAgent, echo_bot), seconds))
+        record("runner.subprocess.overhead_us_per_turn",
+               bench_runner([sys.executable, "-c", ECHO_SOURCE], seconds))
+    return metrics
+
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Descriptions of metrics that got worse than the baseline by more than threshold."""
+    regressions = []
+    for key, old in baseline.items():
+        new = metrics.get(key)
+        if new is None or old == 0:
+            continue
+        change = (new - old) / abs(old)
+        worse = -change if key.endswith("per_sec") else change
+        if worse > threshold:
+            regressions.append(f"{key}: {old:.2f} -> {new:.2f} ({worse:+.0%} worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark simulation and runner throughput')
+    parser.add_argument('--model', '-m', action='append', help='Model to benchmark (default: all)')
+    parser.add_argument('--seconds', '-s', type=float, default=0.5, help='Time budget per measurement')
+    parser.add_argument('--out', '-o', help='Write results as JSON (usable as a baseline)')
+    parser.add_argument('--baseline', '-b', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative regression against the baseline (default: 0.2)')
+    args = parser.parse_args()
+
+    model_names = args.model or list(models.list_models())
+    metrics = run_benchmarks(model_names, args.seconds, progress=True)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({"python": platform.python_version(), "metrics": metrics}, f, indent=1)
+        print(f"\nResults written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)["metrics"]
+        regressions = compare(metrics, baseline, args.threshold)
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+        for line in regressions:
+            print(f"  REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("  no regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Build cache for C++ solutions (--test main.cpp, --agents a.cpp b.cpp).
+
+A source file given as a program is compiled once per build profile and the
+binary is reused until the source, one of its local headers, the compiler
+or the flags change: the cache key hashes all of them. Binaries are
+written to a temporary file and renamed into place, so concurrent builds
+of the same source (parallel runs, several emulators) never see a partial
+file.
+
+The compiler is $CXX, or g++.
+"""
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, List, Optional
+
+# Compiler flags per --build profile
+PROFILES: Dict[str, List[str]] = {
+    "cg": ["-std=c++17", "-O2"],                      # Close to CodinGame's build
+    "native": ["-std=c++17", "-O3", "-march=native"],  # Fastest build for this machine
+    "debug": ["-std=c++17", "-O0", "-g"],              # As the repo's CMakeLists
+}
+DEFAULT_PROFILE = "cg"
+
+# Libraries linked after the source
+LINK_FLAGS = ["-lm", "-lpthread"]
+
+SOURCE_SUFFIXES = (".cpp", ".cc", ".cxx")
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "builds")
+
+LOCAL_INCLUDE = re.compile(rb'^\s*#\s*include\s*"([^"]+)"', re.MULTILINE)
+
+
+class BuildError(Exception):
+    """Compilation failed; the message holds the compiler output."""
+
+
+def is_source(path: str) -> bool:
+    return path.endswith(SOURCE_SUFFIXES)
+
+
+def compiler() -> str:
+    return os.environ.get("CXX", "g++")
+
+
+_compiler_ids: Dict[str, str] = {}
+
+
+def compiler_id(cxx: str) -> str:
+    """Resolved path and version banner of the compiler, part of the cache key."""
+    if cxx not in _compiler_ids:
+        path = shutil.which(cxx)
+        if path is None:
+            raise BuildError(f"Compiler '{cxx}' not found (set CXX)")
+        version = subprocess.run([path, "--version"], capture_output=True, text=True).stdout
+        _compiler_ids[cxx] = f"{os.path.realpath(path)}\n{version}"
+    return _compiler_ids[cxx]
+
+
+def hash_sources(source: str) -> str:
+    """Hash of a source file and the local ("...") headers it includes, recursively."""
+    digest = hashlib.sha256()
+    seen = set()
+    pending = [os.path.abspath(source)]
+    while pending:
+        path = pending.pop()
+        if path in seen or not os.path.isfile(path):
+            continue
+        seen.add(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        digest.update(path.encode() + b"\0" + data + b"\0")
+        folder = os.path.dirname(path)
+        pending.extend(os.path.join(folder, name.decode()) for name in LOCAL_INCLUDE.findall(data))
+    return digest.hexdigest()
+
+
+def cache_key(source: str, profile: str, cxx: Optional[str] = None) -> str:
+    cxx = cxx or compiler()
+    digest = hashlib.sha256()
+    for part in (hash_sources(source), compiler_id(cxx), " ".join(PROFILES[profile] + LINK_FLAGS)):
+        digest.update(part.encode() + b"\0")
+    return digest.hexdigest()[:24]
+
+
+def binary_path(source: str, profile: str = DEFAULT_PROFILE, cache_dir: str = CACHE_DIR) -> str:
+    """Where the binary for source built with profile is (or will be) cached."""
+    if profile not in PROFILES:
+        raise BuildError(f"Unknown build profile '{profile}' (choose from {', '.join(PROFILES)})")
+    if not os.path.isfile(source):
+        raise BuildError(f"Source file '{source}' not found")
+    name = os.path.splitext(os.path.basename(source))[0]
+    binary = os.path.join(cache_dir, f"{name}-{profile}-{cache_key(source, profile)}")
+    return binary + ".exe" if os.name == "nt" else binary
+
+
+def build(source: str, profile: str = DEFAULT_PROFILE, cache_dir: str = CACHE_DIR) -> str:
+    """Path of the binary for source built with profile, compiling it if not cached.
+
+    Raises BuildError if the source does not compile.
+    """
+    binary = binary_path(source, profile, cache_dir)
+    if os.path.exists(binary):
+        return binary
+    cxx = compiler()
+    name = os.path.splitext(os.path.basename(source))[0]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, partial = tempfile.mkstemp(dir=cache_dir, prefix=f".{name}-")
+    os.close(fd)
+    try:
+        result = subprocess.run([cxx, *PROFILES[profile], "-o", partial, source, *LINK_FLAGS],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise BuildError(f"{cxx} failed on {source}:\n{result.stderr.strip()}")
+        os.chmod(partial, 0o755)
+        os.replace(partial, binary)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return binary
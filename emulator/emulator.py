@@ -8,12 +8,103 @@ Usage:
     python emulator.py --model the_fall --replay test_02  # Replay trace
     python emulator.py --model the_fall --test-traces     # Test all traces for model
     python emulator.py --test-all-traces                  # Test all traces for all models
+    python emulator.py -m cellularena --replay-diff       # Field-level diffs of all traces
+    python emulator.py -m cellularena --bisect v1.0       # Find the commit that broke traces
+    python emulator.py --model there_is_no_spoon --solve  # Reference-solve test cases
+    python emulator.py -m shadows_of_the_knight_2 --sweep ./bot 100x100  # All bomb positions
+    python emulator.py --agent-module bots.lander:Bot --test cave_correct  # In-process bot
+    python emulator.py -m cellularena --tournament ./bot1 ./bot2 ./bot3  # Round robin
 """
 import argparse
+import json
+import os
 import sys
+import time
 
+import agents
+import batch
+import build_cache
 import models
+import profiling
+import result_cache
 import runner
+import sweep
+import tournament
+import trace_diff
+
+
+def expand_test_names(names: list) -> list:
+    """Expand seed ranges like 'gen:1..100' or 'gen:30x15:1..100' into one name per seed.
+
+    The range may be followed by generator options, as in
+    'gen:30x15:1..100:walls=0.2'.
+    """
+    expanded = []
+    for name in names:
+        parts = name.split(':')
+        index = len(parts) - 2 if len(parts) > 2 and '=' in parts[-1] else len(parts) - 1
+        first, dots, last = parts[index].partition('..')
+        if index > 0 and dots and first.isdigit() and last.isdigit():
+            for seed in range(int(first), int(last) + 1):
+                parts[index] = str(seed)
+                expanded.append(':'.join(parts))
+        else:
+            expanded.append(name)
+    return expanded
+
+
+def build_program(program: runner.Program, profile: str) -> runner.Program:
+    """Command for program, with a leading C++ source replaced by its cached binary."""
+    if callable(program) or not build_cache.is_source(program[0]):
+        return program
+    try:
+        cached = os.path.exists(build_cache.binary_path(program[0], profile))
+        binary = build_cache.build(program[0], profile)
+    except build_cache.BuildError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{'Cached' if cached else 'Built'} {program[0]} ({profile}): {binary}")
+    return [binary] + program[1:]
+
+
+def print_profile(profiler: profiling.TurnProfiler, per_turn: bool, stats_path: str = None) -> None:
+    """Phase breakdown and top emulator functions of a --profile run."""
+    print(f"\nProfile (agent wait excluded from functions):")
+    for line in profiler.format_report(per_turn=per_turn):
+        print(f"  {line}")
+    print()
+    for line in profiler.format_top():
+        print(f"  {line}")
+    if stats_path:
+        profiler.dump_stats(stats_path)
+        print(f"\ncProfile stats written to {stats_path}")
+
+
+def print_allocations(tracker: profiling.AllocationTracker, model_name: str, trajectory: list,
+                      per_turn: bool) -> None:
+    """Allocation report of an --alloc run, with the deep size of the trajectory."""
+    print(f"\nAllocations ({model_name}, tracemalloc):")
+    for line in tracker.format_report(per_turn=per_turn):
+        print(f"  {line}")
+    if trajectory:
+        size = profiling.deep_size(trajectory)
+        print(f"  Trajectory: {len(trajectory)} states, deep size {size / 1024:.1f} KiB "
+              f"({size / len(trajectory):.0f} B/state)")
+
+
+def print_stderr_tail(stderr_tail: dict) -> None:
+    """Last stderr lines of each player, for failure reports."""
+    for pid, lines in sorted(stderr_tail.items()):
+        print(f"\nLast stderr lines (P{pid}):")
+        for line in lines:
+            print(f"  {line}")
+
+
+def print_instruments(profiler, tracker, model_name: str, trajectory: list, args) -> None:
+    if profiler:
+        print_profile(profiler, args.verbose, args.profile_out)
+    if tracker:
+        print_allocations(tracker, model_name, trajectory, args.verbose)
 
 
 def main():
@@ -21,7 +112,7 @@ def main():
     parser.add_argument('--model', '-m', default='mars_lander',
                         help='Game model to use (default: mars_lander)')
     parser.add_argument('--test', type=str, nargs='+',
-                        help='Test a program: --test <program> [args...] <test_case>')
+                        help='Test a program: --test <program> [args...] <test_case|all|gen:1..100>')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='Verbose output')
     parser.add_argument('--list', action='store_true',
@@ -30,6 +121,22 @@ def main():
                         help='List available game models')
     parser.add_argument('--timeout', '-t', type=int, default=150,
                         help='Timeout per turn in milliseconds (default: 150)')
+    parser.add_argument('--bulk-timeout', type=int, metavar='MS', default=runner.BULK_TIMEOUT_MS,
+                        help=f'Timeout for the whole answer in single-output puzzles such as '
+                             f'There is no Spoon (default: {runner.BULK_TIMEOUT_MS})')
+    parser.add_argument('--kill-grace', type=int, metavar='MS', default=runner.KILL_GRACE_MS,
+                        help=f'Time agents get to exit after SIGTERM before SIGKILL '
+                             f'(default: {runner.KILL_GRACE_MS})')
+    parser.add_argument('--build', type=str, metavar='PROFILE', default=build_cache.DEFAULT_PROFILE,
+                        choices=list(build_cache.PROFILES),
+                        help=f'Compiler profile for C++ source programs: {", ".join(build_cache.PROFILES)} '
+                             f'(default: {build_cache.DEFAULT_PROFILE})')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse stored results of unchanged games in --test batch runs')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='With --cache: re-run every game, storing the fresh results')
+    parser.add_argument('--fork-server', action='store_true',
+                        help="Start 'python bot.py' agents by forking a pre-imported template process")
     parser.add_argument('--debug', '-d', action='store_true',
                         help='Show stderr from the program (for debugging)')
     parser.add_argument('--replay', type=str, metavar='TEST_NAME',
@@ -38,9 +145,68 @@ def main():
                         help='Test all traces for selected model')
     parser.add_argument('--test-all-traces', action='store_true',
                         help='Test all traces for all models')
+    parser.add_argument('--replay-diff', type=str, nargs='*', metavar='TEST_NAME',
+                        help='Replay traces (default: all) and report every mismatching field per turn')
+    parser.add_argument('--stop-at-first', action='store_true',
+                        help='With --replay-diff, stop each trace at its first mismatching turn')
+    parser.add_argument('--diff-out', type=str, metavar='FILE',
+                        help='Write --replay-diff results as JSON')
+    parser.add_argument('--bisect', type=str, nargs='+', metavar='COMMIT',
+                        help='Find the first commit after GOOD (up to BAD, default HEAD) that breaks '
+                             'traces: --bisect GOOD [BAD]; --tests picks the traces')
     parser.add_argument('--agents', '-a', type=str, nargs='+', metavar='PROGRAM',
                         help='Programs for multi-agent games (1-4). Last program is reused if fewer than players.')
+    parser.add_argument('--solve', type=str, nargs='*', metavar='TEST_CASE',
+                        help='Run the reference solver on test cases (default: all)')
+    parser.add_argument('--sweep', type=str, nargs='+', metavar='ARG',
+                        help='Sweep bomb positions (Shadows of the Knight): --sweep <program> [args...] <W>x<H>')
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help='Sweep a stratified sample of about N bomb positions instead of all')
+    parser.add_argument('--max-jumps', type=int, metavar='N',
+                        help='Jumps allowed in sweep games (default: binary search budget + 1)')
+    parser.add_argument('--start', type=int, nargs=2, metavar=('X', 'Y'),
+                        help='Batman start position in sweep games (default: building center)')
+    parser.add_argument('--workers', '-j', type=int, metavar='N',
+                        help='Parallel worker processes (default: CPU count)')
+    parser.add_argument('--sweep-out', type=str, metavar='FILE',
+                        help='Write sweep results as JSON')
+    parser.add_argument('--tournament', type=str, nargs='*', metavar='PROGRAM',
+                        help='Round robin of programs over all test cases, both seat orders (Cellularena)')
+    parser.add_argument('--tests', type=str, nargs='+', metavar='TEST_CASE',
+                        help='Test cases for --tournament or traces for --bisect (default: all); '
+                             'gen:1..100 expands to 100 seeds')
+    parser.add_argument('--export', type=str, metavar='TEST_CASE',
+                        help='Print a (generated) test case as JSON in the tests/ file format')
+    parser.add_argument('--tournament-state', type=str, metavar='FILE',
+                        help='JSON Lines file to log tournament games to and resume from')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time each turn phase and cProfile emulator code (--test, --agents, --replay)')
+    parser.add_argument('--profile-out', type=str, metavar='FILE',
+                        help='With --profile, write cProfile stats (.pstats)')
+    parser.add_argument('--alloc', action='store_true',
+                        help='Track tracemalloc allocations of simulate and input formatting '
+                             '(--test, --agents, --replay)')
+    parser.add_argument('--agent-module', type=str, action='append', metavar='MODULE:ATTR',
+                        help='Run a Python bot in-process instead of a program (repeatable; '
+                             'with --agents, module agents take the first seats)')
     args = parser.parse_args()
+    runner.configure(args.kill_grace, args.fork_server, args.bulk_timeout)
+    if args.no_cache and not args.cache:
+        print("Warning: --no-cache only applies with --cache, results are not stored", file=sys.stderr)
+    if args.fork_server and not runner.FORK_SERVER:
+        print("Warning: --fork-server needs fork and fd passing (POSIX), starting agents normally",
+              file=sys.stderr)
+    profiler = profiling.TurnProfiler() if args.profile or args.profile_out else None
+    tracker = profiling.AllocationTracker() if args.alloc else None
+    instrument = profiling.Instruments(profiler, tracker) if profiler and tracker else profiler or tracker
+
+    module_agents = []
+    for spec in args.agent_module or []:
+        try:
+            module_agents.append(agents.load_agent(spec))
+        except (ImportError, ValueError, TypeError, SyntaxError) as e:
+            print(f"Error: cannot load agent '{spec}': {e}", file=sys.stderr)
+            sys.exit(1)
 
     if args.list_models:
         print("Available models:")
@@ -54,41 +220,252 @@ def main():
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
+    if args.export:
+        if not hasattr(model, 'get_test_case_data'):
+            print(f"Error: {model.name} does not support --export", file=sys.stderr)
+            sys.exit(1)
+        try:
+            print(json.dumps(model.get_test_case_data(args.export), indent=2))
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
     if args.list:
         print(f"Test cases for {model.name}:")
         for name, desc in model.get_test_cases().items():
             print(f"  {name}: {desc}")
         return
 
+    if args.solve is not None:
+        solve = getattr(model, 'solve', None)
+        if solve is None:
+            print(f"Error: model {model.name} has no reference solver", file=sys.stderr)
+            sys.exit(1)
+
+        test_names = args.solve or list(model.get_test_cases().keys())
+        failed = 0
+        for test_name in test_names:
+            try:
+                env, _ = model.load_test_case(test_name)
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                sys.exit(1)
+
+            stats = {}
+            start = time.perf_counter()
+            solution = solve(env, stats)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if solution is None:
+                print(f"  {test_name}: UNSOLVABLE ({elapsed_ms:.1f}ms, {stats})")
+                failed += 1
+                continue
+            error = model.check_solution(env, solution)
+            if error:
+                print(f"  {test_name}: INVALID - {error}")
+                failed += 1
+            else:
+                print(f"  {test_name}: OK, {len(solution)} links ({elapsed_ms:.1f}ms, {stats})")
+            if args.verbose:
+                for link in solution:
+                    print("    " + " ".join(str(v) for v in link))
+
+        print(f"\nResults: {len(test_names) - failed}/{len(test_names)} solved")
+        sys.exit(0 if failed == 0 else 1)
+
+    if args.sweep:
+        if model.name not in sweep.SWEEP_MODELS:
+            print(f"Error: --sweep supports {', '.join(sweep.SWEEP_MODELS)}", file=sys.stderr)
+            sys.exit(1)
+        if len(args.sweep) < (1 if module_agents else 2):
+            print("Usage: --sweep <program> [args...] <W>x<H>")
+            print("       --agent-module <module:attr> --sweep <W>x<H>")
+            sys.exit(1)
+
+        try:
+            width, height = (int(v) for v in args.sweep[-1].lower().split('x'))
+        except ValueError:
+            print(f"Error: invalid building size '{args.sweep[-1]}', expected <W>x<H>", file=sys.stderr)
+            sys.exit(1)
+        program_cmd = module_agents[0] if module_agents else args.sweep[:-1]
+        if not module_agents and len(program_cmd) == 1 and ' ' in program_cmd[0]:
+            program_cmd = program_cmd[0].split()
+        program_cmd = build_program(program_cmd, args.build)
+
+        start = tuple(args.start) if args.start else (width // 2, height // 2)
+        max_jumps = args.max_jumps or sweep.default_max_jumps(width, height)
+        positions = sweep.sweep_positions(width, height, start, args.sample)
+
+        print(f"Model: {model.name}")
+        print(f"Program: {runner.describe_program(program_cmd)}")
+        print(f"Building: {width}x{height}, start {start}, {max_jumps} jumps, {len(positions)} bomb positions")
+        print()
+
+        started = time.perf_counter()
+        results = sweep.run_sweep(
+            model.name, program_cmd, width, height, max_jumps, start, positions,
+            workers=args.workers, turn_timeout_ms=args.timeout, progress=True
+        )
+        elapsed = time.perf_counter() - started
+
+        for line in sweep.format_heatmap(results, width, height, max_jumps):
+            print(line)
+        summary = sweep.summarize(results)
+        print(f"\n{'='*50}")
+        print(f"Positions: {summary['positions']} in {elapsed:.1f}s")
+        print(f"Failures: {summary['failures']}")
+        for bx, by, result in summary['first_failures']:
+            print(f"  bomb ({bx}, {by}): {result}")
+        if summary['successes']:
+            print(f"Jumps: mean {summary['mean_jumps']:.2f}, median {summary['median_jumps']}, "
+                  f"max {summary['max_jumps']}")
+
+        if args.sweep_out:
+            with open(args.sweep_out, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "model": model.name,
+                    "program": runner.describe_program(program_cmd),
+                    "width": width,
+                    "height": height,
+                    "start": list(start),
+                    "max_jumps": max_jumps,
+                    "summary": summary,
+                    "results": [list(r) for r in results],
+                }, f)
+        sys.exit(0 if summary['failures'] == 0 else 1)
+
+    if args.tournament is not None:
+        if model.name not in tournament.TOURNAMENT_MODELS:
+            print(f"Error: --tournament supports {', '.join(tournament.TOURNAMENT_MODELS)}", file=sys.stderr)
+            sys.exit(1)
+
+        programs = {}
+        for program in list(module_agents) + [p.split() for p in args.tournament or []]:
+            name = runner.describe_program(program)
+            if name in programs:
+                print(f"Error: '{name}' is listed twice", file=sys.stderr)
+                sys.exit(1)
+            programs[name] = build_program(program, args.build)
+        if len(programs) < 2:
+            print("Usage: --tournament <program1> <program2> [program3...]")
+            print("       Quote programs with arguments; --agent-module bots take part too")
+            sys.exit(1)
+
+        test_names = expand_test_names(args.tests) if args.tests else list(model.get_test_cases().keys())
+        for test_name in test_names:
+            try:
+                model.load_test_case(test_name)
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                sys.exit(1)
+        total = len(tournament.schedule(list(programs), test_names))
+
+        print(f"Model: {model.name}")
+        print(f"Bots: {len(programs)}, test cases: {len(test_names)}, games: {total}")
+        if args.tournament_state:
+            print(f"State: {args.tournament_state}")
+        print()
+
+        started = time.perf_counter()
+        state = tournament.run_tournament(
+            model.name, programs, test_names, state_path=args.tournament_state,
+            workers=args.workers, turn_timeout_ms=args.timeout, progress=True
+        )
+        elapsed = time.perf_counter() - started
+
+        print(f"\n{'='*50}")
+        print(f"Games played in {elapsed:.1f}s\n")
+        for line in tournament.format_standings(state, list(programs)):
+            print(line)
+        sys.exit(0)
+
     if args.test:
-        if len(args.test) < 2:
-            print("Usage: --test <program> [args...] <test_case>")
+        if len(args.test) < (1 if module_agents else 2):
+            print("Usage: --test <program> [args...] <test_case | all | gen:<first>..<last>>")
+            print("       --agent-module <module:attr> --test <test_case>")
             print("       --list  to see available test cases")
             sys.exit(1)
 
         test_name = args.test[-1]
-        program_cmd = args.test[:-1]
+        program_cmd = module_agents[0] if module_agents else args.test[:-1]
 
-        if len(program_cmd) == 1 and ' ' in program_cmd[0]:
+        if not module_agents and len(program_cmd) == 1 and ' ' in program_cmd[0]:
             program_cmd = program_cmd[0].split()
+        program_cmd = build_program(program_cmd, args.build)
+
+        if test_name == 'all':
+            test_names = list(model.get_test_cases().keys())
+        else:
+            test_names = expand_test_names([test_name])
+        if len(test_names) > 1 or test_name == 'all':
+            # Batch mode: one agent over many test cases
+            print(f"Model: {model.name}")
+            print(f"Program: {runner.describe_program(program_cmd)}")
+            print(f"Tests: {test_names[0]} .. {test_names[-1]} ({len(test_names)})")
+            print()
+
+            cache = result_cache.ResultCache(read=not args.no_cache) if args.cache else None
+            started = time.perf_counter()
+            results = batch.run_batch(model.name, program_cmd, test_names, workers=args.workers,
+                                      turn_timeout_ms=args.timeout, progress=True, cache=cache)
+            elapsed = time.perf_counter() - started
+            summary = batch.summarize(results)
+
+            print(f"\n{'='*50}")
+            if test_name == 'all' or args.verbose:
+                for line in batch.format_scores(results) or [f"  {r['test']}: {r['result']}" for r in results]:
+                    print(line)
+                print()
+            print(f"Test cases: {summary['cases']} in {elapsed:.1f}s")
+            if cache is not None:
+                print(f"Result cache: {cache.format_stats()}")
+            print(f"Success: {summary['successes']}/{summary['cases']} ({summary['success_rate']:.1%})")
+            for reason, count in summary['failure_reasons']:
+                print(f"  {count:5}  {reason}")
+            if args.verbose:
+                for r in results:
+                    if r['stderr']:
+                        print(f"Last stderr lines ({r['test']}):")
+                        for line in r['stderr'][-5:]:
+                            print(f"    {line}")
+            if 'turns' in summary:
+                turns = summary['turns']
+                print(f"Turns: mean {turns['mean']:.1f}, median {turns['median']}, max {turns['max']}")
+            if 'scores' in summary:
+                print(f"Total score: {summary['total_score']:.0f} (mean {summary['total_score'] / summary['cases']:.1f})")
+                for name, stats in summary.get('metrics', {}).items():
+                    print(f"  {name:<8} mean {stats['mean']:.1f}, p10 {stats['p10']:.0f}, "
+                          f"median {stats['median']:.0f}, p90 {stats['p90']:.0f} (successes)")
+                print("Score distribution (successes):")
+                for line in batch.format_histogram(summary['scores']):
+                    print(f"  {line}")
+            sys.exit(0 if summary['successes'] == summary['cases'] else 1)
 
         # Get test case name for display
         test_cases = model.get_test_cases()
         display_name = test_cases.get(test_name, test_name)
 
         print(f"Model: {model.name}")
-        print(f"Program: {' '.join(program_cmd)}")
+        print(f"Program: {runner.describe_program(program_cmd)}")
         print(f"Test: {test_name} ({display_name})")
         print()
 
+        stderr_tail = {}
         try:
+            if instrument:
+                instrument.start()
             result, trajectory, turns = runner.run_program(
                 model, program_cmd, test_name, verbose=args.verbose,
-                turn_timeout_ms=args.timeout, debug=args.debug
+                turn_timeout_ms=args.timeout, debug=args.debug, instrument=instrument,
+                stderr_tail=stderr_tail
             )
         except ValueError as e:
             print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)
+        finally:
+            if instrument:
+                instrument.stop()
 
         print(f"\n{'='*50}")
         print(f"Result: {result}")
@@ -98,11 +475,15 @@ def main():
             final = trajectory[-1]
             print(f"Final: {model.format_result(final)}")
 
+        print_instruments(profiler, tracker, model.name, trajectory, args)
+
         if result == 'success':
             print("\n[OK] SUCCESS!")
             sys.exit(0)
         else:
             print("\n[FAIL] FAILED")
+            if not args.debug:
+                print_stderr_tail(stderr_tail)
             print("\nLast 5 states:")
             for i, s in enumerate(trajectory[-5:]):
                 print(f"  {len(trajectory)-5+i}: {model.format_result(s)}")
@@ -110,7 +491,7 @@ def main():
 
     elif args.agents:
         # Multi-agent mode: run programs for each player
-        if len(args.agents) < 2:
+        if len(args.agents) < (1 if module_agents else 2):
             print("Usage: --agents <program1> [program2] ... <test_case>")
             print("       Last argument is the test case name")
             sys.exit(1)
@@ -118,13 +499,13 @@ def main():
         test_name = args.agents[-1]
         programs = args.agents[:-1]
 
-        # Parse program commands (split by space if quoted)
-        program_cmds = []
+        # Parse program commands (split by space if quoted); module agents go first
+        program_cmds = list(module_agents)
         for prog in programs:
             if ' ' in prog:
-                program_cmds.append(prog.split())
+                program_cmds.append(build_program(prog.split(), args.build))
             else:
-                program_cmds.append([prog])
+                program_cmds.append(build_program([prog], args.build))
 
         # Get test case info
         test_cases = model.get_test_cases()
@@ -134,17 +515,24 @@ def main():
         print(f"Test: {test_name} ({display_name})")
         print(f"Agents: {len(program_cmds)}")
         for i, cmd in enumerate(program_cmds):
-            print(f"  P{i}: {' '.join(cmd)}")
+            print(f"  P{i}: {runner.describe_program(cmd)}")
         print()
 
+        stderr_tail = {}
         try:
+            if instrument:
+                instrument.start()
             result, trajectory, turns = runner.run_program_multi(
                 model, program_cmds, test_name, verbose=args.verbose,
-                turn_timeout_ms=args.timeout, debug=args.debug
+                turn_timeout_ms=args.timeout, debug=args.debug, instrument=instrument,
+                stderr_tail=stderr_tail
             )
         except ValueError as e:
             print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)
+        finally:
+            if instrument:
+                instrument.stop()
 
         print(f"\n{'='*50}")
         print(f"Result: {result}")
@@ -153,12 +541,21 @@ def main():
         if trajectory:
             final = trajectory[-1]
             print(f"Final: {model.format_result(final)}")
+            scores = model.get_scores(final)
+            if scores is not None:
+                winner = model.get_winner(final)
+                print(f"Scores: {', '.join(f'P{p}={score}' for p, score in enumerate(scores))}")
+                print(f"Winner: {'draw' if winner is None else f'P{winner}'}")
+
+        print_instruments(profiler, tracker, model.name, trajectory, args)
 
         if result == 'success':
             print("\n[OK] SUCCESS!")
             sys.exit(0)
         else:
             print("\n[FAIL] FAILED")
+            if not args.debug:
+                print_stderr_tail(stderr_tail)
             print("\nLast 5 states:")
             for i, s in enumerate(trajectory[-5:]):
                 print(f"  {len(trajectory)-5+i}: {model.format_result(s)}")
@@ -186,11 +583,7 @@ def main():
                 if not trace:
                     continue
 
-                # Use multi-agent replay if trace has "commands" field (multi-agent format)
-                if trace.get("cg_trace") and trace["cg_trace"] and "commands" in trace["cg_trace"][0]:
-                    mismatches, _, _ = runner.run_replay_multi(model, trace_name, trace, verbose=args.verbose)
-                else:
-                    mismatches, _, _ = runner.run_replay(model, trace_name, trace, verbose=args.verbose)
+                mismatches, _, _ = runner.replay_trace(model, trace_name, trace, verbose=args.verbose)
 
                 if mismatches:
                     print(f"  {trace_name}: MISMATCH at turn {mismatches[0][0]}")
@@ -224,11 +617,7 @@ def main():
             if not trace:
                 continue
 
-            # Use multi-agent replay if trace has "commands" field (multi-agent format)
-            if trace.get("cg_trace") and trace["cg_trace"] and "commands" in trace["cg_trace"][0]:
-                mismatches, _, _ = runner.run_replay_multi(model, trace_name, trace, verbose=args.verbose)
-            else:
-                mismatches, _, _ = runner.run_replay(model, trace_name, trace, verbose=args.verbose)
+            mismatches, _, _ = runner.replay_trace(model, trace_name, trace, verbose=args.verbose)
 
             if mismatches:
                 print(f"  {trace_name}: MISMATCH at turn {mismatches[0][0]}")
@@ -244,6 +633,61 @@ def main():
         print(f"\nResults: {passed}/{passed + failed} passed")
         sys.exit(0 if failed == 0 else 1)
 
+    elif args.replay_diff is not None:
+        trace_names = args.replay_diff or model.list_traces()
+        try:
+            report = trace_diff.diff_traces(model, trace_names, stop_at_first=args.stop_at_first)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+        for trace_name, turns in report.items():
+            if not turns:
+                print(f"  {trace_name}: OK")
+                continue
+            print(f"  {trace_name}: {len(turns)} mismatching turns, first at turn {turns[0]['turn']}")
+            for entry in turns if args.verbose else turns[:1]:
+                for diff in entry['diffs']:
+                    print(f"    T{entry['turn']} {diff['field']}: got {diff['actual']!r}, expected {diff['expected']!r}")
+
+        if args.diff_out:
+            with open(args.diff_out, 'w', encoding='utf-8') as f:
+                json.dump({"model": model.name, "traces": report}, f, indent=1, default=str)
+            print(f"\nDiffs written to {args.diff_out}")
+        sys.exit(0 if not any(report.values()) else 1)
+
+    elif args.bisect:
+        if len(args.bisect) > 2:
+            print("Usage: --bisect <good commit> [bad commit]")
+            sys.exit(1)
+        good, bad = args.bisect[0], args.bisect[1] if len(args.bisect) > 1 else "HEAD"
+        trace_names = args.tests or model.list_traces()
+        missing = [name for name in trace_names if not model.load_trace(name)]
+        if not trace_names or missing:
+            print(f"Error: no traces to check{': ' + ', '.join(missing) if missing else ''}", file=sys.stderr)
+            sys.exit(1)
+
+        print(f"Model: {model.name}")
+        print(f"Traces: {', '.join(trace_names)}")
+        print(f"Range: {good}..{bad}")
+        print()
+
+        try:
+            first_bad, checked = trace_diff.bisect_commits(
+                model.name, trace_names, good, bad, workers=args.workers or 4, progress=True
+            )
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+        print(f"\n{'='*50}")
+        print(f"Commits checked: {len(checked)}")
+        if first_bad is None:
+            print(f"Traces match at {bad}, nothing to bisect")
+            sys.exit(0)
+        print(f"First bad commit: {trace_diff.git('log', '-1', '--format=%h %s', first_bad)}")
+        sys.exit(0)
+
     elif args.replay:
         # Replay a single trace
         trace_name = args.replay
@@ -257,13 +701,15 @@ def main():
         print(f"Trace: {trace_name}")
         print()
 
-        # Use multi-agent replay if trace has "commands" field (multi-agent format)
-        if trace.get("cg_trace") and trace["cg_trace"] and "commands" in trace["cg_trace"][0]:
-            mismatches, trajectory, turns = runner.run_replay_multi(model, trace_name, trace, verbose=args.verbose)
-        else:
-            mismatches, trajectory, turns = runner.run_replay(model, trace_name, trace, verbose=args.verbose)
+        if instrument:
+            instrument.start()
+        mismatches, trajectory, turns = runner.replay_trace(model, trace_name, trace, verbose=args.verbose,
+                                                            instrument=instrument)
+        if instrument:
+            instrument.stop()
 
         print(f"\n{'='*50}")
+        print_instruments(profiler, tracker, model.name, trajectory, args)
         if mismatches:
             print(f"Result: MISMATCH")
             print(f"First mismatch at turn {mismatches[0][0]}:")
@@ -0,0 +1,299 @@
+"""Fork server for Python bots (--fork-server).
+
+Starting a Python bot as a subprocess pays interpreter startup and imports
+on every game. With a fork server, the emulator starts one template process
+per bot script (``python bot.py args...`` commands): it imports the
+modules the script imports at top level and compiles the script, then
+waits. Each game asks the template over a Unix socket to fork a child,
+passing the child's stdin/stdout/stderr pipes with ``send_fds``. The child
+runs the script as ``__main__`` in its own session, with the game's
+arguments, so every game still gets a fresh process. The template reaps
+its children and reports each exit status on a per-child status pipe.
+
+Children are copies of the template: ``random`` is reseeded in each child,
+but hash randomization (PYTHONHASHSEED) is shared by all games of a bot.
+
+POSIX only; use ``available()`` to check. Templates are per process, so
+forked pool workers start their own.
+"""
+import ast
+import importlib
+import json
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import traceback
+import types
+from typing import Dict, List, Optional, Tuple
+
+# Largest request message (the child's argv as JSON)
+MAX_MESSAGE = 65536
+
+
+def available() -> bool:
+    return os.name == 'posix' and hasattr(socket, 'send_fds') and hasattr(os, 'fork')
+
+
+def python_script(cmd: List[str]) -> Optional[Tuple[str, str]]:
+    """(python, script path) if cmd runs a .py script with a Python interpreter, else None."""
+    if len(cmd) < 2 or not os.path.basename(cmd[0]).startswith('python') or not cmd[1].endswith('.py'):
+        return None
+    return cmd[0], os.path.abspath(cmd[1])
+
+
+class ForkedProcess:
+    """The subset of subprocess.Popen the runner uses, for a child of a template.
+
+    The child is not ours to wait for: the template reaps it and writes its
+    returncode (negative for a signal, as Popen) to the status pipe.
+    """
+
+    def __init__(self, pid: int, stdin_fd: int, stdout_fd: int, stderr_fd: int, status_fd: int):
+        self.pid = pid
+        self.stdin = os.fdopen(stdin_fd, 'wb')
+        self.stdout = os.fdopen(stdout_fd, 'rb')
+        self.stderr = os.fdopen(stderr_fd, 'rb')
+        os.set_blocking(status_fd, False)
+        self._status = os.fdopen(status_fd, 'rb', buffering=0)
+        self._status_data = b''
+        self.returncode: Optional[int] = None
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None:
+            try:
+                chunk = self._status.read(64)
+            except OSError:
+                chunk = None
+            if chunk is None:
+                return None  # Still running
+            self._status_data += chunk
+            if chunk and not self._status_data.endswith(b'\n'):
+                return None  # Rest of the status still on its way
+            if self._status_data:
+                self.returncode = int(self._status_data)
+            else:
+                self.returncode = _unknown_status(self.pid)  # The template died before reporting
+                if self.returncode is None:
+                    return None
+            self._status.close()
+        return self.returncode
+
+    def terminate(self) -> None:
+        if self.poll() is None:
+            os.kill(self.pid, signal.SIGTERM)
+
+    def kill(self) -> None:
+        if self.poll() is None:
+            os.kill(self.pid, signal.SIGKILL)
+
+
+def _unknown_status(pid: int) -> Optional[int]:
+    """Returncode for a child whose template is gone: None while it still exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return -signal.SIGKILL  # Exit status lost with the template
+    except PermissionError:
+        pass
+    return None
+
+
+class ForkServer:
+    """Template process of one bot script, forking a child per game."""
+
+    def __init__(self, python: str, script: str):
+        self.python = python
+        self.script = script
+        self._lock = threading.Lock()
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket = ours
+        self.proc = subprocess.Popen(
+            [python, os.path.abspath(__file__), script, str(theirs.fileno())],
+            pass_fds=(theirs.fileno(),),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        theirs.close()
+
+    def spawn(self, args: List[str]) -> ForkedProcess:
+        """Fork a child running the script with args. Raises OSError if the template is gone."""
+        stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        status_r, status_w = os.pipe()
+        ours = (stdin_w, stdout_r, stderr_r, status_r)
+        try:
+            with self._lock:
+                socket.send_fds(self._socket, [json.dumps(args).encode('utf-8')],
+                                [stdin_r, stdout_w, stderr_w, status_w])
+                reply = self._socket.recv(64)
+        except OSError:
+            for fd in ours:
+                os.close(fd)
+            raise
+        finally:
+            for fd in (stdin_r, stdout_w, stderr_w, status_w):
+                os.close(fd)
+        if not reply:
+            for fd in ours:
+                os.close(fd)
+            raise ConnectionError(f"fork server for {self.script} exited")
+        return ForkedProcess(int(reply), *ours)
+
+    def close(self) -> None:
+        self._socket.close()  # The template exits at end of input
+        try:
+            self.proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+_servers: Dict[Tuple[str, str], ForkServer] = {}
+_servers_pid: Optional[int] = None
+_servers_lock = threading.Lock()
+
+
+def spawn(cmd: List[str]) -> ForkedProcess:
+    """Start cmd (a python script command, see python_script) from its template."""
+    global _servers_pid
+    python, script = python_script(cmd)
+    with _servers_lock:
+        if _servers_pid != os.getpid():  # Templates of a parent process are not ours
+            _servers.clear()
+            _servers_pid = os.getpid()
+        server = _servers.get((python, script))
+        if server is None or server.proc.poll() is not None:
+            server = _servers[(python, script)] = ForkServer(python, script)
+    return server.spawn([script] + cmd[2:])
+
+
+def _preimport(tree: ast.Module) -> None:
+    """Import the modules a script imports at top level (including inside try/if)."""
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            continue
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass  # The script reports it when it runs
+
+
+def _run_child(code, source: bytes, script: str, args: List[str]) -> None:
+    """Body of a forked child: run the script as __main__, then exit."""
+    status = 0
+    try:
+        if code is None:
+            code = compile(source, script, 'exec')  # Raises the script's SyntaxError
+        if 'random' in sys.modules:
+            sys.modules['random'].seed()
+        sys.argv = args
+        main = types.ModuleType('__main__')
+        main.__file__ = script
+        sys.modules['__main__'] = main
+        exec(code, main.__dict__)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            status = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException as e:
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)  # Without this frame
+        status = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(status)
+
+
+def _template(script: str, fd: int) -> None:
+    """Template process: pre-import, then fork a child per request until the socket closes."""
+    sys.path[0] = os.path.dirname(script)  # As when running the script directly
+    with open(script, 'rb') as f:
+        source = f.read()
+    try:
+        tree = ast.parse(source, script)
+        code = compile(tree, script, 'exec')
+    except SyntaxError:
+        tree = code = None  # Children report it
+    if tree is not None:
+        _preimport(tree)
+    # SIGCHLD wakes the loop below to reap children and report their status
+    wakeup_r, wakeup_w = os.pipe()
+    for fd_wake in (wakeup_r, wakeup_w):
+        os.set_blocking(fd_wake, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    status_fds: Dict[int, int] = {}  # pid -> write end of its status pipe
+
+    server = socket.socket(fileno=fd)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj == wakeup_r:
+                _reap(wakeup_r, status_fds)
+                continue
+            message, fds, _, _ = socket.recv_fds(server, MAX_MESSAGE, 4)
+            if not message:
+                return
+            args = json.loads(message)
+            pid = os.fork()
+            if pid == 0:
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                selector.close()
+                for fd_other in (server.detach(), wakeup_r, wakeup_w, fds[3], *status_fds.values()):
+                    os.close(fd_other)
+                os.setsid()
+                for target, fd_in in enumerate(fds[:3]):
+                    os.dup2(fd_in, target)
+                    os.close(fd_in)
+                _run_child(code, source, script, args)
+            for fd_in in fds[:3]:
+                os.close(fd_in)
+            status_fds[pid] = fds[3]
+            server.sendall(str(pid).encode('ascii'))
+
+
+def _reap(wakeup_fd: int, status_fds: Dict[int, int]) -> None:
+    """Reap exited children and write each returncode to its status pipe."""
+    try:
+        while os.read(wakeup_fd, 512):
+            pass
+    except BlockingIOError:
+        pass
+    while True:
+        try:
+            pid, wait_status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        status_fd = status_fds.pop(pid, None)
+        if status_fd is not None:
+            try:
+                os.write(status_fd, f"{os.waitstatus_to_exitcode(wait_status)}\n".encode('ascii'))
+            except OSError:
+                pass  # Nobody is listening any more
+            os.close(status_fd)
+
+
+if __name__ == '__main__':
+    _template(sys.argv[1], int(sys.argv[2]))
@@ -0,0 +1,96 @@
+"""Headless matches: drive a game model directly with structured controls.
+
+A Match wraps one GameModel and one test case and steps ``simulate`` with
+control objects built by the caller, skipping the text protocol entirely
+(no format_turn_input, no parse_output, no agents). It is meant for
+self-play, search and parameter tuning loops:
+
+    match = Match(models.get_model("mars_lander"), "test_case_01")
+    while not match.done:
+        match.step(Control(rotate=0, power=4))
+    print(match.result, match.turn)
+
+Multi-agent models take a list of controls per step, each carrying its
+``player_id``, exactly as ``simulate`` expects.
+"""
+import copy
+from typing import Any, Callable, Optional
+
+from models.base import GameModel, SimResult
+
+
+class Match:
+    """Gym-like game session over a model and test case."""
+
+    def __init__(self, model: GameModel, test_name: str, max_turns: Optional[int] = None):
+        self.model = model
+        self.test_name = test_name
+        self.max_turns = max_turns
+        self.env, self._state = model.load_test_case(test_name)
+        self._initial = model.snapshot(self._state)
+        self._result = SimResult('running')
+        self._turn = 0
+
+    def reset(self) -> Any:
+        """Restart from the test case's initial state and return it."""
+        self._state = self.model.restore(self._initial)
+        self._result = SimResult('running')
+        self._turn = 0
+        return self._state
+
+    def step(self, controls: Any) -> tuple:
+        """Apply one turn of controls. Returns (state, result).
+
+        ``controls`` is what the model's simulate takes: a single control,
+        or a list of controls for multi-action and multi-agent models.
+        """
+        if self.done:
+            raise RuntimeError(f"Match is over ({self._result.status}), call reset()")
+        self._state, self._result = self.model.simulate(self._state, controls, self.env)
+        self._turn += 1
+        if (self._result.status == 'running' and self.max_turns is not None
+                and self._turn >= self.max_turns):
+            self._result = SimResult('failure', 'max_turns_exceeded')
+        return self._state, self._result
+
+    def clone(self) -> 'Match':
+        """Independent copy that can be stepped without affecting this one.
+
+        States are never mutated by simulate, so the copy shares the current
+        state and environment and only copies the model's per-game fields.
+        """
+        other = copy.copy(self)
+        other.model = copy.copy(self.model)
+        return other
+
+    def snapshot(self) -> tuple:
+        """Capture the current position to come back to with restore()."""
+        return (self.model.snapshot(self._state), self._turn, self._result)
+
+    def restore(self, snapshot: tuple) -> Any:
+        """Return to a position captured by snapshot() and return its state."""
+        model_snapshot, self._turn, self._result = snapshot
+        self._state = self.model.restore(model_snapshot)
+        return self._state
+
+    def run(self, policy: Callable[['Match'], Any]) -> SimResult:
+        """Step with ``policy(match) -> controls`` until the game ends."""
+        while not self.done:
+            self.step(policy(self))
+        return self._result
+
+    @property
+    def state(self) -> Any:
+        return self._state
+
+    @property
+    def result(self) -> SimResult:
+        return self._result
+
+    @property
+    def turn(self) -> int:
+        return self._turn
+
+    @property
+    def done(self) -> bool:
+        return self._result.status != 'running'
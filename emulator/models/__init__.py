@@ -1,5 +1,5 @@
 """Model registry for game plugins."""
-from .base import GameModel, SimResult
+from .base import FieldDiff, GameModel, SimResult
 from .mars_lander import MarsLanderModel
 from .shadows_of_the_knight_1 import ShadowsOfTheKnight1Model
 from .shadows_of_the_knight_2 import ShadowsOfTheKnight2Model
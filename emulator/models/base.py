@@ -1,23 +1,38 @@
 """Base classes for game model plugins."""
+import copy
 import json
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class SimResult:
     """Result of a simulation step."""
     status: str  # 'running', 'success', 'failure'
     reason: Optional[str] = None
 
 
+@dataclass(slots=True)
+class FieldDiff:
+    """One field of a state that differs from the expected trace entry."""
+    field: str  # e.g. "x", "P0 A", "rocks"
+    actual: Any
+    expected: Any
+
+    def __str__(self) -> str:
+        return f"{self.field}: got {self.actual}, expected {self.expected}"
+
+
 class GameModel(ABC):
     """Base class for game model plugins."""
 
     name: str  # e.g. "mars_lander"
     description: str  # e.g. "Mars Lander Episode 3"
+    # Single-output games answer once with many lines (one control each);
+    # the runner then reads the whole answer at once and calls simulate_batch
+    bulk_output: bool = False
 
     @abstractmethod
     def get_test_cases(self) -> dict[str, str]:
@@ -49,10 +64,46 @@ class GameModel(ABC):
         """One simulation step. Returns (new_state, result)."""
         pass
 
+    def simulate_batch(self, state: Any, controls: List[Any], env: Any) -> Tuple[Any, SimResult, int]:
+        """Apply controls in order until the game ends.
+
+        Returns (final_state, result, controls_used). Override for a faster
+        single-pass validation in bulk output games.
+        """
+        result = SimResult('running')
+        for used, control in enumerate(controls, 1):
+            state, result = self.simulate(state, control, env)
+            if result.status != 'running':
+                return state, result, used
+        return state, result, len(controls)
+
     def format_result(self, state: Any) -> str:
         """Format final state for display."""
         return str(state)
 
+    # State copying (override in subclass with cheaper versions)
+
+    def clone_state(self, state: Any) -> Any:
+        """Copy of state that can be modified without affecting the original.
+
+        Parts that simulate never modifies in place may be shared.
+        """
+        return copy.deepcopy(state)
+
+    def snapshot(self, state: Any) -> Any:
+        """Capture state plus any per-game data the model keeps on itself.
+
+        ``state`` must be the model's current state (the last one loaded or
+        returned by simulate). The snapshot is never modified afterwards and
+        can be restored any number of times, on this or another instance
+        of the model.
+        """
+        return self.clone_state(state)
+
+    def restore(self, snapshot: Any) -> Any:
+        """Reinstate a snapshot as the current game and return its state."""
+        return self.clone_state(snapshot)
+
     # Trace support methods (optional, override in subclass)
 
     def get_traces_dir(self) -> Optional[Path]:
@@ -77,10 +128,44 @@ class GameModel(ABC):
             return []
         return sorted([f.stem for f in traces_dir.glob("*.json")])
 
+    def diff_state(self, state: Any, expected: dict) -> List[FieldDiff]:
+        """Compare state with expected trace entry, field by field."""
+        return []  # Override in subclass for actual comparison
+
     def compare_state(self, state: Any, expected: dict) -> List[str]:
         """Compare state with expected trace entry. Return list of mismatches."""
-        return []  # Override in subclass for actual comparison
+        return [str(diff) for diff in self.diff_state(state, expected)]
 
     def get_required_actions(self, state: Any, player_id: int = 0) -> int:
         """Return number of actions expected from player each turn. Default 1."""
         return 1
+
+    def score(self, env: Any, state: Any, result: str) -> Optional[Dict[str, float]]:
+        """Quality metrics of a finished single-agent game, by name.
+
+        ``result`` is the runner's status ('success', 'failure: ...', ...).
+        The "score" entry is what CodinGame ranks solutions by (higher is
+        better); other entries are informative. None if the model does not
+        score games.
+        """
+        return None
+
+    def get_scores(self, state: Any) -> Optional[List[int]]:
+        """Per-player scores of a multi-agent game state (higher is better).
+
+        None if the model does not score players.
+        """
+        return None
+
+    def get_winner(self, state: Any) -> Optional[int]:
+        """Winning player of a finished multi-agent game, None for a draw.
+
+        Defaults to the unique best score from get_scores.
+        """
+        scores = self.get_scores(state)
+        if not scores:
+            return None
+        best = max(scores)
+        if scores.count(best) > 1:
+            return None
+        return scores.index(best)
@@ -1,17 +1,19 @@
 """Cellularena (Winter Challenge 2024) game model plugin."""
 import json
+import sys
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List, Tuple, Optional, Dict, Any
 
-from .base import GameModel, SimResult
+from .base import FieldDiff, GameModel, SimResult
+from .cellularena_gen import GEN_PREFIX, parse_gen_name, generate_test_case
 
 
 TESTS_DIR = Path(__file__).parent.parent / "tests" / "cellularena"
 TRACES_DIR = Path(__file__).parent.parent / "traces" / "cellularena"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Entity:
     """An entity on the grid."""
     x: int
@@ -24,16 +26,17 @@ class Entity:
     organ_root_id: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class State:
     """Current game state."""
     entities: List[Entity]
     proteins: Dict[int, Dict[str, int]]  # {player_id: {A: 10, B: 0, ...}}
     next_organ_id: int
     turn: int = 0
+    organ_counts: Tuple[int, ...] = ()  # Organs per player, kept up to date by simulate
 
 
-@dataclass
+@dataclass(slots=True)
 class Environment:
     """Game environment (static)."""
     width: int
@@ -53,9 +56,24 @@ DIR_VECTORS = {
 
 # Organ types that are valid
 ORGAN_TYPES = {"ROOT", "BASIC", "HARVESTER", "TENTACLE", "SPORER"}
+PROTEIN_TYPES = ("A", "B", "C", "D")
 
 
-@dataclass
+def count_organs(entities: List[Entity], num_players: int) -> Tuple[int, ...]:
+    """Organs per player, by scanning all entities."""
+    counts = [0] * num_players
+    for e in entities:
+        if e.type in ORGAN_TYPES and 0 <= e.owner < num_players:
+            counts[e.owner] += 1
+    return tuple(counts)
+
+
+def add_organs(counts: Tuple[int, ...], player_id: int, delta: int) -> Tuple[int, ...]:
+    """Organ counts with one player's count changed by delta."""
+    return counts[:player_id] + (counts[player_id] + delta,) + counts[player_id + 1:]
+
+
+@dataclass(slots=True)
 class Control:
     """Player's output command."""
     player_id: int
@@ -78,9 +96,10 @@ class Control:
             organ_id = int(parts[1])
             x = int(parts[2])
             y = int(parts[3])
-            organ_type = parts[4]
+            # Interned: they end up in every organ grown from this command
+            organ_type = sys.intern(parts[4])
             # Direction is optional, defaults to N
-            organ_dir = parts[5] if len(parts) >= 6 else "N"
+            organ_dir = sys.intern(parts[5]) if len(parts) >= 6 else "N"
             return Control(
                 player_id=player_id,
                 action="GROW",
@@ -135,11 +154,16 @@ class CellularenaModel(GameModel):
     def get_test_cases(self) -> dict[str, str]:
         return {name: tc.get("name", name) for name, tc in self._test_cases.items()}
 
-    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+    def get_test_case_data(self, name: str) -> dict:
+        """Test case in the JSON file format (generated on the fly for gen: names)."""
+        if name.startswith(GEN_PREFIX):
+            return generate_test_case(*parse_gen_name(name))
         if name not in self._test_cases:
             raise ValueError(f"Unknown test case: {name}. Available: {list(self._test_cases.keys())}")
+        return self._test_cases[name]
 
-        tc = self._test_cases[name]
+    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+        tc = self.get_test_case_data(name)
         width = tc["width"]
         height = tc["height"]
         num_players = tc.get("num_players", 2)
@@ -151,10 +175,10 @@ class CellularenaModel(GameModel):
             entity = Entity(
                 x=e["x"],
                 y=e["y"],
-                type=e["type"],
+                type=sys.intern(e["type"]),
                 owner=e.get("owner", -1),
                 organ_id=e.get("organId", 0),
-                organ_dir=e.get("organDir", "N"),
+                organ_dir=sys.intern(e.get("organDir", "N")),
                 organ_parent_id=e.get("organParentId", 0),
                 organ_root_id=e.get("organRootId", 0)
             )
@@ -187,7 +211,8 @@ class CellularenaModel(GameModel):
             entities=entities,
             proteins=proteins,
             next_organ_id=max_organ_id + 1,
-            turn=0
+            turn=0,
+            organ_counts=count_organs(entities, num_players)
         )
 
         return env, state
@@ -353,7 +378,8 @@ class CellularenaModel(GameModel):
             entities=new_entities,
             proteins=new_proteins,
             next_organ_id=state.next_organ_id + 1,
-            turn=state.turn
+            turn=state.turn,
+            organ_counts=add_organs(state.organ_counts, player_id, 1)
         )
 
         return new_state, None
@@ -466,7 +492,8 @@ class CellularenaModel(GameModel):
             entities=new_entities,
             proteins=new_proteins,
             next_organ_id=state.next_organ_id + 1,
-            turn=state.turn
+            turn=state.turn,
+            organ_counts=add_organs(state.organ_counts, player_id, 1)
         )
 
         return new_state, None
@@ -498,13 +525,20 @@ class CellularenaModel(GameModel):
             return state
 
         # Remove destroyed organs
-        new_entities = [e for e in state.entities if e.organ_id not in organs_to_destroy]
+        new_entities = []
+        counts = list(state.organ_counts)
+        for e in state.entities:
+            if e.organ_id in organs_to_destroy:
+                counts[e.owner] -= 1
+            else:
+                new_entities.append(e)
 
         return State(
             entities=new_entities,
             proteins=state.proteins,
             next_organ_id=state.next_organ_id,
-            turn=state.turn
+            turn=state.turn,
+            organ_counts=tuple(counts)
         )
 
     def _mark_organ_tree(self, entities: List[Entity], organ_id: int, marked: set):
@@ -547,7 +581,8 @@ class CellularenaModel(GameModel):
             entities=state.entities,
             proteins=new_proteins,
             next_organ_id=state.next_organ_id,
-            turn=state.turn
+            turn=state.turn,
+            organ_counts=state.organ_counts
         )
 
     def simulate(
@@ -598,7 +633,8 @@ class CellularenaModel(GameModel):
                 entities=new_entities,
                 proteins=current_state.proteins,
                 next_organ_id=current_state.next_organ_id,
-                turn=current_state.turn
+                turn=current_state.turn,
+                organ_counts=current_state.organ_counts
             )
 
         # Phase 3: Apply valid GROW commands
@@ -628,10 +664,16 @@ class CellularenaModel(GameModel):
             entities=current_state.entities,
             proteins=current_state.proteins,
             next_organ_id=current_state.next_organ_id,
-            turn=state.turn + 1
+            turn=state.turn + 1,
+            organ_counts=current_state.organ_counts
         )
 
         # Check game end conditions
+        eliminated = [p for p, count in enumerate(new_state.organ_counts) if count == 0]
+        if eliminated:
+            players = ", ".join(f"P{p}" for p in eliminated)
+            return new_state, SimResult('success', f"No organs left: {players}")
+
         if new_state.turn >= 100:
             return new_state, SimResult('success', 'Max turns reached')
 
@@ -642,14 +684,51 @@ class CellularenaModel(GameModel):
 
         return new_state, SimResult('running')
 
+    def clone_state(self, state: State) -> State:
+        # Entities are replaced, never modified, so the list copy can share them
+        return State(
+            entities=state.entities[:],
+            proteins={p: v.copy() for p, v in state.proteins.items()},
+            next_organ_id=state.next_organ_id,
+            turn=state.turn,
+            organ_counts=state.organ_counts
+        )
+
+    def snapshot(self, state: State) -> tuple:
+        """(entities tuple, ((player_id, (A, B, C, D)), ...), next_organ_id, turn, organ_counts)."""
+        proteins = tuple((p, tuple(v[t] for t in PROTEIN_TYPES)) for p, v in state.proteins.items())
+        return (tuple(state.entities), proteins, state.next_organ_id, state.turn, state.organ_counts)
+
+    def restore(self, snapshot: tuple) -> State:
+        entities, proteins, next_organ_id, turn, organ_counts = snapshot
+        return State(
+            entities=list(entities),
+            proteins={p: dict(zip(PROTEIN_TYPES, v)) for p, v in proteins},
+            next_organ_id=next_organ_id,
+            turn=turn,
+            organ_counts=organ_counts
+        )
+
     def format_result(self, state: State) -> str:
-        p0_organs = sum(1 for e in state.entities if e.type in ORGAN_TYPES and e.owner == 0)
-        p1_organs = sum(1 for e in state.entities if e.type in ORGAN_TYPES and e.owner == 1)
-        return f"Turn {state.turn}: P0={p0_organs} organs, P1={p1_organs} organs"
+        organs = ", ".join(f"P{p}={count} organs" for p, count in enumerate(state.organ_counts))
+        return f"Turn {state.turn}: {organs}"
 
     def get_traces_dir(self):
         return TRACES_DIR
 
+    def get_scores(self, state: State) -> List[int]:
+        """Organ count per player."""
+        return list(state.organ_counts)
+
+    def get_winner(self, state: State) -> Optional[int]:
+        """Most organs wins; ties go to the most proteins in total, then draw (None)."""
+        keys = [(count, sum(state.proteins.get(p, {}).values()))
+                for p, count in enumerate(state.organ_counts)]
+        best = max(keys)
+        if keys.count(best) > 1:
+            return None
+        return keys.index(best)
+
     def get_required_actions(self, state: State, player_id: int = 0) -> int:
         """Return number of actions expected from player each turn."""
         organism_roots = set()
@@ -658,9 +737,9 @@ class CellularenaModel(GameModel):
                 organism_roots.add(e.organ_root_id)
         return max(1, len(organism_roots))
 
-    def compare_state(self, state: State, expected: dict) -> List[str]:
+    def diff_state(self, state: State, expected: dict) -> List[FieldDiff]:
         """Compare state with expected trace entry."""
-        mismatches = []
+        diffs = []
 
         # Compare proteins
         exp_proteins = expected.get("proteins", {})
@@ -671,7 +750,7 @@ class CellularenaModel(GameModel):
                 actual_val = actual_p.get(ptype, 0)
                 exp_val = exp_p.get(ptype, 0)
                 if actual_val != exp_val:
-                    mismatches.append(f"P{pid} {ptype}: got {actual_val}, expected {exp_val}")
+                    diffs.append(FieldDiff(f"P{pid} {ptype}", actual_val, exp_val))
 
         # Compare new organs
         exp_organs = expected.get("new_organs", [])
@@ -682,9 +761,10 @@ class CellularenaModel(GameModel):
                     e.type == exp_o["type"] and e.owner == exp_o["owner"]):
                     found = True
                     if e.organ_id != exp_o.get("organId", e.organ_id):
-                        mismatches.append(f"Organ at ({e.x},{e.y}): id {e.organ_id}, expected {exp_o['organId']}")
+                        diffs.append(FieldDiff(f"organ ({e.x},{e.y}) id", e.organ_id, exp_o["organId"]))
                     break
             if not found:
-                mismatches.append(f"Expected organ at ({exp_o['x']},{exp_o['y']}) not found")
+                diffs.append(FieldDiff(f"organ ({exp_o['x']},{exp_o['y']})", None,
+                                       f"{exp_o['type']} of P{exp_o['owner']}"))
 
-        return mismatches
+        return diffs
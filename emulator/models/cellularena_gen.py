@@ -0,0 +1,164 @@
+"""Seeded symmetric map generator for Cellularena.
+
+Maps are point-symmetric around the center, like the contest maps: each
+wall and protein source at (x, y) has a twin at (W-1-x, H-1-y), and player
+1's root mirrors player 0's. Walls are re-rolled until both roots can reach
+each other, so every map is playable.
+
+Generated test cases are addressed by name: ``gen:<seed>`` (size picked by
+the seed) or ``gen:<width>x<height>:<seed>``, optionally followed by
+densities, e.g. ``gen:30x15:7:walls=0.2,proteins=0.1``.
+"""
+import random
+from collections import deque
+from typing import Optional, Set, Tuple
+
+GEN_PREFIX = "gen:"
+
+PROTEIN_SOURCES = ("A", "B", "C", "D")
+NEIGHBORS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# Contest map sizes: width 18..24, height width / 2
+MIN_WIDTH = 18
+MAX_WIDTH = 24
+
+MAX_ATTEMPTS = 100
+
+# Default fractions of all cells that are walls and protein sources
+WALL_DENSITY = 0.15
+PROTEIN_DENSITY = 0.06
+
+
+# Density options in generated names, mapped to generate_test_case arguments
+DENSITY_OPTIONS = {"walls": "wall_density", "proteins": "protein_density"}
+
+
+def parse_gen_name(name: str) -> Tuple[Optional[int], Optional[int], int, float, float]:
+    """Parse 'gen:[<W>x<H>:]<seed>[:walls=<d>,proteins=<d>]'.
+
+    Returns (width, height, seed, wall_density, protein_density); width and
+    height are None when the seed picks the size, and densities not given
+    keep their defaults.
+    """
+    parts = name[len(GEN_PREFIX):].split(":")
+    densities = {"wall_density": WALL_DENSITY, "protein_density": PROTEIN_DENSITY}
+    if len(parts) > 1 and "=" in parts[-1]:
+        for option in parts.pop().split(","):
+            key, _, value = option.partition("=")
+            if key.strip() not in DENSITY_OPTIONS:
+                raise ValueError(f"Unknown option '{key}' in '{name}', expected {', '.join(DENSITY_OPTIONS)}")
+            try:
+                density = float(value)
+            except ValueError:
+                raise ValueError(f"Invalid density '{option}' in '{name}'")
+            if not 0 <= density <= 1:
+                raise ValueError(f"Density '{option}' in '{name}' must be between 0 and 1")
+            densities[DENSITY_OPTIONS[key.strip()]] = density
+    try:
+        if len(parts) == 1:
+            width = height = None
+            seed = int(parts[0])
+        else:
+            size, seed = parts
+            width, height = size.lower().split("x")
+            width, height, seed = int(width), int(height), int(seed)
+    except ValueError:
+        raise ValueError(f"Invalid generated test case '{name}', expected gen:<seed> or gen:<W>x<H>:<seed>")
+    if width is not None and (width < 2 or height < 1):
+        raise ValueError(f"Map {width}x{height} is too small")
+    return width, height, seed, densities["wall_density"], densities["protein_density"]
+
+
+def _mirror(x: int, y: int, width: int, height: int) -> Tuple[int, int]:
+    return width - 1 - x, height - 1 - y
+
+
+def _connected(start: Tuple[int, int], goal: Tuple[int, int], walls: Set[Tuple[int, int]],
+               width: int, height: int) -> bool:
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        if (x, y) == goal:
+            return True
+        for dx, dy in NEIGHBORS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and (nx, ny) not in walls and (nx, ny) not in seen:
+                seen.add((nx, ny))
+                queue.append((nx, ny))
+    return False
+
+
+def generate_test_case(
+    width: Optional[int],
+    height: Optional[int],
+    seed: int,
+    wall_density: float = WALL_DENSITY,
+    protein_density: float = PROTEIN_DENSITY
+) -> dict:
+    """Generate a symmetric map in the tests/cellularena JSON format.
+
+    Densities are fractions of all cells. Starting proteins are drawn from
+    the seed and are the same for both players.
+    """
+    rng = random.Random(seed)
+    if width is None:
+        width = rng.randint(MIN_WIDTH, MAX_WIDTH)
+        height = width // 2
+
+    # Player 0 starts near the left edge, player 1 at the mirrored cell
+    root = (rng.randrange(0, max(1, width // 4)), rng.randrange(height))
+    twin_root = _mirror(*root, width, height)
+    if twin_root == root:
+        raise ValueError(f"Map {width}x{height} is too small for two roots")
+    reserved = {root, twin_root}
+    for x, y in (root, twin_root):
+        reserved.update((x + dx, y + dy) for dx, dy in NEIGHBORS)
+
+    # Each pair is one cell and its twin; the center cell is its own twin
+    pairs = []
+    for y in range(height):
+        for x in range(width):
+            twin = _mirror(x, y, width, height)
+            if (x, y) <= twin and (x, y) not in reserved and twin not in reserved:
+                pairs.append(((x, y), twin))
+
+    num_cells = width * height
+    for _ in range(MAX_ATTEMPTS):
+        rng.shuffle(pairs)
+        wall_pairs = min(len(pairs), int(num_cells * wall_density / 2))
+        walls = {cell for pair in pairs[:wall_pairs] for cell in pair}
+        if _connected(root, twin_root, walls, width, height):
+            break
+    else:
+        walls = set()
+        wall_pairs = 0
+
+    protein_pairs = min(len(pairs) - wall_pairs, int(num_cells * protein_density / 2))
+    sources = []
+    for cell, twin in pairs[wall_pairs:wall_pairs + protein_pairs]:
+        kind = rng.choice(PROTEIN_SOURCES)
+        sources.append((cell, kind))
+        if twin != cell:
+            sources.append((twin, kind))
+
+    entities = [
+        {"x": root[0], "y": root[1], "type": "ROOT", "owner": 0, "organId": 1,
+         "organDir": "N", "organParentId": 0, "organRootId": 1},
+        {"x": twin_root[0], "y": twin_root[1], "type": "ROOT", "owner": 1, "organId": 2,
+         "organDir": "N", "organParentId": 0, "organRootId": 2},
+    ]
+    for x, y in sorted(walls, key=lambda c: (c[1], c[0])):
+        entities.append({"x": x, "y": y, "type": "WALL", "owner": -1, "organId": 0})
+    for (x, y), kind in sorted(sources, key=lambda s: (s[0][1], s[0][0])):
+        entities.append({"x": x, "y": y, "type": kind, "owner": -1, "organId": 0})
+
+    proteins = {kind: rng.randint(3, 10) for kind in PROTEIN_SOURCES}
+    return {
+        "name": f"Generated {width}x{height} #{seed}",
+        "width": width,
+        "height": height,
+        "num_players": 2,
+        "entities": entities,
+        "proteins": {"0": dict(proteins), "1": dict(proteins)},
+    }
@@ -3,9 +3,10 @@ import json
 import math
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
-from .base import GameModel, SimResult
+from .base import FieldDiff, GameModel, SimResult
+from .mars_lander_gen import GEN_PREFIX, parse_gen_name, generate_test_case
 
 
 GRAVITY = 3.711
@@ -18,10 +19,27 @@ MIN_ANGLE = -90
 MAX_POWER = 4
 MIN_POWER = 0
 
+# Order of the "state" list in trace entries
+STATE_FIELDS = ("x", "y", "hSpeed", "vSpeed", "fuel", "rotate", "power")
+
 TESTS_DIR = Path(__file__).parent.parent / "tests" / "mars_lander"
 TRACES_DIR = Path(__file__).parent.parent / "traces" / "mars_lander"
 
 
+def convert_test_case(data: dict, name: str) -> dict:
+    """Convert the JSON file format to the internal test case format."""
+    lz = data["landingZone"]
+    init = data["initial"]
+    return {
+        "name": data.get("name", name),
+        "surface": data["surface"],
+        "landing_zone": (lz["x1"], lz["x2"], lz["y"]),
+        "initial": (init["x"], init["y"], init["hSpeed"], init["vSpeed"],
+                    init["fuel"], init["rotate"], init["power"]),
+        "data": data
+    }
+
+
 def load_test_cases_from_files() -> dict:
     """Load all test cases from JSON files in tests/mars_lander/."""
     test_cases = {}
@@ -33,25 +51,15 @@ def load_test_cases_from_files() -> dict:
             with open(json_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
 
-            # Convert JSON format to internal format
             name = json_file.stem  # e.g. "test_case_03"
-            lz = data["landingZone"]
-            init = data["initial"]
-
-            test_cases[name] = {
-                "name": data.get("name", name),
-                "surface": data["surface"],
-                "landing_zone": (lz["x1"], lz["x2"], lz["y"]),
-                "initial": (init["x"], init["y"], init["hSpeed"], init["vSpeed"],
-                           init["fuel"], init["rotate"], init["power"])
-            }
+            test_cases[name] = convert_test_case(data, name)
         except (json.JSONDecodeError, KeyError) as e:
             print(f"Warning: Could not load {json_file}: {e}")
 
     return test_cases
 
 
-@dataclass
+@dataclass(slots=True)
 class State:
     x: int
     y: int
@@ -65,7 +73,7 @@ class State:
         return f"{self.x} {self.y} {self.hSpeed} {self.vSpeed} {self.fuel} {self.rotate} {self.power}"
 
 
-@dataclass
+@dataclass(slots=True)
 class FloatState:
     """Internal state with floating point precision."""
     x: float
@@ -96,10 +104,11 @@ class FloatState:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Control:
     rotate: int
     power: int
+    player_id: int = 0
 
     @staticmethod
     def parse(line: str) -> 'Control':
@@ -107,20 +116,20 @@ class Control:
         return Control(int(parts[0]), int(parts[1]))
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Point:
     x: float
     y: float
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class LandingZone:
     x1: int
     x2: int
     y: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Surface:
     points: List[Point]
     landing_zone: LandingZone
@@ -274,11 +283,21 @@ class MarsLanderModel(GameModel):
     def get_test_cases(self) -> dict[str, str]:
         return {name: tc["name"] for name, tc in self._test_cases.items()}
 
-    def load_test_case(self, name: str) -> Tuple[Surface, State]:
+    def get_test_case_data(self, name: str) -> dict:
+        """Test case in the JSON file format (generated on the fly for gen: names)."""
+        if name.startswith(GEN_PREFIX):
+            return generate_test_case(parse_gen_name(name))
         if name not in self._test_cases:
             raise ValueError(f"Unknown test case: {name}. Available: {list(self._test_cases.keys())}")
+        return self._test_cases[name]["data"]
 
-        tc = self._test_cases[name]
+    def load_test_case(self, name: str) -> Tuple[Surface, State]:
+        if name.startswith(GEN_PREFIX):
+            tc = convert_test_case(generate_test_case(parse_gen_name(name)), name)
+        elif name not in self._test_cases:
+            raise ValueError(f"Unknown test case: {name}. Available: {list(self._test_cases.keys())}")
+        else:
+            tc = self._test_cases[name]
         surface = Surface(
             points=[Point(p[0], p[1]) for p in tc["surface"]],
             landing_zone=LandingZone(*tc["landing_zone"])
@@ -309,20 +328,49 @@ class MarsLanderModel(GameModel):
         self._float_state = new_fstate
         return new_state, result
 
+    def clone_state(self, state: State) -> State:
+        return State(state.x, state.y, state.hSpeed, state.vSpeed, state.fuel, state.rotate, state.power)
+
+    def snapshot(self, state: State) -> tuple:
+        """Flat tuple: the 7 integer fields followed by the float x, y, hSpeed, vSpeed."""
+        fstate = self._float_state
+        if fstate is None or fstate.to_int_state() != state:
+            fstate = FloatState.from_state(state)
+        return (state.x, state.y, state.hSpeed, state.vSpeed, state.fuel, state.rotate, state.power,
+                fstate.x, fstate.y, fstate.hSpeed, fstate.vSpeed)
+
+    def restore(self, snapshot: tuple) -> State:
+        x, y, h_speed, v_speed, fuel, rotate, power, fx, fy, fh_speed, fv_speed = snapshot
+        self._float_state = FloatState(fx, fy, fh_speed, fv_speed, fuel, rotate, power)
+        return State(x, y, h_speed, v_speed, fuel, rotate, power)
+
+    def score(self, surface: Surface, state: State, result: str) -> Dict[str, float]:
+        """Remaining fuel (the CodinGame score), landing speeds and the
+        distance to the nearest landing zone edge (negative outside it)."""
+        lz = surface.landing_zone
+        return {
+            "score": state.fuel if result == 'success' else 0,
+            "fuel": state.fuel,
+            "h_speed": abs(state.hSpeed),
+            "v_speed": abs(state.vSpeed),
+            "margin": min(state.x - lz.x1, lz.x2 - state.x),
+        }
+
     def format_result(self, state: State) -> str:
         return f"pos=({state.x}, {state.y}), speed=({state.hSpeed}, {state.vSpeed}), angle={state.rotate}, fuel={state.fuel}"
 
     def get_traces_dir(self):
         return TRACES_DIR
 
-    def compare_state(self, state: State, expected: dict) -> List[str]:
+    def diff_state(self, state: State, expected: dict) -> List[FieldDiff]:
         """Compare state with expected trace entry."""
-        mismatches = []
+        diffs = []
 
         exp_state = expected.get("state", [])
         if exp_state:
             actual = [state.x, state.y, state.hSpeed, state.vSpeed, state.fuel, state.rotate, state.power]
-            if actual != exp_state:
-                mismatches.append(f"state: got {actual}, expected {exp_state}")
+            for field, got, exp in zip(STATE_FIELDS, actual, exp_state):
+                if got != exp:
+                    diffs.append(FieldDiff(field, got, exp))
 
-        return mismatches
+        return diffs
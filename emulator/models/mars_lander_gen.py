@@ -0,0 +1,127 @@
+"""Seeded terrain generator for Mars Lander.
+
+Surfaces span the whole 7000m map with exactly one flat landing zone (at
+least 1000m wide). Some maps put the landing zone in a cave: the ground
+rises over it into a roof that overhangs the zone and folds back, so the
+surface is not a function of x there, as in the "Cave" test cases. The
+lander starts above the terrain with a random speed, attitude and fuel.
+
+Maps are built with the cave opening to the right and mirrored half of the
+time. Generated maps are valid but not guaranteed to be solvable.
+
+Generated test cases are addressed by name: ``gen:<seed>``.
+"""
+import random
+from typing import List, Tuple
+
+GEN_PREFIX = "gen:"
+
+MAP_WIDTH = 7000
+MAP_HEIGHT = 3000
+MIN_ZONE_WIDTH = 1000
+MAX_ZONE_WIDTH = 1500
+MIN_GROUND = 100
+MAX_GROUND = 2500
+
+Point = Tuple[int, int]
+
+
+def parse_gen_name(name: str) -> int:
+    """Parse 'gen:<seed>' into the seed."""
+    try:
+        return int(name[len(GEN_PREFIX):])
+    except ValueError:
+        raise ValueError(f"Invalid generated test case '{name}', expected gen:<seed>")
+
+
+def _ground(rng: random.Random, x_from: int, x_to: int, y_from: int, y_to: int) -> List[Point]:
+    """Random ground points strictly between x_from and x_to, then (x_to, y_to).
+
+    Consecutive heights always differ so no second flat zone appears.
+    """
+    points = []
+    x, y = x_from, y_from
+    while x_to - x > 700:
+        x += rng.randrange(200, 701, 50)
+        y = rng.choice([h for h in range(MIN_GROUND, MAX_GROUND, 50) if h != y])
+        points.append((x, y))
+    if y == y_to:
+        points.append(((x + x_to) // 2, y_to + 50))
+    points.append((x_to, y_to))
+    return points
+
+
+def surface_heights(surface: List[Point], x: float) -> List[float]:
+    """Heights of every surface segment spanning x (several under an overhang)."""
+    heights = []
+    for (x1, y1), (x2, y2) in zip(surface, surface[1:]):
+        lo, hi = min(x1, x2), max(x1, x2)
+        if lo <= x <= hi and x1 != x2:
+            heights.append(y1 + (x - x1) * (y2 - y1) / (x2 - x1))
+    return heights
+
+
+def generate_test_case(seed: int, cave_probability: float = 0.3) -> dict:
+    """Generate a test case in the tests/mars_lander JSON format."""
+    rng = random.Random(seed)
+    cave = rng.random() < cave_probability
+
+    zone_width = rng.randint(MIN_ZONE_WIDTH, MAX_ZONE_WIDTH) // 50 * 50
+    margin = 1000 if cave else 300
+    x1 = rng.randrange(margin, MAP_WIDTH - zone_width - 300, 50)
+    x2 = x1 + zone_width
+    zone_y = rng.randrange(MIN_GROUND, 1000 if cave else 2000, 50)
+
+    if cave:
+        # Ground climbs to a roof over the zone that ends short of its right
+        # edge (the entrance), turns back underneath and drops to the zone
+        roof_bottom = zone_y + rng.randrange(700, 1100, 50)
+        roof_top = min(MAP_HEIGHT - 400, roof_bottom + rng.randrange(200, 500, 50))
+        wall_x = x1 - rng.randrange(100, 300, 50)
+        roof_start = wall_x - rng.randrange(200, 500, 50)
+        roof_end = x2 - rng.randrange(50, 300, 50)
+        y0 = rng.randrange(MIN_GROUND, MAX_GROUND, 50)
+        left = _ground(rng, 0, roof_start, y0, roof_top)
+        cave_points = [
+            ((roof_start + roof_end) // 2, roof_top + rng.choice((-100, 100))),
+            (roof_end, roof_top),
+            (roof_end + 50, roof_bottom),
+            (wall_x, roof_bottom - rng.choice((50, 100))),
+            (wall_x - 50, zone_y + rng.randrange(200, 600, 50)),
+            (x1, zone_y),
+        ]
+        surface = [(0, y0)] + left + cave_points
+    else:
+        surface = [(0, rng.randrange(MIN_GROUND, MAX_GROUND, 50))]
+        surface += _ground(rng, 0, x1, surface[0][1], zone_y)
+
+    surface.append((x2, zone_y))
+    surface += _ground(rng, x2, MAP_WIDTH - 1, zone_y, rng.randrange(MIN_GROUND, MAX_GROUND, 50))
+
+    # Start above everything within reach, away from the zone horizontally
+    start_x = rng.choice((rng.randrange(200, max(201, x1 - 500)),
+                          rng.randrange(min(x2 + 500, MAP_WIDTH - 201), MAP_WIDTH - 200)))
+    floor = max(surface_heights(surface, start_x) or [0])
+    start_y = rng.randrange(int(min(floor + 300, MAP_HEIGHT - 200)), MAP_HEIGHT - 100)
+    initial = {
+        "x": start_x,
+        "y": start_y,
+        "hSpeed": rng.randrange(-100, 101, 10),
+        "vSpeed": rng.randrange(-40, 1, 10),
+        "fuel": rng.randrange(500, 2001, 50),
+        "rotate": rng.randrange(-90, 91, 15),
+        "power": 0,
+    }
+
+    if cave and rng.random() < 0.5:
+        # Mirror so caves open to the left as often as to the right
+        surface = [(MAP_WIDTH - 1 - x, y) for x, y in reversed(surface)]
+        x1, x2 = MAP_WIDTH - 1 - x2, MAP_WIDTH - 1 - x1
+        initial.update(x=MAP_WIDTH - 1 - initial["x"], hSpeed=-initial["hSpeed"], rotate=-initial["rotate"])
+
+    return {
+        "name": f"Generated #{seed}{' (cave)' if cave else ''}",
+        "surface": [list(p) for p in surface],
+        "landingZone": {"x1": x1, "x2": x2, "y": zone_y},
+        "initial": initial,
+    }
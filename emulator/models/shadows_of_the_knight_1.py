@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Tuple, Optional
 
-from .base import GameModel, SimResult
+from .base import FieldDiff, GameModel, SimResult
 
 
 TESTS_DIR = Path(__file__).parent.parent / "tests" / "shadows-of-the-knight-1"
@@ -30,7 +30,7 @@ def load_test_cases_from_files() -> dict:
     return test_cases
 
 
-@dataclass
+@dataclass(slots=True)
 class State:
     """Batman's current state."""
     x: int
@@ -38,7 +38,7 @@ class State:
     turn: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Environment:
     """Game environment."""
     width: int
@@ -50,10 +50,11 @@ class Environment:
     bomb_y: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Control:
     """Player's output - direction to jump."""
     direction: str
+    player_id: int = 0
 
     @staticmethod
     def parse(line: str) -> 'Control':
@@ -109,11 +110,18 @@ class ShadowsOfTheKnight1Model(GameModel):
     def get_test_cases(self) -> dict[str, str]:
         return {name: tc.get("name", name) for name, tc in self._test_cases.items()}
 
-    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+    def add_test_case(self, name: str, data: dict) -> None:
+        """Register a synthesized test case (same fields as the JSON files)."""
+        self._test_cases[name] = data
+
+    def get_test_case_data(self, name: str) -> dict:
+        """Test case in the JSON file format."""
         if name not in self._test_cases:
             raise ValueError(f"Unknown test case: {name}. Available: {list(self._test_cases.keys())}")
+        return self._test_cases[name]
 
-        tc = self._test_cases[name]
+    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+        tc = self.get_test_case_data(name)
 
         bomb_x = tc.get("bomb_x")
         bomb_y = tc.get("bomb_y")
@@ -148,6 +156,17 @@ class ShadowsOfTheKnight1Model(GameModel):
             f"{env.start_x} {env.start_y}"
         ]
 
+    def clone_state(self, state: State) -> State:
+        return State(state.x, state.y, state.turn)
+
+    def snapshot(self, state: State) -> tuple:
+        """(x, y, turn, env): the environment holds the bomb position for turn input."""
+        return (state.x, state.y, state.turn, self._env)
+
+    def restore(self, snapshot: tuple) -> State:
+        x, y, turn, self._env = snapshot
+        return State(x, y, turn)
+
     def format_turn_input(self, state: State) -> str:
         """Format turn input - direction to the bomb."""
         if self._env is None:
@@ -198,14 +217,14 @@ class ShadowsOfTheKnight1Model(GameModel):
     def get_traces_dir(self):
         return TRACES_DIR
 
-    def compare_state(self, state: State, expected: dict) -> List[str]:
+    def diff_state(self, state: State, expected: dict) -> List[FieldDiff]:
         """Compare state with expected trace entry."""
-        mismatches = []
+        diffs = []
 
         exp_pos = expected.get("pos", [])
         if exp_pos:
             actual = [state.x, state.y]
             if actual != exp_pos:
-                mismatches.append(f"pos: got {actual}, expected {exp_pos}")
+                diffs.append(FieldDiff("pos", actual, exp_pos))
 
-        return mismatches
+        return diffs
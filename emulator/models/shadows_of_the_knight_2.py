@@ -3,9 +3,9 @@ import json
 import math
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import FrozenSet, List, Sequence, Tuple, Optional
 
-from .base import GameModel, SimResult
+from .base import FieldDiff, GameModel, SimResult
 
 
 TESTS_DIR = Path(__file__).parent.parent / "tests" / "shadows-of-the-knight-2"
@@ -31,7 +31,90 @@ def load_test_cases_from_files() -> dict:
     return test_cases
 
 
-@dataclass
+class CandidateRegion:
+    """Bomb positions still consistent with all feedback so far.
+
+    Each WARMER/COLDER/SAME answer restricts the bomb to one side of (or onto)
+    the perpendicular bisector of the jump, an integer half-plane
+    A*x + B*y <op> K. Intersections of half-planes are convex, so the region is
+    kept exactly as one [lo, hi] interval per column of the grid's shorter
+    axis, minus the cells already visited. Updates and counts cost
+    O(active columns), never O(W*H). Instances are immutable.
+    """
+
+    __slots__ = ('transposed', 'first', 'lo', 'hi', 'visited', 'size')
+
+    def __init__(self, transposed: bool, first: int, lo: List[int], hi: List[int],
+                 visited: FrozenSet[Tuple[int, int]]):
+        self.transposed = transposed  # True when columns run along y
+        self.first = first  # Column index of lo[0] / hi[0]
+        self.lo = lo
+        self.hi = hi
+        self.visited = visited  # Jumped-to cells, known not to hold the bomb
+        size = sum(h - l + 1 for l, h in zip(lo, hi) if h >= l)
+        self.size = size - sum(1 for x, y in visited if self._in_columns(x, y))
+
+    @staticmethod
+    def full(width: int, height: int) -> 'CandidateRegion':
+        transposed = width > height
+        columns, rows = (height, width) if transposed else (width, height)
+        return CandidateRegion(transposed, 0, [0] * columns, [rows - 1] * columns, frozenset())
+
+    def contains(self, x: int, y: int) -> bool:
+        """True if the bomb may still be at (x, y)."""
+        return self._in_columns(x, y) and (x, y) not in self.visited
+
+    def _in_columns(self, x: int, y: int) -> bool:
+        u, v = (y, x) if self.transposed else (x, y)
+        i = u - self.first
+        return 0 <= i < len(self.lo) and self.lo[i] <= v <= self.hi[i]
+
+    def found(self, x: int, y: int) -> 'CandidateRegion':
+        """Region once the bomb has been found at (x, y)."""
+        u, v = (y, x) if self.transposed else (x, y)
+        return CandidateRegion(self.transposed, u, [v], [v], frozenset())
+
+    def apply(self, prev_x: int, prev_y: int, x: int, y: int, direction: str) -> 'CandidateRegion':
+        """Region after jumping from (prev_x, prev_y) to (x, y) with this feedback."""
+        # |b-c|^2 - |b-p|^2 = A*bx + B*by - K, negative when WARMER
+        a = 2 * (prev_x - x)
+        b = 2 * (prev_y - y)
+        k = prev_x * prev_x + prev_y * prev_y - x * x - y * y
+        if self.transposed:
+            a, b = b, a
+        if b < 0:
+            a, b, k = -a, -b, -k
+            direction = {"WARMER": "COLDER", "COLDER": "WARMER"}.get(direction, direction)
+
+        lo, hi = self.lo[:], self.hi[:]
+        for i in range(len(lo)):
+            if lo[i] > hi[i]:
+                continue
+            r = k - a * (self.first + i)  # constraint on this column: b*v <op> r
+            if b == 0:
+                holds = {"WARMER": 0 < r, "COLDER": 0 > r}.get(direction, r == 0)
+                if not holds:
+                    lo[i], hi[i] = 1, 0
+            elif direction == "WARMER":
+                hi[i] = min(hi[i], (r - 1) // b)
+            elif direction == "COLDER":
+                lo[i] = max(lo[i], r // b + 1)
+            elif r % b == 0:
+                lo[i], hi[i] = max(lo[i], r // b), min(hi[i], r // b)
+            else:
+                lo[i], hi[i] = 1, 0
+
+        # Trim empty columns at both ends
+        start, end = 0, len(lo)
+        while start < end and lo[start] > hi[start]:
+            start += 1
+        while end > start and lo[end - 1] > hi[end - 1]:
+            end -= 1
+        visited = self.visited | {(x, y)}
+        return CandidateRegion(self.transposed, self.first + start, lo[start:end], hi[start:end], visited)
+
+
+@dataclass(slots=True)
 class State:
     """Batman's current state."""
     x: int
@@ -39,9 +122,11 @@ class State:
     prev_x: Optional[int] = None
     prev_y: Optional[int] = None
     turn: int = 0
+    region: Optional[CandidateRegion] = None  # None when tracking is disabled
+    eliminated: int = 0  # Candidates removed by the last jump
 
 
-@dataclass
+@dataclass(slots=True)
 class Environment:
     """Game environment."""
     width: int
@@ -53,11 +138,12 @@ class Environment:
     bomb_y: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Control:
     """Player's output - next position to jump to."""
     x: int
     y: int
+    player_id: int = 0
 
     @staticmethod
     def parse(line: str) -> 'Control':
@@ -65,34 +151,58 @@ class Control:
         return Control(int(parts[0]), int(parts[1]))
 
 
-def euclidean_distance(x1: int, y1: int, x2: int, y2: int) -> float:
-    """Calculate Euclidean distance between two points."""
+def squared_distance(x1: int, y1: int, x2: int, y2: int) -> int:
+    """Squared Euclidean distance between two points (exact integer)."""
     dx = x1 - x2
     dy = y1 - y2
-    return math.sqrt(dx * dx + dy * dy)
+    return dx * dx + dy * dy
 
 
 def get_direction(prev_x: int, prev_y: int, curr_x: int, curr_y: int,
                   bomb_x: int, bomb_y: int) -> str:
-    """Determine WARMER/COLDER/SAME based on distances."""
-    prev_dist = euclidean_distance(prev_x, prev_y, bomb_x, bomb_y)
-    curr_dist = euclidean_distance(curr_x, curr_y, bomb_x, bomb_y)
+    """Determine WARMER/COLDER/SAME based on distances.
+
+    Squared distances are compared as integers, which is exact for any
+    building size and avoids sqrt and epsilon comparisons.
+    """
+    prev_dist = squared_distance(prev_x, prev_y, bomb_x, bomb_y)
+    curr_dist = squared_distance(curr_x, curr_y, bomb_x, bomb_y)
 
-    # Use small epsilon for floating point comparison
-    eps = 1e-9
-    if curr_dist < prev_dist - eps:
+    if curr_dist < prev_dist:
         return "WARMER"
-    elif curr_dist > prev_dist + eps:
+    elif curr_dist > prev_dist:
         return "COLDER"
     else:
         return "SAME"
 
 
+DIRECTION_NAMES = ("COLDER", "SAME", "WARMER")  # Indexed by sign(prev_dist - curr_dist) + 1
+
+
+def get_directions(prev_x: Sequence[int], prev_y: Sequence[int],
+                   curr_x: Sequence[int], curr_y: Sequence[int],
+                   bomb_x: Sequence[int], bomb_y: Sequence[int]) -> List[str]:
+    """get_direction over equal-length sequences of (prev, curr, bomb) in one pass.
+
+    Same exact integer comparison, without a function call per triple
+    (see benchmarks/directions.py, which also checks it against get_direction).
+    """
+    names = DIRECTION_NAMES
+    return [
+        names[(d > 0) - (d < 0) + 1]
+        for d in (
+            (px - bx) * (px - bx) + (py - by) * (py - by) - (cx - bx) * (cx - bx) - (cy - by) * (cy - by)
+            for px, py, cx, cy, bx, by in zip(prev_x, prev_y, curr_x, curr_y, bomb_x, bomb_y)
+        )
+    ]
+
+
 class ShadowsOfTheKnight2Model(GameModel):
     """Shadows of the Knight Episode 2 game model."""
 
     name = "shadows_of_the_knight_2"
     description = "Shadows of the Knight Episode 2"
+    track_candidates = True  # Maintain CandidateRegion in every state
 
     def __init__(self):
         self._test_cases = load_test_cases_from_files()
@@ -101,11 +211,18 @@ class ShadowsOfTheKnight2Model(GameModel):
     def get_test_cases(self) -> dict[str, str]:
         return {name: tc.get("name", name) for name, tc in self._test_cases.items()}
 
-    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+    def add_test_case(self, name: str, data: dict) -> None:
+        """Register a synthesized test case (same fields as the JSON files)."""
+        self._test_cases[name] = data
+
+    def get_test_case_data(self, name: str) -> dict:
+        """Test case in the JSON file format."""
         if name not in self._test_cases:
             raise ValueError(f"Unknown test case: {name}. Available: {list(self._test_cases.keys())}")
+        return self._test_cases[name]
 
-        tc = self._test_cases[name]
+    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+        tc = self.get_test_case_data(name)
 
         bomb_x = tc.get("bomb_x")
         bomb_y = tc.get("bomb_y")
@@ -128,7 +245,8 @@ class ShadowsOfTheKnight2Model(GameModel):
             y=tc["start_y"],
             prev_x=None,
             prev_y=None,
-            turn=0
+            turn=0,
+            region=CandidateRegion.full(env.width, env.height) if self.track_candidates else None
         )
 
         self._env = env
@@ -142,6 +260,18 @@ class ShadowsOfTheKnight2Model(GameModel):
             f"{env.start_x} {env.start_y}"
         ]
 
+    def clone_state(self, state: State) -> State:
+        # CandidateRegion is immutable, so it is shared
+        return State(state.x, state.y, state.prev_x, state.prev_y, state.turn, state.region, state.eliminated)
+
+    def snapshot(self, state: State) -> tuple:
+        """(state copy, env): the environment holds the bomb position for turn input."""
+        return (self.clone_state(state), self._env)
+
+    def restore(self, snapshot: tuple) -> State:
+        state, self._env = snapshot
+        return self.clone_state(state)
+
     def format_turn_input(self, state: State) -> str:
         """Format turn input based on state and stored environment."""
         if state.prev_x is None:
@@ -166,46 +296,57 @@ class ShadowsOfTheKnight2Model(GameModel):
         if new_y < 0 or new_y >= env.height:
             return state, SimResult('failure', f"y={new_y} out of bounds [0, {env.height})")
 
+        new_state = State(
+            x=new_x, y=new_y,
+            prev_x=state.x, prev_y=state.y,
+            turn=new_turn
+        )
+
         # Check if bomb found
         if new_x == env.bomb_x and new_y == env.bomb_y:
-            new_state = State(
-                x=new_x, y=new_y,
-                prev_x=state.x, prev_y=state.y,
-                turn=new_turn
-            )
+            if state.region is not None:
+                new_state.region = state.region.found(new_x, new_y)
+                new_state.eliminated = state.region.size - 1
             return new_state, SimResult('success')
 
+        # Narrow the candidate region with the feedback this jump will produce
+        if state.region is not None:
+            direction = get_direction(state.x, state.y, new_x, new_y, env.bomb_x, env.bomb_y)
+            new_state.region = state.region.apply(state.x, state.y, new_x, new_y, direction)
+            new_state.eliminated = state.region.size - new_state.region.size
+
         # Check if out of jumps
         if new_turn >= env.max_jumps:
-            new_state = State(
-                x=new_x, y=new_y,
-                prev_x=state.x, prev_y=state.y,
-                turn=new_turn
-            )
             return new_state, SimResult('failure', f"ran out of jumps ({new_turn}/{env.max_jumps})")
 
         # Continue game
-        new_state = State(
-            x=new_x, y=new_y,
-            prev_x=state.x, prev_y=state.y,
-            turn=new_turn
-        )
         return new_state, SimResult('running')
 
     def format_result(self, state: State) -> str:
-        return f"pos=({state.x}, {state.y}), turn={state.turn}"
+        text = f"pos=({state.x}, {state.y}), turn={state.turn}"
+        region = state.region
+        if region is None or self._env is None:
+            return text
+        before = region.size + state.eliminated
+        text += f", candidates={region.size}"
+        if state.turn > 0 and before > 0:
+            text += f" (-{100.0 * state.eliminated / before:.1f}%)"
+            # Information gained per jump; 1.0 means every jump halved the region
+            total = self._env.width * self._env.height
+            text += f", {math.log2(total / max(1, region.size)) / state.turn:.2f} bits/jump"
+        return text
 
     def get_traces_dir(self):
         return TRACES_DIR
 
-    def compare_state(self, state: State, expected: dict) -> List[str]:
+    def diff_state(self, state: State, expected: dict) -> List[FieldDiff]:
         """Compare state with expected trace entry."""
-        mismatches = []
+        diffs = []
 
         exp_pos = expected.get("pos", [])
         if exp_pos:
             actual = [state.x, state.y]
             if actual != exp_pos:
-                mismatches.append(f"pos: got {actual}, expected {exp_pos}")
+                diffs.append(FieldDiff("pos", actual, exp_pos))
 
-        return mismatches
+        return diffs
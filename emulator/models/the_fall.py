@@ -4,7 +4,7 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List, Tuple, Optional, Dict
 
-from .base import GameModel, SimResult
+from .base import FieldDiff, GameModel, SimResult
 
 
 TESTS_DIR = Path(__file__).parent.parent / "tests" / "the-fall-3"
@@ -79,7 +79,7 @@ def load_test_cases_from_files() -> dict:
     return test_cases
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Entity:
     """Position and entry direction of Indy or a rock."""
     x: int
@@ -87,7 +87,7 @@ class Entity:
     entry: str  # TOP, LEFT, RIGHT
 
 
-@dataclass
+@dataclass(slots=True)
 class State:
     """Current game state."""
     grid: List[List[int]]  # Current room types (positive = mutable)
@@ -97,7 +97,7 @@ class State:
     turn: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Environment:
     """Game environment (static)."""
     width: int
@@ -105,14 +105,16 @@ class Environment:
     exit_x: int
     initial_grid: List[List[int]]
     locked: List[List[bool]]
+    scheduled_rocks: List[dict] = field(default_factory=list)  # {"turn", "x", "y", "entry"}
 
 
-@dataclass
+@dataclass(slots=True)
 class Control:
     """Player's output command."""
     action: str  # WAIT, LEFT, RIGHT
     x: int = -1
     y: int = -1
+    player_id: int = 0
 
     @staticmethod
     def parse(line: str) -> 'Control':
@@ -141,11 +143,14 @@ class TheFallModel(GameModel):
     def get_test_cases(self) -> dict[str, str]:
         return {name: tc.get("name", name) for name, tc in self._test_cases.items()}
 
-    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+    def get_test_case_data(self, name: str) -> dict:
+        """Test case in the JSON file format."""
         if name not in self._test_cases:
             raise ValueError(f"Unknown test case: {name}. Available: {list(self._test_cases.keys())}")
+        return self._test_cases[name]
 
-        tc = self._test_cases[name]
+    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+        tc = self.get_test_case_data(name)
         width = tc["width"]
         height = tc["height"]
         exit_x = tc["exit_x"]
@@ -184,7 +189,8 @@ class TheFallModel(GameModel):
             height=height,
             exit_x=exit_x,
             initial_grid=initial_grid,
-            locked=locked
+            locked=locked,
+            scheduled_rocks=scheduled_rocks
         )
 
         state = State(
@@ -195,9 +201,6 @@ class TheFallModel(GameModel):
             turn=0
         )
 
-        # Store scheduled rocks in environment for later
-        env.scheduled_rocks = scheduled_rocks
-
         return env, state
 
     def format_init_input(self, env: Environment) -> List[str]:
@@ -317,10 +320,9 @@ class TheFallModel(GameModel):
                 new_rocks.append(new_rock)
 
         # Add scheduled rocks for this turn
-        if hasattr(env, 'scheduled_rocks'):
-            for sr in env.scheduled_rocks:
-                if sr.get("turn") == state.turn + 1:
-                    new_rocks.append(Entity(sr["x"], sr["y"], sr["entry"]))
+        for sr in env.scheduled_rocks:
+            if sr.get("turn") == state.turn + 1:
+                new_rocks.append(Entity(sr["x"], sr["y"], sr["entry"]))
 
         # Check rock collisions (rocks at same position destroy each other)
         rock_positions = {}
@@ -357,6 +359,19 @@ class TheFallModel(GameModel):
 
         return new_state, SimResult('running')
 
+    def clone_state(self, state: State) -> State:
+        # Locked flags never change during a game and entities are never modified
+        return State([row[:] for row in state.grid], state.locked, state.indy, state.rocks[:], state.turn)
+
+    def snapshot(self, state: State) -> tuple:
+        """(grid rows as tuples, locked, indy, rocks tuple, turn)."""
+        return (tuple(tuple(row) for row in state.grid), state.locked, state.indy,
+                tuple(state.rocks), state.turn)
+
+    def restore(self, snapshot: tuple) -> State:
+        grid, locked, indy, rocks, turn = snapshot
+        return State([list(row) for row in grid], locked, indy, list(rocks), turn)
+
     def format_result(self, state: State) -> str:
         rocks_str = ", ".join(f"({r.x},{r.y},{r.entry})" for r in state.rocks)
         return f"Indy@({state.indy.x},{state.indy.y},{state.indy.entry}) rocks=[{rocks_str}]"
@@ -364,20 +379,20 @@ class TheFallModel(GameModel):
     def get_traces_dir(self):
         return TRACES_DIR
 
-    def compare_state(self, state: State, expected: dict) -> List[str]:
+    def diff_state(self, state: State, expected: dict) -> List[FieldDiff]:
         """Compare state with expected trace entry."""
-        mismatches = []
+        diffs = []
 
         exp_indy = expected.get("indy", [])
         if exp_indy:
             actual_indy = [state.indy.x, state.indy.y, state.indy.entry]
             if actual_indy != exp_indy:
-                mismatches.append(f"indy: got {actual_indy}, expected {exp_indy}")
+                diffs.append(FieldDiff("indy", actual_indy, exp_indy))
 
         exp_rocks = expected.get("rocks", [])
         actual_rocks = sorted([[r.x, r.y, r.entry] for r in state.rocks])
         exp_rocks_sorted = sorted(exp_rocks)
         if actual_rocks != exp_rocks_sorted:
-            mismatches.append(f"rocks: got {actual_rocks}, expected {exp_rocks_sorted}")
+            diffs.append(FieldDiff("rocks", actual_rocks, exp_rocks_sorted))
 
-        return mismatches
+        return diffs
@@ -2,9 +2,11 @@
 import json
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Tuple, Optional, Set
+from typing import Dict, Iterator, List, Tuple, Optional, Sequence, Set
 
-from .base import GameModel, SimResult
+from .base import FieldDiff, GameModel, SimResult
+from .there_is_no_spoon_gen import GEN_PREFIX, parse_gen_name, generate_test_case
+from . import there_is_no_spoon_solver
 
 
 TESTS_DIR = Path(__file__).parent.parent / "tests" / "there-is-no-spoon-2"
@@ -30,24 +32,135 @@ def load_test_cases_from_files() -> dict:
     return test_cases
 
 
-@dataclass
+Link = Tuple[int, int, int, int, int]  # (x1, y1, x2, y2, count)
+
+
+class ConnectionList:
+    """Persistent singly linked list of links, newest first.
+
+    Appending returns a new list that shares every existing cell, so each
+    state in a trajectory costs one cell instead of a copy of all links.
+    Pickling and deepcopy go through a flat tuple of the links, as the
+    default recursive walk of the cells overflows the stack on long lists.
+    """
+
+    __slots__ = ('link', 'prev', 'size')
+
+    def __init__(self, link: Optional[Link] = None, prev: Optional['ConnectionList'] = None):
+        self.link = link
+        self.prev = prev
+        self.size = prev.size + 1 if prev is not None else 0
+
+    def append(self, link: Link) -> 'ConnectionList':
+        return ConnectionList(link, self)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[Link]:
+        """Iterate links in the order they were added."""
+        links = []
+        cell = self
+        while cell.prev is not None:
+            links.append(cell.link)
+            cell = cell.prev
+        return reversed(links)
+
+    def __reduce__(self):
+        return _rebuild_connections, (tuple(self),)
+
+
+EMPTY_CONNECTIONS = ConnectionList()
+
+
+def _rebuild_connections(links: Tuple[Link, ...]) -> ConnectionList:
+    """Unpickle a ConnectionList from its links in the order they were added."""
+    connections = EMPTY_CONNECTIONS
+    for link in links:
+        connections = connections.append(link)
+    return connections
+
+
+class RemainingCounts:
+    """Persistent int array of links still needed per node (Baker's trick).
+
+    The newest version owns the buffer; older versions only hold a one-cell
+    delta pointing towards it. ``set`` is O(1) on the newest version, and
+    reading an older version reroots the buffer to it. A pickle or deepcopy
+    holds only this version's counts.
+    """
+
+    __slots__ = ('_data', '_index', '_value', '_next')
+
+    def __init__(self, data: List[int]):
+        self._data: Optional[List[int]] = data
+        self._index = 0
+        self._value = 0
+        self._next: Optional['RemainingCounts'] = None
+
+    def _reroot(self) -> List[int]:
+        if self._data is not None:
+            return self._data
+        path = []
+        node = self
+        while node._data is None:
+            path.append(node)
+            node = node._next
+        data = node._data
+        for diff in reversed(path):
+            newer = diff._next
+            index = diff._index
+            newer._data = None
+            newer._index = index
+            newer._value = data[index]
+            newer._next = diff
+            data[index] = diff._value
+            diff._data = data
+            diff._next = None
+        return data
+
+    def get(self, index: int) -> int:
+        return self._reroot()[index]
+
+    __getitem__ = get
+
+    def set(self, index: int, value: int) -> 'RemainingCounts':
+        data = self._reroot()
+        newer = RemainingCounts(data)
+        self._data = None
+        self._index = index
+        self._value = data[index]
+        self._next = newer
+        data[index] = value
+        return newer
+
+    def to_list(self) -> List[int]:
+        return list(self._reroot())
+
+    def __reduce__(self):
+        return RemainingCounts, (self.to_list(),)
+
+
+@dataclass(slots=True)
 class State:
-    """Current puzzle state."""
-    grid: List[List[int]]  # Remaining links needed: 0=empty, 1-8=node
-    connections: List[Tuple[int, int, int, int, int]] = field(default_factory=list)  # (x1,y1,x2,y2,count)
+    """Current puzzle state (shares structure with previous states)."""
+    remaining: RemainingCounts  # Links still needed, indexed like Environment.nodes
+    connections: ConnectionList = EMPTY_CONNECTIONS
+    unsatisfied: int = 0  # Nodes with remaining > 0
     done: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class Environment:
     """Puzzle environment."""
     width: int
     height: int
     initial_grid: List[List[int]]  # Original node values
     nodes: List[Tuple[int, int, int]]  # (x, y, value) for all nodes
+    node_index: Dict[Tuple[int, int], int] = field(default_factory=dict)  # (x, y) -> index in nodes
 
 
-@dataclass
+@dataclass(slots=True)
 class Control:
     """Player's output - one link."""
     x1: int
@@ -55,6 +168,7 @@ class Control:
     x2: int
     y2: int
     amount: int
+    player_id: int = 0
 
     @staticmethod
     def parse(line: str) -> 'Control':
@@ -71,6 +185,7 @@ class ThereIsNoSpoonModel(GameModel):
 
     name = "there_is_no_spoon"
     description = "There is no Spoon Episode 2"
+    bulk_output = True
 
     def __init__(self):
         self._test_cases = load_test_cases_from_files()
@@ -78,11 +193,16 @@ class ThereIsNoSpoonModel(GameModel):
     def get_test_cases(self) -> dict[str, str]:
         return {name: tc.get("name", name) for name, tc in self._test_cases.items()}
 
-    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+    def get_test_case_data(self, name: str) -> dict:
+        """Test case in the JSON file format (generated on the fly for gen: names)."""
+        if name.startswith(GEN_PREFIX):
+            return generate_test_case(*parse_gen_name(name))
         if name not in self._test_cases:
             raise ValueError(f"Unknown test case: {name}. Available: {list(self._test_cases.keys())}")
+        return self._test_cases[name]
 
-        tc = self._test_cases[name]
+    def load_test_case(self, name: str) -> Tuple[Environment, State]:
+        tc = self.get_test_case_data(name)
         width = tc["width"]
         height = tc["height"]
         lines = tc["grid"]
@@ -108,12 +228,14 @@ class ThereIsNoSpoonModel(GameModel):
             width=width,
             height=height,
             initial_grid=initial_grid,
-            nodes=nodes
+            nodes=nodes,
+            node_index={(x, y): i for i, (x, y, _) in enumerate(nodes)}
         )
 
-        # Deep copy for state
-        state_grid = [row[:] for row in initial_grid]
-        state = State(grid=state_grid)
+        state = State(
+            remaining=RemainingCounts([val for _, _, val in nodes]),
+            unsatisfied=len(nodes)
+        )
 
         return env, state
 
@@ -132,70 +254,126 @@ class ThereIsNoSpoonModel(GameModel):
     def parse_output(self, line: str) -> Control:
         return Control.parse(line)
 
-    def simulate(self, state: State, control: Control, env: Environment) -> Tuple[State, SimResult]:
-        """Apply one link. Stub - minimal validation."""
+    def _check_link(self, control: Control, env: Environment,
+                    remaining: Sequence[int]) -> Tuple[Optional[str], int, int, int, int]:
+        """Check one link against the rules and the counts still needed.
+
+        Returns (error, node_index_1, node_index_2, left_1, left_2), where
+        left_* are the counts the two nodes would need after the link.
+        """
         x1, y1, x2, y2, amount = control.x1, control.y1, control.x2, control.y2, control.amount
 
         # Basic validation
         if amount < 1 or amount > 2:
-            return state, SimResult('failure', f"Invalid amount: {amount}")
+            return f"Invalid amount: {amount}", -1, -1, 0, 0
 
         if x1 < 0 or x1 >= env.width or y1 < 0 or y1 >= env.height:
-            return state, SimResult('failure', f"({x1},{y1}) out of bounds")
+            return f"({x1},{y1}) out of bounds", -1, -1, 0, 0
 
         if x2 < 0 or x2 >= env.width or y2 < 0 or y2 >= env.height:
-            return state, SimResult('failure', f"({x2},{y2}) out of bounds")
+            return f"({x2},{y2}) out of bounds", -1, -1, 0, 0
 
         # Must be horizontal or vertical
         if x1 != x2 and y1 != y2:
-            return state, SimResult('failure', f"Link must be horizontal or vertical")
+            return f"Link must be horizontal or vertical", -1, -1, 0, 0
 
         if x1 == x2 and y1 == y2:
-            return state, SimResult('failure', f"Link endpoints must be different")
+            return f"Link endpoints must be different", -1, -1, 0, 0
 
-        # Create new state
-        new_grid = [row[:] for row in state.grid]
-        new_connections = state.connections + [(x1, y1, x2, y2, amount)]
-
-        # Decrement node values
-        new_grid[y1][x1] -= amount
-        new_grid[y2][x2] -= amount
+        i1 = env.node_index.get((x1, y1))
+        if i1 is None:
+            return f"({x1},{y1}) is not a node", -1, -1, 0, 0
+        i2 = env.node_index.get((x2, y2))
+        if i2 is None:
+            return f"({x2},{y2}) is not a node", -1, -1, 0, 0
 
         # Check for over-connection
-        if new_grid[y1][x1] < 0:
-            return state, SimResult('failure', f"Node ({x1},{y1}) has too many links")
-        if new_grid[y2][x2] < 0:
-            return state, SimResult('failure', f"Node ({x2},{y2}) has too many links")
+        left1 = remaining[i1] - amount
+        left2 = remaining[i2] - amount
+        if left1 < 0:
+            return f"Node ({x1},{y1}) has too many links", i1, i2, left1, left2
+        if left2 < 0:
+            return f"Node ({x2},{y2}) has too many links", i1, i2, left1, left2
 
-        new_state = State(grid=new_grid, connections=new_connections)
+        return None, i1, i2, left1, left2
 
-        # Check if all nodes satisfied
-        all_done = all(
-            new_grid[y][x] == 0
-            for x, y, _ in env.nodes
+    def simulate(self, state: State, control: Control, env: Environment) -> Tuple[State, SimResult]:
+        """Apply one link. Crossing links and connectivity are not checked."""
+        x1, y1, x2, y2, amount = control.x1, control.y1, control.x2, control.y2, control.amount
+
+        error, i1, i2, left1, left2 = self._check_link(control, env, state.remaining)
+        if error:
+            return state, SimResult('failure', error)
+
+        # New state shares the previous link list and count buffer
+        new_remaining = state.remaining.set(i1, left1).set(i2, left2)
+        unsatisfied = state.unsatisfied - (left1 == 0) - (left2 == 0)
+        new_state = State(
+            remaining=new_remaining,
+            connections=state.connections.append((x1, y1, x2, y2, amount)),
+            unsatisfied=unsatisfied
         )
 
-        if all_done:
+        if unsatisfied == 0:
             # TODO: Check connectivity
             new_state.done = True
             return new_state, SimResult('success')
 
         return new_state, SimResult('running')
 
+    def simulate_batch(self, state: State, controls: List[Control],
+                       env: Environment) -> Tuple[State, SimResult, int]:
+        """Apply all links in one pass over a flat count buffer."""
+        remaining = state.remaining.to_list()
+        connections = state.connections
+        unsatisfied = state.unsatisfied
+
+        for used, control in enumerate(controls, 1):
+            error, i1, i2, left1, left2 = self._check_link(control, env, remaining)
+            if error:
+                # Same contract as simulate(): the failing link is not applied
+                new_state = State(RemainingCounts(remaining), connections, unsatisfied)
+                return new_state, SimResult('failure', error), used
+
+            remaining[i1] = left1
+            remaining[i2] = left2
+            unsatisfied -= (left1 == 0) + (left2 == 0)
+            connections = connections.append(
+                (control.x1, control.y1, control.x2, control.y2, control.amount))
+
+            if unsatisfied == 0:
+                new_state = State(RemainingCounts(remaining), connections, unsatisfied, done=True)
+                return new_state, SimResult('success'), used
+
+        new_state = State(RemainingCounts(remaining), connections, unsatisfied)
+        return new_state, SimResult('running'), len(controls)
+
+    def solve(self, env: Environment, stats: Optional[dict] = None) -> Optional[List[Link]]:
+        """Reference solution for the puzzle, or None if unsolvable."""
+        return there_is_no_spoon_solver.solve(env, stats)
+
+    def check_solution(self, env: Environment, links: List[Link]) -> Optional[str]:
+        """Full rule check of a solution. Returns None if valid, else the violation."""
+        return there_is_no_spoon_solver.check_solution(env, links)
+
+    def clone_state(self, state: State) -> State:
+        # Remaining counts and connections are persistent, so they are shared
+        return State(state.remaining, state.connections, state.unsatisfied, state.done)
+
     def format_result(self, state: State) -> str:
         return f"connections={len(state.connections)}, done={state.done}"
 
     def get_traces_dir(self):
         return TRACES_DIR
 
-    def compare_state(self, state: State, expected: dict) -> List[str]:
+    def diff_state(self, state: State, expected: dict) -> List[FieldDiff]:
         """Compare connections with expected trace entry."""
-        mismatches = []
+        diffs = []
 
         exp_conns = expected.get("connections", [])
         if exp_conns:
             actual = [f"{c[0]} {c[1]} {c[2]} {c[3]} {c[4]}" for c in state.connections]
             if actual != exp_conns:
-                mismatches.append(f"connections: got {actual}, expected {exp_conns}")
+                diffs.append(FieldDiff("connections", actual, exp_conns))
 
-        return mismatches
+        return diffs
@@ -0,0 +1,90 @@
+"""Random solvable puzzle generator for There is no Spoon Episode 2.
+
+Puzzles are grown from a hidden solution: starting from one node, bridges are
+extended into free cells, either creating a new node or joining an existing
+one in line of sight. Node values are the sums of their bridges, so every
+generated puzzle is solvable by construction.
+
+Generated test cases are addressed by name: ``gen:<width>x<height>:<seed>``.
+"""
+import random
+from typing import Tuple
+
+GEN_PREFIX = "gen:"
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def parse_gen_name(name: str) -> Tuple[int, int, int]:
+    """Parse 'gen:<W>x<H>:<seed>' into (width, height, seed)."""
+    try:
+        size, seed = name[len(GEN_PREFIX):].split(":")
+        width, height = size.lower().split("x")
+        width, height, seed = int(width), int(height), int(seed)
+    except ValueError:
+        raise ValueError(f"Invalid generated test case '{name}', expected gen:<W>x<H>:<seed>")
+    if width < 1 or height < 1 or width * height < 2:
+        raise ValueError(f"Grid {width}x{height} is too small")
+    return width, height, seed
+
+
+def generate_test_case(width: int, height: int, seed: int, density: float = 0.15) -> dict:
+    """Generate a solvable puzzle in the tests/there-is-no-spoon-2 JSON format."""
+    rng = random.Random(seed)
+    target_nodes = max(2, int(width * height * density))
+
+    values = [[0] * width for _ in range(height)]
+    is_node = [[False] * width for _ in range(height)]
+    is_bridge = [[False] * width for _ in range(height)]
+    bridged = set()  # {(node_a, node_b)} already joined
+    nodes = [(rng.randrange(width), rng.randrange(height))]
+    is_node[nodes[0][1]][nodes[0][0]] = True
+
+    failures = 0
+    max_failures = 50 * target_nodes
+    while len(nodes) < target_nodes and failures < max_failures:
+        x, y = rng.choice(nodes)
+        dx, dy = rng.choice(DIRECTIONS)
+        length = rng.randint(2, max(2, max(width, height) // 3))
+
+        # Walk through free cells until the chosen length or an obstacle
+        path = []
+        cx, cy = x + dx, y + dy
+        end = None
+        while 0 <= cx < width and 0 <= cy < height and not is_bridge[cy][cx]:
+            if is_node[cy][cx]:
+                end = (cx, cy)
+                break
+            path.append((cx, cy))
+            if len(path) == length:
+                break
+            cx += dx
+            cy += dy
+
+        if end is None:
+            if not path:
+                failures += 1
+                continue
+            # New node at the end of the path
+            end = path.pop()
+            is_node[end[1]][end[0]] = True
+            nodes.append(end)
+        elif ((x, y), end) in bridged or (end, (x, y)) in bridged:
+            failures += 1
+            continue
+
+        count = rng.choice((1, 2))
+        values[y][x] += count
+        values[end[1]][end[0]] += count
+        bridged.add(((x, y), end))
+        for px, py in path:
+            is_bridge[py][px] = True
+
+    grid = [''.join(str(v) if is_node[y][x] else '.' for x, v in enumerate(row))
+            for y, row in enumerate(values)]
+    return {
+        "name": f"Generated {width}x{height} #{seed}",
+        "width": width,
+        "height": height,
+        "grid": grid,
+    }
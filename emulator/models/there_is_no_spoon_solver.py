@@ -0,0 +1,297 @@
+"""Reference Hashiwokakero solver for There is no Spoon Episode 2.
+
+Constraint propagation over per-bridge [lo, hi] bounds plus failed-literal
+probing, with backtracking on the most constrained node when propagation
+stalls and randomized restarts when a search budget runs out.
+"""
+import random
+from typing import List, Optional, Tuple
+
+# Search nodes allowed before the first restart (doubles on every restart)
+RESTART_BASE_LIMIT = 64
+
+# Directions to look for neighbors: right and down (left/up are the same bridges)
+NEIGHBOR_DIRS = ((1, 0), (0, 1))
+
+
+class Puzzle:
+    """Static bridge graph derived from a There is no Spoon environment."""
+
+    def __init__(self, env):
+        self.nodes = env.nodes  # (x, y, value)
+        self.values = [v for _, _, v in env.nodes]
+        self.edges: List[Tuple[int, int]] = []  # (node_a, node_b), a is left/above b
+        self.incident: List[List[int]] = [[] for _ in env.nodes]
+        self.crossings: List[List[int]] = []  # edge -> edges it crosses
+
+        grid = env.initial_grid
+        for a, (x, y, _) in enumerate(env.nodes):
+            for dx, dy in NEIGHBOR_DIRS:
+                nx, ny = x + dx, y + dy
+                while 0 <= nx < env.width and 0 <= ny < env.height and grid[ny][nx] == 0:
+                    nx += dx
+                    ny += dy
+                if 0 <= nx < env.width and 0 <= ny < env.height:
+                    b = env.node_index[(nx, ny)]
+                    self.incident[a].append(len(self.edges))
+                    self.incident[b].append(len(self.edges))
+                    self.edges.append((a, b))
+
+        self.crossings = [[] for _ in self.edges]
+        horizontal = [e for e, (a, b) in enumerate(self.edges) if self.nodes[a][1] == self.nodes[b][1]]
+        vertical = [e for e, (a, b) in enumerate(self.edges) if self.nodes[a][0] == self.nodes[b][0]]
+        for h in horizontal:
+            hx1, hy, _ = self.nodes[self.edges[h][0]]
+            hx2 = self.nodes[self.edges[h][1]][0]
+            for v in vertical:
+                vx, vy1, _ = self.nodes[self.edges[v][0]]
+                vy2 = self.nodes[self.edges[v][1]][1]
+                if hx1 < vx < hx2 and vy1 < hy < vy2:
+                    self.crossings[h].append(v)
+                    self.crossings[v].append(h)
+
+    def initial_bounds(self) -> Tuple[List[int], List[int]]:
+        """Return (lo, hi) bridge bounds before any deduction."""
+        lo = [0] * len(self.edges)
+        hi = []
+        isolated_pair = len(self.nodes) > 2
+        for a, b in self.edges:
+            cap = min(2, self.values[a], self.values[b])
+            # A single 1-1 or double 2-2 bridge would close off a component
+            if isolated_pair and self.values[a] == self.values[b] and self.values[a] <= 2:
+                cap = min(cap, self.values[a] - 1)
+            hi.append(cap)
+        return lo, hi
+
+
+def _set_bounds(puzzle: Puzzle, lo: List[int], hi: List[int], e: int,
+                new_lo: int, new_hi: int, queue: List[int],
+                trail: Optional[list] = None) -> bool:
+    """Narrow edge e to [new_lo, new_hi] and queue affected nodes.
+
+    Old bounds are appended to ``trail`` (if given) so probes can be undone.
+    """
+    if new_lo > new_hi:
+        return False
+    if new_lo == lo[e] and new_hi == hi[e]:
+        return True
+    opened = lo[e] == 0 and new_lo > 0
+    if trail is not None:
+        trail.append((e, lo[e], hi[e]))
+    lo[e], hi[e] = new_lo, new_hi
+    queue.extend(puzzle.edges[e])
+    if opened:
+        # A bridge now exists: nothing may cross it
+        for c in puzzle.crossings[e]:
+            if hi[c] > 0:
+                if lo[c] > 0:
+                    return False
+                if trail is not None:
+                    trail.append((c, lo[c], hi[c]))
+                hi[c] = 0
+                queue.extend(puzzle.edges[c])
+    return True
+
+
+def _propagate(puzzle: Puzzle, lo: List[int], hi: List[int], queue: List[int],
+               connectivity: bool = True, trail: Optional[list] = None) -> bool:
+    """Tighten bounds in place from the queued nodes until fixpoint.
+
+    Returns False on contradiction. The O(nodes) connectivity check can be
+    skipped for cheap local probes.
+    """
+    while queue:
+        node = queue.pop()
+        edges = puzzle.incident[node]
+        value = puzzle.values[node]
+        sum_lo = sum(lo[e] for e in edges)
+        sum_hi = sum(hi[e] for e in edges)
+        if sum_lo > value or sum_hi < value:
+            return False
+        for e in edges:
+            new_lo = max(lo[e], value - (sum_hi - hi[e]))
+            new_hi = min(hi[e], value - (sum_lo - lo[e]))
+            if new_lo != lo[e] or new_hi != hi[e]:
+                sum_lo += new_lo - lo[e]
+                sum_hi += new_hi - hi[e]
+                if not _set_bounds(puzzle, lo, hi, e, new_lo, new_hi, queue, trail):
+                    return False
+
+    return not connectivity or _can_connect(puzzle, hi)
+
+
+def _can_connect(puzzle: Puzzle, bounds: List[int]) -> bool:
+    """Check that all nodes are reachable using edges with bounds[e] > 0."""
+    if not puzzle.nodes:
+        return True
+    seen = [False] * len(puzzle.nodes)
+    seen[0] = True
+    stack = [0]
+    count = 1
+    while stack:
+        node = stack.pop()
+        for e in puzzle.incident[node]:
+            if bounds[e] > 0:
+                a, b = puzzle.edges[e]
+                other = b if a == node else a
+                if not seen[other]:
+                    seen[other] = True
+                    count += 1
+                    stack.append(other)
+    return count == len(puzzle.nodes)
+
+
+def _choose_edge(puzzle: Puzzle, lo: List[int], hi: List[int], rng: random.Random) -> Optional[int]:
+    """Pick an undecided edge on a node with minimum slack (MRV), ties broken by rng."""
+    best_edges: List[int] = []
+    best_slack = None
+    for node, edges in enumerate(puzzle.incident):
+        open_edges = [e for e in edges if lo[e] < hi[e]]
+        if not open_edges:
+            continue
+        slack = sum(hi[e] for e in edges) - puzzle.values[node]
+        if best_slack is None or slack < best_slack:
+            best_slack = slack
+            best_edges = open_edges
+        elif slack == best_slack:
+            best_edges.extend(open_edges)
+    return rng.choice(best_edges) if best_edges else None
+
+
+def _probe(puzzle: Puzzle, lo: List[int], hi: List[int]) -> bool:
+    """Failed-literal probing: drop bridge counts whose propagation fails.
+
+    One pass over the undecided edges, narrowing bounds in place. Trials
+    skip the connectivity check and are undone through a trail rather than
+    copying the bounds. Returns False if some edge has no viable count left.
+    """
+    for e in range(len(puzzle.edges)):
+        if lo[e] == hi[e]:
+            continue
+        viable = []
+        for count in range(lo[e], hi[e] + 1):
+            queue, trail = [], []
+            if (_set_bounds(puzzle, lo, hi, e, count, count, queue, trail)
+                    and _propagate(puzzle, lo, hi, queue, False, trail)):
+                viable.append(count)
+            for edge, old_lo, old_hi in reversed(trail):
+                lo[edge], hi[edge] = old_lo, old_hi
+        if not viable:
+            return False
+        if viable[0] != lo[e] or viable[-1] != hi[e]:
+            queue = []
+            if not (_set_bounds(puzzle, lo, hi, e, viable[0], viable[-1], queue)
+                    and _propagate(puzzle, lo, hi, queue)):
+                return False
+    return True
+
+
+def _search(puzzle: Puzzle, lo: List[int], hi: List[int], rng: random.Random,
+            limit: int, stats: dict) -> Tuple[Optional[List[int]], bool]:
+    """Depth-first search from propagated bounds.
+
+    Returns (solution, exhausted): exhausted is True when the whole tree was
+    explored within ``limit`` search nodes.
+    """
+    stack = [(lo, hi, [])]
+    visited = 0
+    while stack:
+        if visited >= limit:
+            return None, False
+        lo, hi, queue = stack.pop()
+        visited += 1
+        stats["visited"] += 1
+        if not _propagate(puzzle, lo, hi, queue) or not _probe(puzzle, lo, hi):
+            continue
+        edge = _choose_edge(puzzle, lo, hi, rng)
+        if edge is None:
+            # All bounds fixed; propagation already verified counts
+            if _can_connect(puzzle, lo):
+                return lo, True
+            continue
+        counts = list(range(lo[edge], hi[edge] + 1))
+        rng.shuffle(counts)
+        for count in counts:
+            child_lo, child_hi, queue = lo[:], hi[:], []
+            if _set_bounds(puzzle, child_lo, child_hi, edge, count, count, queue):
+                stack.append((child_lo, child_hi, queue))
+    return None, True
+
+
+def solve(env, stats: Optional[dict] = None, seed: int = 0) -> Optional[List[Tuple[int, int, int, int, int]]]:
+    """Solve a There is no Spoon environment.
+
+    Returns the list of links (x1, y1, x2, y2, count) or None if unsolvable.
+    The search restarts with a doubled node budget and fresh tie-breaking
+    whenever a budget runs out, which avoids thrashing on an early bad
+    choice in large ambiguous grids. If ``stats`` is given, it receives the
+    number of search nodes visited and restarts made.
+    """
+    puzzle = Puzzle(env)
+    lo, hi = puzzle.initial_bounds()
+    counters = {"visited": 0, "restarts": 0}
+    rng = random.Random(seed)
+
+    solution = None
+    if _propagate(puzzle, lo, hi, list(range(len(puzzle.nodes)))):
+        limit = RESTART_BASE_LIMIT
+        while True:
+            solution, exhausted = _search(puzzle, lo[:], hi[:], rng, limit, counters)
+            if solution is not None or exhausted:
+                break
+            counters["restarts"] += 1
+            limit *= 2
+
+    if stats is not None:
+        stats.update(counters)
+    if solution is None:
+        return None
+
+    links = []
+    for e, count in enumerate(solution):
+        if count:
+            a, b = puzzle.edges[e]
+            links.append((puzzle.nodes[a][0], puzzle.nodes[a][1],
+                          puzzle.nodes[b][0], puzzle.nodes[b][1], count))
+    return links
+
+
+def check_solution(env, links: List[Tuple[int, int, int, int, int]]) -> Optional[str]:
+    """Validate a full solution against all Hashiwokakero rules.
+
+    Returns None if valid, otherwise a description of the first violation.
+    """
+    puzzle = Puzzle(env)
+    edge_of = {}
+    for e, (a, b) in enumerate(puzzle.edges):
+        edge_of[(a, b)] = e
+        edge_of[(b, a)] = e
+
+    counts = [0] * len(puzzle.edges)
+    for x1, y1, x2, y2, amount in links:
+        a = env.node_index.get((x1, y1))
+        b = env.node_index.get((x2, y2))
+        if a is None or b is None:
+            return f"link {x1} {y1} {x2} {y2} does not join two nodes"
+        e = edge_of.get((a, b))
+        if e is None:
+            return f"link {x1} {y1} {x2} {y2} is not between neighboring nodes"
+        counts[e] += amount
+        if counts[e] > 2:
+            return f"more than 2 links between ({x1},{y1}) and ({x2},{y2})"
+
+    for e, crossing in enumerate(puzzle.crossings):
+        if counts[e] and any(counts[c] for c in crossing):
+            a, b = puzzle.edges[e]
+            return f"link from {puzzle.nodes[a][:2]} to {puzzle.nodes[b][:2]} crosses another link"
+
+    for node, edges in enumerate(puzzle.incident):
+        total = sum(counts[e] for e in edges)
+        if total != puzzle.values[node]:
+            x, y, value = puzzle.nodes[node]
+            return f"node ({x},{y}) has {total} links, needs {value}"
+
+    if not _can_connect(puzzle, counts):
+        return "nodes are not all connected"
+    return None
+
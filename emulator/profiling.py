@@ -0,0 +1,278 @@
+"""Runner instruments: per-phase profiling (--profile) and allocation tracking (--alloc).
+
+Instruments are passed to the runner as its ``instrument``: the runner
+wraps each phase of a turn (format input, write, wait for the agent, parse,
+simulate, compare) in ``phase(name)`` and calls ``end_turn()`` after each
+turn. Both instruments keep their measurements per turn and in aggregate.
+
+TurnProfiler times every phase. With cProfile enabled, only emulator-side
+code is profiled: the profiler is paused while waiting for the agent, so a
+slow bot (or an in-process bot's own code) does not drown out the
+emulator's functions.
+
+AllocationTracker uses tracemalloc around the simulate and format phases:
+bytes kept and peak bytes per turn, the allocation sites of the kept bytes
+and the memory retained by the whole run.
+"""
+import contextlib
+import cProfile
+import dataclasses
+import io
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+PHASES = ("init", "format", "write", "wait", "parse", "simulate", "compare")
+
+# Phases spent in the agent rather than the emulator
+AGENT_PHASES = ("wait",)
+
+
+class TurnProfiler:
+    """Runner instrument timing each phase of each turn."""
+
+    def __init__(self, cprofile: bool = True):
+        self.profile: Optional[cProfile.Profile] = cProfile.Profile() if cprofile else None
+        self.turns: List[Dict[str, float]] = []
+        self._current: Dict[str, float] = {}
+        self._started = 0.0
+        self.wall = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        if self.profile is not None:
+            self.profile.enable()
+
+    def stop(self) -> None:
+        if self.profile is not None:
+            self.profile.disable()
+        self.wall += time.perf_counter() - self._started
+        if self._current:
+            self.end_turn()  # Phases of an unfinished last turn (timeout, invalid output)
+
+    @contextmanager
+    def phase(self, name: str):
+        paused = self.profile is not None and name in AGENT_PHASES
+        if paused:
+            self.profile.disable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._current[name] = self._current.get(name, 0.0) + time.perf_counter() - start
+            if paused:
+                self.profile.enable()
+
+    def end_turn(self) -> None:
+        self.turns.append(self._current)
+        self._current = {}
+
+    def totals(self) -> Dict[str, float]:
+        """Seconds per phase over all turns, in PHASES order."""
+        totals = {}
+        for name in PHASES:
+            total = sum(turn.get(name, 0.0) for turn in self.turns)
+            if total:
+                totals[name] = total
+        return totals
+
+    def format_report(self, per_turn: bool = False) -> List[str]:
+        """Aggregate phase table; with per_turn, one line per turn first."""
+        lines = []
+        if per_turn:
+            for n, turn in enumerate(self.turns):
+                cells = "  ".join(f"{name} {turn[name] * 1e6:.0f}us" for name in PHASES if name in turn)
+                lines.append(f"T{n}: {cells}")
+            lines.append("")
+
+        totals = self.totals()
+        turns = max(1, len(self.turns))
+        wall = self.wall or 1e-9
+        tracked = sum(totals.values())
+        lines.append(f"{'phase':<10} {'total ms':>10} {'us/turn':>10} {'share':>7}")
+        for name, total in totals.items():
+            lines.append(f"{name:<10} {total * 1000:10.2f} {total * 1e6 / turns:10.1f} {total / wall:7.1%}")
+        other = max(0.0, self.wall - tracked)
+        lines.append(f"{'other':<10} {other * 1000:10.2f} {other * 1e6 / turns:10.1f} {other / wall:7.1%}")
+
+        agent = sum(totals.get(name, 0.0) for name in AGENT_PHASES)
+        lines.append("")
+        lines.append(f"Turns: {len(self.turns)}, wall {self.wall * 1000:.1f}ms: "
+                     f"emulator {(self.wall - agent) * 1000:.1f}ms, agent wait {agent * 1000:.1f}ms")
+        return lines
+
+    def format_top(self, limit: int = 15, sort: str = "cumulative") -> List[str]:
+        """Most expensive emulator-side functions from cProfile."""
+        if self.profile is None:
+            return []
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return [line for line in out.getvalue().splitlines() if line.strip()]
+
+    def dump_stats(self, path: str) -> None:
+        """Write cProfile results for pstats, snakeviz, etc."""
+        if self.profile is not None:
+            self.profile.dump_stats(path)
+
+
+class AllocationTracker:
+    """Runner instrument measuring tracemalloc allocations of model phases.
+
+    For each tracked phase call it records the bytes still allocated when
+    the phase ends (kept, mostly the new state) and the peak above the
+    starting point (including temporaries). With ``sites``, a snapshot diff
+    around each call attributes kept bytes to source lines; this is slow on
+    large heaps.
+    """
+
+    def __init__(self, phases: Tuple[str, ...] = ("simulate", "format"), sites: bool = True, frames: int = 1):
+        self.phases = phases
+        self.sites = sites
+        self.frames = frames
+        self.turns: List[Dict[str, Tuple[int, int]]] = []  # {phase: (kept, peak)}
+        self.site_bytes: Dict[str, int] = {}
+        self.site_blocks: Dict[str, int] = {}
+        self.retained = 0
+        self._current: Dict[str, Tuple[int, int]] = {}
+        self._baseline = 0
+        self._started_tracing = False
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._snapshot()  # Compiles the filter patterns outside of the measured phases
+        self._baseline = tracemalloc.get_traced_memory()[0]
+
+    def stop(self) -> None:
+        self.retained = tracemalloc.get_traced_memory()[0] - self._baseline
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self._current:
+            self.end_turn()
+
+    @contextmanager
+    def phase(self, name: str):
+        if name not in self.phases:
+            yield
+            return
+        before = self._snapshot()
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            kept, prev_peak = self._current.get(name, (0, 0))
+            self._current[name] = (kept + current - start, max(prev_peak, peak - start))
+            if before is not None:
+                for stat in self._snapshot().compare_to(before, "lineno"):
+                    if stat.size_diff > 0:
+                        site = f"{name}: {stat.traceback[0].filename}:{stat.traceback[0].lineno}"
+                        self.site_bytes[site] = self.site_bytes.get(site, 0) + stat.size_diff
+                        self.site_blocks[site] = self.site_blocks.get(site, 0) + max(0, stat.count_diff)
+
+    def _snapshot(self) -> Optional[tracemalloc.Snapshot]:
+        if not self.sites:
+            return None
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, contextlib.__file__),
+        ))
+
+    def end_turn(self) -> None:
+        self.turns.append(self._current)
+        self._current = {}
+
+    def format_report(self, per_turn: bool = False, limit: int = 10) -> List[str]:
+        """Kept/peak bytes per phase, top allocation sites and retained memory."""
+        lines = []
+        if per_turn:
+            for n, turn in enumerate(self.turns):
+                cells = "  ".join(f"{name} kept {kept} peak {peak}" for name, (kept, peak) in turn.items())
+                lines.append(f"T{n}: {cells}")
+            lines.append("")
+
+        turns = max(1, len(self.turns))
+        lines.append(f"{'phase':<10} {'kept B/turn':>12} {'max kept':>10} {'peak B/turn':>12} {'max peak':>10}")
+        for name in self.phases:
+            measured = [turn[name] for turn in self.turns if name in turn]
+            if not measured:
+                continue
+            kept = [k for k, _ in measured]
+            peaks = [p for _, p in measured]
+            lines.append(f"{name:<10} {sum(kept) / turns:12.0f} {max(kept):10} "
+                         f"{sum(peaks) / turns:12.0f} {max(peaks):10}")
+
+        if self.site_bytes:
+            lines.append("")
+            lines.append("Top allocation sites (bytes kept after the phase, all turns):")
+            top = sorted(self.site_bytes.items(), key=lambda item: -item[1])[:limit]
+            for site, size in top:
+                lines.append(f"  {size:10} B  {self.site_blocks[site]:7} blocks  {site}")
+
+        lines.append("")
+        lines.append(f"Turns: {len(self.turns)}, memory retained by the run: {self.retained / 1024:.1f} KiB")
+        return lines
+
+
+class Instruments:
+    """Several instruments driven as one by the runner."""
+
+    def __init__(self, *instruments: Any):
+        self.instruments = instruments
+
+    def start(self) -> None:
+        for instrument in self.instruments:
+            instrument.start()
+
+    def stop(self) -> None:
+        for instrument in reversed(self.instruments):
+            instrument.stop()
+
+    @contextmanager
+    def phase(self, name: str):
+        with ExitStack() as stack:
+            for instrument in self.instruments:
+                stack.enter_context(instrument.phase(name))
+            yield
+
+    def end_turn(self) -> None:
+        for instrument in self.instruments:
+            instrument.end_turn()
+
+
+def deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    """sys.getsizeof of obj and everything it references, counting shared objects once.
+
+    Walks an explicit stack, so long linked structures do not hit the
+    recursion limit.
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif dataclasses.is_dataclass(obj):
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            else:
+                stack.extend(getattr(obj, f.name) for f in dataclasses.fields(obj))
+        elif hasattr(obj, '__slots__'):
+            stack.extend(getattr(obj, slot) for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
@@ -0,0 +1,163 @@
+"""On-disk cache of batch run results (--cache).
+
+A result is stored under a key hashing everything that decides it:
+
+- the agent: its command line and the contents of every argument that is a
+  file (the executable, a script, a cached C++ build), or for in-process
+  agents the source file of the bot;
+- the model: the source of its module, of the ``models`` modules it uses
+  and of runner.py;
+- the test case: its JSON data (generated on the fly for gen: names);
+- max turns and the turn timeout (the bulk timeout for single-output
+  puzzles).
+
+Changing any of them re-runs the affected games only. Agents are assumed
+to be deterministic: a bot with unseeded randomness, or one close to the
+timeout, may behave differently on a re-run than the cached result says.
+Files a script imports are not part of the key.
+"""
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+import runner
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results")
+
+# Bumped when the stored record format changes
+FORMAT_VERSION = 1
+
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def hash_file(path: str) -> str:
+    """sha256 of a file's contents, memoized on (path, size, mtime)."""
+    stat = os.stat(path)
+    memo = (path, stat.st_size, stat.st_mtime_ns)
+    if memo not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _file_hashes[memo] = digest.hexdigest()
+    return _file_hashes[memo]
+
+
+def hash_program(program: runner.Program) -> str:
+    """Hash of a command line and the files it names, or of an in-process bot's source."""
+    parts = [runner.describe_program(program)]
+    if callable(program):
+        bot = getattr(program, "_bot", None) or program
+        try:
+            parts.append(hash_file(inspect.getfile(bot)))
+        except (TypeError, OSError):
+            pass  # Built-in or generated: the description is all there is
+    else:
+        for i, arg in enumerate(program):
+            path = shutil.which(arg) if i == 0 else None
+            path = path or (arg if os.path.isfile(arg) else None)
+            if path:
+                parts.append(hash_file(os.path.realpath(path)))
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def hash_model(model: Any) -> str:
+    """Hash of the model's module, the models modules it uses and runner.py."""
+    pending = [sys.modules[type(model).__module__]]
+    files = {os.path.abspath(runner.__file__)}
+    seen = set()
+    while pending:
+        module = pending.pop()
+        if module.__name__ in seen:
+            continue
+        seen.add(module.__name__)
+        files.add(os.path.abspath(module.__file__))
+        for value in vars(module).values():
+            name = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", None)
+            if isinstance(name, str) and name.startswith("models.") and name in sys.modules:
+                pending.append(sys.modules[name])
+    return hashlib.sha256("\0".join(hash_file(path) for path in sorted(files)).encode()).hexdigest()
+
+
+def hash_test_case(model: Any, test_name: str) -> str:
+    """Hash of the test case contents (generated ones included)."""
+    if hasattr(model, "get_test_case_data"):
+        try:
+            data = json.dumps(model.get_test_case_data(test_name), sort_keys=True)
+        except ValueError:
+            data = None  # Unknown test case: the run reports it
+    else:
+        data = json.dumps(getattr(model, "_test_cases", {}).get(test_name), sort_keys=True)
+    return hashlib.sha256(f"{test_name}\0{data}".encode()).hexdigest()
+
+
+class ResultCache:
+    """Batch results stored as one pickle per key under directory.
+
+    With ``read=False`` (--no-cache) stored results are ignored, but fresh
+    ones are still written. Entries are written to a temporary file and
+    renamed into place.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, read: bool = True):
+        self.directory = directory
+        self.read = read
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._program_hashes: Dict[str, str] = {}
+        self._model_hashes: Dict[str, str] = {}
+
+    def key(self, model: Any, program: runner.Program, test_name: str, max_turns: int,
+            turn_timeout_ms: int) -> str:
+        described = runner.describe_program(program)
+        if described not in self._program_hashes:
+            self._program_hashes[described] = hash_program(program)
+        if model.name not in self._model_hashes:
+            self._model_hashes[model.name] = hash_model(model)
+        if model.bulk_output:
+            turn_timeout_ms = runner.BULK_TIMEOUT_MS
+        parts = (FORMAT_VERSION, model.name, self._model_hashes[model.name], self._program_hashes[described],
+                 hash_test_case(model, test_name), max_turns, turn_timeout_ms)
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".pickle")
+
+    def get(self, key: str) -> Optional[dict]:
+        record = None
+        if self.read:
+            try:
+                with open(self._path(key), "rb") as f:
+                    record = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+                record = None  # Missing, partial or from an incompatible version
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    def put(self, key: str, record: dict) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, partial = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(partial, path)
+            self.stored += 1
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def format_stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"{self.hits}/{total} cached ({rate:.0%}), {self.misses} run, {self.stored} stored"
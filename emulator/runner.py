@@ -1,11 +1,66 @@
-"""Generic subprocess runner for game models."""
+"""Generic runner for game models, driving subprocess or in-process agents.
+
+Runs can be instrumented (see profiling.py): the runner then wraps each
+phase of a turn in ``instrument.phase(name)`` and calls
+``instrument.end_turn()`` after each turn. Phases are init, format, write,
+wait (for the agent), parse, simulate and compare (replays).
+"""
+import atexit
+import collections
+import contextlib
+import multiprocessing.util
+import os
 import subprocess
 import sys
 import threading
+import time
 import queue
-from typing import List, Tuple, Any, Optional
+import selectors
+import signal
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
-from models.base import GameModel
+import forkserver
+from agents import InvalidOutput
+from models.base import FieldDiff, GameModel
+
+# A program is either a command line or a factory of in-process agents
+# (see agents.py), called with the player id.
+Program = Union[List[str], Callable[[int], Any]]
+
+# Non-blocking agent pipes driven by a selector (POSIX); elsewhere writes
+# block and reads use a helper thread
+NONBLOCKING_IO = os.name == 'posix'
+
+# Time an agent gets to exit after SIGTERM before it is killed (--kill-grace)
+KILL_GRACE_MS = 100
+
+# Start 'python bot.py' agents from a fork server template (--fork-server)
+FORK_SERVER = False
+
+# Deadline for the whole answer of a bulk_output program (--bulk-timeout),
+# which is its first and only turn: CodinGame gives first turns 1s
+BULK_TIMEOUT_MS = 1000
+
+# Agent stderr: lines kept per agent, longest kept line, and lines per
+# second echoed live with --debug (the rest are counted and skipped)
+STDERR_MAX_LINES = 200
+STDERR_MAX_LINE_LENGTH = 500
+STDERR_ECHO_RATE = 50
+
+# Stderr lines shown per player in failure reports
+STDERR_TAIL_LINES = 20
+
+# Shared no-op phase of uninstrumented runs
+_NO_PHASE = contextlib.nullcontext()
+
+
+def _phase(instrument: Any, name: str):
+    return _NO_PHASE if instrument is None else instrument.phase(name)
+
+
+def _end_turn(instrument: Any) -> None:
+    if instrument is not None:
+        instrument.end_turn()
 
 
 def readline_with_timeout(pipe, timeout_ms: int) -> Optional[str]:
@@ -33,147 +88,578 @@ def readline_with_timeout(pipe, timeout_ms: int) -> Optional[str]:
         return None
 
 
-def run_program(
-    model: GameModel,
-    program_cmd: List[str],
-    test_name: str,
-    max_turns: int = 500,
-    verbose: bool = False,
-    turn_timeout_ms: int = 150,
-    debug: bool = False
-) -> Tuple[str, List[Any], int]:
+def read_all_with_timeout(pipe, timeout_ms: int) -> Tuple[str, bool]:
+    """Read everything from pipe until EOF or timeout, in one buffered pass.
+
+    Returns (text, reached_eof). On timeout, returns whatever arrived so far.
     """
-    Run a program through the emulator via bidirectional stdio.
+    chunks = []
+    fd = pipe.fileno()
 
-    Args:
-        model: Game model to use
-        program_cmd: Command to run the program
-        test_name: Name of the test case
-        max_turns: Maximum number of turns before timeout
-        verbose: Print debug output
-        turn_timeout_ms: Timeout per turn in milliseconds (default 150ms)
-        debug: If True, continuously print stderr from the program
+    def reader():
+        try:
+            while True:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        except OSError:
+            pass
 
-    Returns: (result_status, trajectory, turns_used)
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    thread.join(timeout=timeout_ms / 1000.0)
+
+    eof = not thread.is_alive()
+    return b''.join(chunks[:]).decode('utf-8', errors='replace'), eof
+
+
+def configure(kill_grace_ms: int = KILL_GRACE_MS, fork_server: bool = False,
+              bulk_timeout_ms: int = BULK_TIMEOUT_MS) -> None:
+    """Set agent process options (also used as a worker pool initializer, see worker_config)."""
+    global KILL_GRACE_MS, FORK_SERVER, BULK_TIMEOUT_MS
+    KILL_GRACE_MS = kill_grace_ms
+    FORK_SERVER = fork_server and forkserver.available()
+    BULK_TIMEOUT_MS = bulk_timeout_ms
+
+
+def worker_config() -> Tuple[int, bool, int]:
+    """initargs for configure() in worker processes."""
+    return KILL_GRACE_MS, FORK_SERVER, BULK_TIMEOUT_MS
+
+
+def _signal_agent(proc: subprocess.Popen, kill: bool) -> None:
+    """SIGTERM (or SIGKILL) the agent's process group, or the process outside POSIX."""
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL if kill else signal.SIGTERM)
+        elif kill:
+            proc.kill()
+        else:
+            proc.terminate()
+    except OSError:
+        pass  # Already gone
+
+
+class _Reaper:
+    """Background thread killing agents that outlive their grace period and reaping them.
+
+    Agents are handed over right after SIGTERM, so closing a run does not
+    wait for its processes to exit.
     """
-    env, initial_state = model.load_test_case(test_name)
 
-    proc = subprocess.Popen(
-        program_cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1
-    )
-
-    # Start stderr reader thread if debug mode
-    stderr_lines = []
-    def stderr_reader():
+    def __init__(self):
+        self._pid: Optional[int] = None  # Process the thread runs in (forked workers start their own)
+        self._pending: List[Tuple[subprocess.Popen, float]] = []  # (process, kill deadline)
+        self._lock = threading.Lock()
+
+    def add(self, proc: subprocess.Popen, grace_ms: int) -> None:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._queue: queue.Queue = queue.Queue()
+            self._pending = []
+            self._lock = threading.Lock()
+            threading.Thread(target=self._run, daemon=True).start()
+            atexit.register(self.kill_all)
+            # Pool workers skip atexit but run multiprocessing finalizers
+            multiprocessing.util.Finalize(self, self.kill_all, exitpriority=10)
+        self._queue.put((proc, time.monotonic() + grace_ms / 1000.0))
+
+    def _run(self) -> None:
+        while True:
+            try:
+                # Block while nothing is pending, otherwise poll every 10ms
+                item = self._queue.get(timeout=0.01 if self._pending else None)
+                with self._lock:
+                    self._pending.append(item)
+                continue
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            with self._lock:
+                alive = []
+                for proc, deadline in self._pending:
+                    if proc.poll() is not None:
+                        proc.stdout.close()
+                        continue
+                    if now >= deadline:
+                        _signal_agent(proc, kill=True)
+                    alive.append((proc, deadline))
+                self._pending = alive
+
+    def kill_all(self) -> None:
+        """SIGKILL agents still pending, so none outlive the emulator."""
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            pending = self._pending + [self._queue.get_nowait() for _ in range(self._queue.qsize())]
+            self._pending = []
+        for proc, _ in pending:
+            _signal_agent(proc, kill=True)
+
+
+_reaper = _Reaper()
+
+
+class StderrLog:
+    """Bounded log of an agent's stderr lines, tagged with the turn they arrived in.
+
+    Turn -1 is initialization. With ``echo``, lines are also printed live,
+    at most STDERR_ECHO_RATE per second.
+    """
+
+    def __init__(self, label: str, echo: bool = False, max_lines: int = STDERR_MAX_LINES):
+        self.label = label
+        self.echo = echo
+        self.lines: collections.deque = collections.deque(maxlen=max_lines)  # (turn, line)
+        self.turn = -1
+        self.total = 0
+        self._window = 0.0
+        self._echoed = 0
+        self._skipped = 0
+
+    def add(self, line: str) -> None:
+        line = line.rstrip("\n")
+        if len(line) > STDERR_MAX_LINE_LENGTH:
+            line = line[:STDERR_MAX_LINE_LENGTH] + "..."
+        self.lines.append((self.turn, line))
+        self.total += 1
+        if self.echo:
+            self._echo(line)
+
+    def _echo(self, line: str) -> None:
+        now = time.monotonic()
+        if now - self._window >= 1.0:
+            self.flush()
+            self._window, self._echoed = now, 0
+        if self._echoed < STDERR_ECHO_RATE:
+            self._echoed += 1
+            print(f"[{self.label}] {line}", file=sys.stderr)
+        else:
+            self._skipped += 1
+
+    def flush(self) -> None:
+        """Report lines skipped by the echo rate limit since the last report."""
+        if self._skipped:
+            print(f"[{self.label}] ... {self._skipped} lines not shown", file=sys.stderr)
+            self._skipped = 0
+
+    def tail(self, count: int = STDERR_TAIL_LINES) -> List[str]:
+        """Last count lines as 'T<turn>: line'."""
+        lines = list(self.lines)[-count:]
+        return [f"{'init' if turn < 0 else f'T{turn}'}: {line}" for turn, line in lines]
+
+
+class SubprocessAgent:
+    """Agent running as a child process, talking over stdio pipes.
+
+    On POSIX, stdin and stdout are non-blocking and driven by a selector:
+    input is queued and written while waiting for output, within the same
+    per-turn deadline, so an agent that stops reading its input (or a large
+    turn filling the pipe) cannot block the emulator. Elsewhere, writes
+    block and reads use a helper thread.
+
+    On POSIX the agent runs in its own process group, so closing also
+    stops processes it started. close() sends SIGTERM and leaves the
+    SIGKILL after KILL_GRACE_MS and the reaping to a background thread.
+    """
+
+    def __init__(self, cmd: List[str], player_id: int = 0, debug: bool = False, label: str = "DBG",
+                 proc: Any = None):
+        self.player_id = player_id
+        self.stderr = StderrLog(label, echo=debug)
+        self.proc = proc or subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=os.name == 'posix'
+        )
+        self._selector = None
+        if NONBLOCKING_IO:
+            self._stdin_fd = self.proc.stdin.fileno()
+            self._stdout_fd = self.proc.stdout.fileno()
+            os.set_blocking(self._stdin_fd, False)
+            os.set_blocking(self._stdout_fd, False)
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self._stdout_fd, selectors.EVENT_READ)
+            self._pending = bytearray()  # Input not yet accepted by the pipe
+            self._output = bytearray()  # Output not yet returned as lines
+            self._writing = False
+            self._eof = False
+
+        def stderr_reader():
+            try:
+                with self.proc.stderr:
+                    for line in self.proc.stderr:
+                        self.stderr.add(line.decode('utf-8', errors='replace'))
+            except:
+                pass
+
+        self._stderr_thread = threading.Thread(target=stderr_reader, daemon=True)
+        self._stderr_thread.start()
+
+    def start(self, init_lines: List[str], env: Any) -> None:
+        try:
+            self._write("".join(line + "\n" for line in init_lines))
+        except OSError:
+            pass  # Exited already: the first read reports it
+
+    def send_turn(self, turn_input: str, state: Any) -> None:
+        """Write one turn's input. Raises OSError if the process has exited."""
+        self.stderr.turn += 1
+        if turn_input:
+            self._write(turn_input + "\n")
+
+    def _write(self, text: str) -> None:
+        if self._selector is None:
+            self.proc.stdin.write(text.encode('utf-8'))
+            self.proc.stdin.flush()
+            return
+        self._pending += text.encode('utf-8')
+        self._flush_input()
+
+    def _flush_input(self) -> None:
+        """Write as much pending input as the pipe accepts, without blocking."""
         try:
-            for line in proc.stderr:
-                stderr_lines.append(line)
-                if debug:
-                    print(f"[DBG] {line}", end='', file=sys.stderr)
-        except:
+            written = os.write(self._stdin_fd, self._pending)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            self._pending.clear()  # Agent exited or closed its stdin
+            self._stop_writing()
+            raise
+        del self._pending[:written]
+        if self._pending and not self._writing:
+            self._selector.register(self._stdin_fd, selectors.EVENT_WRITE)
+            self._writing = True
+        elif not self._pending:
+            self._stop_writing()
+
+    def _stop_writing(self) -> None:
+        if self._writing:
+            self._selector.unregister(self._stdin_fd)
+            self._writing = False
+
+    def _pump(self, deadline: float, done: Callable[[], bool]) -> bool:
+        """Write pending input and read output until done() or the deadline (False)."""
+        while not done():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            for key, _ in self._selector.select(remaining):
+                if key.fd == self._stdout_fd:
+                    try:
+                        chunk = os.read(self._stdout_fd, 65536)
+                    except BlockingIOError:
+                        continue
+                    if chunk:
+                        self._output += chunk
+                    else:
+                        self._eof = True
+                        self._selector.unregister(self._stdout_fd)
+                else:
+                    try:
+                        self._flush_input()
+                    except OSError:
+                        pass  # Output already sent is still read
+        return True
+
+    def readline(self, timeout_ms: int) -> Optional[str]:
+        """Next output line, '' at end of output, None on timeout."""
+        if self._selector is None:
+            line = readline_with_timeout(self.proc.stdout, timeout_ms)
+            return None if line is None else line.decode('utf-8', errors='replace')
+
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        if not self._pump(deadline, lambda: self._eof or b"\n" in self._output):
+            return None
+        end = self._output.find(b"\n") + 1 or len(self._output)
+        line = bytes(self._output[:end])
+        del self._output[:end]
+        return line.decode('utf-8', errors='replace')
+
+    def read_all(self, timeout_ms: int) -> Tuple[str, bool]:
+        if self._selector is None:
+            self._close_stdin()  # No more input: lets programs reading to EOF finish
+            return read_all_with_timeout(self.proc.stdout, timeout_ms)
+
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        if self._pump(deadline, lambda: self._eof or not self._pending):
+            self._close_stdin()
+            self._pump(deadline, lambda: self._eof)
+        text = self._output.decode('utf-8', errors='replace')
+        self._output.clear()
+        return text, self._eof
+
+    def _close_stdin(self) -> None:
+        if self._selector is not None:
+            self._pending.clear()
+            self._stop_writing()
+        try:
+            self.proc.stdin.close()
+        except OSError:
             pass
 
-    stderr_thread = threading.Thread(target=stderr_reader, daemon=True)
-    stderr_thread.start()
+    def close(self) -> None:
+        self._close_stdin()
+        if self._selector is not None:
+            self._selector.close()
+        if self.proc.poll() is None:
+            _signal_agent(self.proc, kill=False)
+            _reaper.add(self.proc, KILL_GRACE_MS)
+        else:
+            _signal_agent(self.proc, kill=True)  # Processes the agent left behind
+            self.proc.stdout.close()
+            self._stderr_thread.join(timeout=0.1)  # Lines written just before exiting (tracebacks)
+        self.stderr.flush()
+
+
+def start_agent(program: Program, player_id: int = 0, debug: bool = False, label: str = "DBG"):
+    """Start an agent from a command list or an in-process agent factory."""
+    if callable(program):
+        agent = program(player_id)
+        log = getattr(agent, "stderr", None)
+        if log is not None:  # In-process bots log their exceptions
+            log.label, log.echo = label, debug
+        return agent
+    proc = None
+    if FORK_SERVER and forkserver.python_script(program):
+        try:
+            proc = forkserver.spawn(program)
+        except OSError as e:
+            print(f"Fork server failed ({e}), starting {program[1]} directly", file=sys.stderr)
+    return SubprocessAgent(program, player_id, debug, label, proc)
+
+
+def collect_stderr(agents: List[Any], out: Optional[Dict[int, List[str]]]) -> None:
+    """Fill out with the last stderr lines of each agent that has any, by player id."""
+    if out is None:
+        return
+    for pid, agent in enumerate(agents):
+        log = getattr(agent, "stderr", None)
+        if log is not None and log.lines:
+            out[pid] = log.tail()
+
+
+def describe_program(program: Program) -> str:
+    """Printable name of a command list or agent factory."""
+    return str(program) if callable(program) else ' '.join(program)
+
 
+def run_bulk(
+    model: GameModel,
+    agent: Any,
+    env: Any,
+    initial_state: Any,
+    verbose: bool,
+    timeout_ms: int,
+    instrument: Any = None
+) -> Tuple[str, List[Any], int]:
+    """
+    Read a single-output program's whole answer and validate it in one batch.
+
+    The answer is one turn: the program must finish writing (or exit) within
+    timeout_ms. Returns (result_status, trajectory, turns_used), where
+    turns are the number of output lines applied.
+    """
+    with _phase(instrument, "format"):
+        turn_input = model.format_turn_input(initial_state)
     try:
-        # Send initialization input
-        for line in model.format_init_input(env):
-            proc.stdin.write(line + "\n")
-        proc.stdin.flush()
+        with _phase(instrument, "write"):
+            agent.send_turn(turn_input, initial_state)
+    except OSError:
+        return 'program_error', [initial_state], 0  # Exited before reading its input
+    with _phase(instrument, "wait"):
+        text, eof = agent.read_all(timeout_ms)
+    if not eof and not text.endswith('\n'):
+        text = text[:text.rfind('\n') + 1]  # Line cut short by the deadline
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    trajectory = [initial_state]
+
+    controls = []
+    with _phase(instrument, "parse"):
+        for turn, control_line in enumerate(lines):
+            try:
+                control = model.parse_output(control_line)
+                control.player_id = 0  # Single player mode
+                controls.append(control)
+            except (ValueError, IndexError) as e:
+                print(f"Invalid output: '{control_line}' - {e}", file=sys.stderr)
+                return 'invalid_output', trajectory, turn
+            if verbose:
+                print(f"T{turn}: -> {control_line}")
 
-        state = initial_state
-        trajectory = [state]
+    with _phase(instrument, "simulate"):
+        state, result, turns = model.simulate_batch(initial_state, controls, env)
+    trajectory.append(state)
+    _end_turn(instrument)
 
-        for turn in range(max_turns):
-            # Send current state (if model requires turn input)
+    if result.status == 'success':
+        return 'success', trajectory, turns
+    elif result.status == 'failure':
+        return f'failure: {result.reason}', trajectory, turns
+    elif not eof:
+        return f'timeout: output incomplete after {timeout_ms}ms ({turns} lines)', trajectory, turns
+    return 'program_error', trajectory, turns
+
+
+def run_turns(
+    model: GameModel,
+    agent: Any,
+    env: Any,
+    initial_state: Any,
+    max_turns: int,
+    verbose: bool,
+    turn_timeout_ms: int,
+    instrument: Any = None
+) -> Tuple[str, List[Any], int]:
+    """
+    Play a started single-player agent turn by turn until the game ends.
+
+    Returns (result_status, trajectory, turns_used).
+    """
+    state = initial_state
+    trajectory = [state]
+
+    for turn in range(max_turns):
+        # Send current state (if model requires turn input)
+        with _phase(instrument, "format"):
             turn_input = model.format_turn_input(state)
-            if turn_input:
-                try:
-                    proc.stdin.write(turn_input + "\n")
-                    proc.stdin.flush()
-                except OSError:
-                    pass  # Process may have exited
+        try:
+            with _phase(instrument, "write"):
+                agent.send_turn(turn_input, state)
+        except OSError:
+            pass  # Process may have exited
 
-            # Get number of expected actions
-            required_actions = model.get_required_actions(state, player_id=0)
+        # Get number of expected actions
+        required_actions = model.get_required_actions(state, player_id=0)
 
-            # Get control outputs with timeout
-            controls = []
-            for action_idx in range(required_actions):
-                control_line = readline_with_timeout(proc.stdout, turn_timeout_ms)
+        # Get control outputs with timeout
+        controls = []
+        for action_idx in range(required_actions):
+            try:
+                with _phase(instrument, "wait"):
+                    control_line = agent.readline(turn_timeout_ms)
+            except InvalidOutput as e:
+                print(f"Invalid output: turn {turn} action {action_idx} - {e}", file=sys.stderr)
+                return 'invalid_output', trajectory, turn
 
-                if control_line is None:
-                    # Timeout
-                    return f'timeout: turn {turn} action {action_idx} exceeded {turn_timeout_ms}ms', trajectory, turn
+            if control_line is None:
+                # Timeout
+                return f'timeout: turn {turn} action {action_idx} exceeded {turn_timeout_ms}ms', trajectory, turn
 
-                control_line = control_line.strip()
-                if not control_line:
-                    return 'program_error', trajectory, turn
+            control_line = control_line.strip()
+            if not control_line:
+                return 'program_error', trajectory, turn
 
-                try:
+            try:
+                with _phase(instrument, "parse"):
                     control = model.parse_output(control_line)
-                    control.player_id = 0  # Single player mode
-                    controls.append(control)
-                except (ValueError, IndexError) as e:
-                    print(f"Invalid output: '{control_line}' - {e}", file=sys.stderr)
-                    return 'invalid_output', trajectory, turn
+                control.player_id = 0  # Single player mode
+                controls.append(control)
+            except (ValueError, IndexError) as e:
+                print(f"Invalid output: '{control_line}' - {e}", file=sys.stderr)
+                return 'invalid_output', trajectory, turn
 
-                if verbose:
-                    if action_idx == 0:
-                        print(f"T{turn}: {model.format_result(state)} -> {control_line}")
-                    else:
-                        print(f"     {' ' * len(model.format_result(state))} -> {control_line}")
+            if verbose:
+                if action_idx == 0:
+                    print(f"T{turn}: {model.format_result(state)} -> {control_line}")
+                else:
+                    print(f"     {' ' * len(model.format_result(state))} -> {control_line}")
 
-            # Simulate all controls at once
-            state, result = model.simulate(state, controls, env)
-            trajectory.append(state)
+        if not controls:
+            return f'failure: no output on turn {turn} (model expects no actions)', trajectory, turn
 
-            if result.status == 'success':
-                return 'success', trajectory, turn + 1
-            elif result.status == 'failure':
-                return f'failure: {result.reason}', trajectory, turn + 1
+        # Simulate all controls at once (single-action models take one control)
+        with _phase(instrument, "simulate"):
+            state, result = model.simulate(state, controls[0] if len(controls) == 1 else controls, env)
+        trajectory.append(state)
+        _end_turn(instrument)
 
-        return 'max_turns_exceeded', trajectory, max_turns
+        if result.status == 'success':
+            return 'success', trajectory, turn + 1
+        elif result.status == 'failure':
+            return f'failure: {result.reason}', trajectory, turn + 1
+
+    return 'max_turns_exceeded', trajectory, max_turns
+
+
+def run_program(
+    model: GameModel,
+    program_cmd: Program,
+    test_name: str,
+    max_turns: int = 500,
+    verbose: bool = False,
+    turn_timeout_ms: int = 150,
+    debug: bool = False,
+    instrument: Any = None,
+    stderr_tail: Optional[Dict[int, List[str]]] = None,
+    test_case: Optional[Tuple[Any, Any]] = None
+) -> Tuple[str, List[Any], int]:
+    """
+    Run a program through the emulator via bidirectional stdio.
+
+    Args:
+        model: Game model to use
+        program_cmd: Command to run the program, or an in-process agent factory
+        test_name: Name of the test case
+        max_turns: Maximum number of turns before timeout
+        verbose: Print debug output
+        turn_timeout_ms: Timeout per turn in milliseconds (default 150ms); bulk_output
+            models use BULK_TIMEOUT_MS for the whole answer instead
+        debug: If True, continuously print stderr from the program
+        instrument: Phase timer, e.g. a profiling.TurnProfiler
+        stderr_tail: Filled with the program's last stderr lines ({0: lines})
+        test_case: (env, initial_state) of test_name if the caller already loaded
+            it (e.g. to score the result), instead of loading it again
+
+    Returns: (result_status, trajectory, turns_used)
+    """
+    env, initial_state = test_case or model.load_test_case(test_name)
+    with _phase(instrument, "init"):
+        agent = start_agent(program_cmd, 0, debug)
+
+    try:
+        # Send initialization input
+        with _phase(instrument, "init"):
+            agent.start(model.format_init_input(env), env)
+
+        if model.bulk_output:
+            return run_bulk(model, agent, env, initial_state, verbose, BULK_TIMEOUT_MS, instrument)
+        return run_turns(model, agent, env, initial_state, max_turns, verbose, turn_timeout_ms, instrument)
 
     finally:
-        try:
-            proc.stdin.close()
-        except OSError:
-            pass
-        proc.terminate()
-        try:
-            proc.wait(timeout=1)
-        except subprocess.TimeoutExpired:
-            proc.kill()
+        agent.close()
+        collect_stderr([agent], stderr_tail)
 
 
 def run_program_multi(
     model: GameModel,
-    program_cmds: List[List[str]],
+    program_cmds: List[Program],
     test_name: str,
     max_turns: int = 100,
     verbose: bool = False,
     turn_timeout_ms: int = 150,
-    debug: bool = False
+    debug: bool = False,
+    instrument: Any = None,
+    stderr_tail: Optional[Dict[int, List[str]]] = None
 ) -> Tuple[str, List[Any], int]:
     """
     Run multiple programs (one per player) in a multi-agent game.
 
     Args:
         model: Game model to use
-        program_cmds: List of commands for each player. If fewer than num_players,
-                      last command is reused for remaining players.
+        program_cmds: List of commands (or in-process agent factories) for each
+                      player. If fewer than num_players, last one is reused for
+                      remaining players.
         test_name: Name of the test case
         max_turns: Maximum number of turns
         verbose: Print debug output
         turn_timeout_ms: Timeout per turn in milliseconds
         debug: Print stderr from programs
+        instrument: Phase timer, e.g. a profiling.TurnProfiler
+        stderr_tail: Filled with each player's last stderr lines, by player id
 
     Returns: (result_status, trajectory, turns_used)
     """
@@ -186,40 +672,20 @@ def run_program_multi(
     while len(program_cmds) < num_players:
         program_cmds.append(program_cmds[-1])
 
-    # Start one process per player
-    procs = []
-    for pid in range(num_players):
-        proc = subprocess.Popen(
-            program_cmds[pid],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        procs.append(proc)
-
-        # Start stderr reader thread
-        def make_stderr_reader(p, player_id):
-            def reader():
+    # Start one agent per player
+    agents = []
+    try:
+        with _phase(instrument, "init"):
+            for pid in range(num_players):
                 try:
-                    for line in p.stderr:
-                        if debug:
-                            print(f"[P{player_id}] {line}", end='', file=sys.stderr)
-                except:
-                    pass
-            return reader
-
-        t = threading.Thread(target=make_stderr_reader(proc, pid), daemon=True)
-        t.start()
+                    agents.append(start_agent(program_cmds[pid], pid, debug, f"P{pid}"))
+                except OSError as e:  # Missing or not executable: that player forfeits
+                    return f'error: P{pid} failed to start: {e}', [initial_state], 0
 
-    try:
-        # Send initialization input to all players
-        init_lines = model.format_init_input(env)
-        for proc in procs:
-            for line in init_lines:
-                proc.stdin.write(line + "\n")
-            proc.stdin.flush()
+            # Send initialization input to all players
+            init_lines = model.format_init_input(env)
+            for agent in agents:
+                agent.start(init_lines, env)
 
         state = initial_state
         trajectory = [state]
@@ -228,19 +694,25 @@ def run_program_multi(
             controls = []
 
             # Get command from each player
-            for pid, proc in enumerate(procs):
+            for pid, agent in enumerate(agents):
                 # Send turn input (with player perspective)
-                turn_input = model.format_turn_input(state, player_id=pid)
-                if turn_input:
-                    try:
-                        proc.stdin.write(turn_input + "\n")
-                        proc.stdin.flush()
-                    except OSError:
-                        controls.append(None)
-                        continue
+                with _phase(instrument, "format"):
+                    turn_input = model.format_turn_input(state, player_id=pid)
+                try:
+                    with _phase(instrument, "write"):
+                        agent.send_turn(turn_input, state)
+                except OSError:
+                    controls.append(None)
+                    continue
 
                 # Get output
-                control_line = readline_with_timeout(proc.stdout, turn_timeout_ms)
+                try:
+                    with _phase(instrument, "wait"):
+                        control_line = agent.readline(turn_timeout_ms)
+                except InvalidOutput as e:
+                    print(f"P{pid} Invalid output: {e}", file=sys.stderr)
+                    controls.append(None)
+                    continue
 
                 if control_line is None:
                     return f'timeout: P{pid} turn {turn} exceeded {turn_timeout_ms}ms', trajectory, turn
@@ -251,7 +723,8 @@ def run_program_multi(
                     continue
 
                 try:
-                    control = model.parse_output(control_line)
+                    with _phase(instrument, "parse"):
+                        control = model.parse_output(control_line)
                     control.player_id = pid
                     controls.append(control)
 
@@ -262,8 +735,10 @@ def run_program_multi(
                     controls.append(None)
 
             # Simulate all controls
-            state, result = model.simulate(state, controls, env)
+            with _phase(instrument, "simulate"):
+                state, result = model.simulate(state, controls, env)
             trajectory.append(state)
+            _end_turn(instrument)
 
             if verbose:
                 print(f"  -> {model.format_result(state)}")
@@ -276,24 +751,19 @@ def run_program_multi(
         return 'max_turns_exceeded', trajectory, max_turns
 
     finally:
-        for proc in procs:
-            try:
-                proc.stdin.close()
-            except OSError:
-                pass
-            proc.terminate()
-            try:
-                proc.wait(timeout=1)
-            except subprocess.TimeoutExpired:
-                proc.kill()
+        for agent in agents:
+            agent.close()
+        collect_stderr(agents, stderr_tail)
 
 
 def run_replay(
     model: GameModel,
     test_name: str,
     trace: dict,
-    verbose: bool = False
-) -> Tuple[List[Tuple[int, List[str]]], List[Any], int]:
+    verbose: bool = False,
+    stop_at_first: bool = False,
+    instrument: Any = None
+) -> Tuple[List[Tuple[int, List[FieldDiff]]], List[Any], int]:
     """
     Replay a trace and compare emulator results with expected CG states.
 
@@ -307,9 +777,11 @@ def run_replay(
         test_name: Name of the test case
         trace: Trace data with cg_trace list
         verbose: Print debug output
+        stop_at_first: Stop at the first turn with a mismatch
+        instrument: Phase timer, e.g. a profiling.TurnProfiler
 
     Returns: (mismatches, trajectory, turns)
-        mismatches: List of (turn, [mismatch_descriptions])
+        mismatches: List of (turn, [FieldDiff])
     """
     env, state = model.load_test_case(test_name)
     cg_trace = trace.get("cg_trace", [])
@@ -325,17 +797,21 @@ def run_replay(
         # If there's a command, simulate first, then compare
         if cmd is not None:
             try:
-                control = model.parse_output(cmd)
-                state, result = model.simulate(state, control, env)
+                with _phase(instrument, "parse"):
+                    control = model.parse_output(cmd)
+                with _phase(instrument, "simulate"):
+                    state, result = model.simulate(state, control, env)
                 trajectory.append(state)
 
                 if result.status in ('success', 'failure'):
                     # Check final state before breaking
-                    diffs = model.compare_state(state, entry)
+                    with _phase(instrument, "compare"):
+                        diffs = model.diff_state(state, entry)
+                    _end_turn(instrument)
                     if diffs:
                         mismatches.append((turn, diffs))
                         if verbose:
-                            print(f"T{turn}: MISMATCH - {diffs}")
+                            print(f"T{turn}: MISMATCH - {'; '.join(map(str, diffs))}")
                     elif verbose:
                         print(f"T{turn}: {cmd} -> OK (game ended: {result.status})")
                     break
@@ -345,11 +821,15 @@ def run_replay(
                 break
 
         # Compare current state with expected
-        diffs = model.compare_state(state, entry)
+        with _phase(instrument, "compare"):
+            diffs = model.diff_state(state, entry)
+        _end_turn(instrument)
         if diffs:
             mismatches.append((turn, diffs))
             if verbose:
-                print(f"T{turn}: MISMATCH - {diffs}")
+                print(f"T{turn}: MISMATCH - {'; '.join(map(str, diffs))}")
+            if stop_at_first:
+                break
         elif verbose:
             if cmd:
                 print(f"T{turn}: {cmd} -> OK")
@@ -363,8 +843,10 @@ def run_replay_multi(
     model: GameModel,
     test_name: str,
     trace: dict,
-    verbose: bool = False
-) -> Tuple[List[Tuple[int, List[str]]], List[Any], int]:
+    verbose: bool = False,
+    stop_at_first: bool = False,
+    instrument: Any = None
+) -> Tuple[List[Tuple[int, List[FieldDiff]]], List[Any], int]:
     """
     Replay a multi-agent trace and compare emulator results with expected CG states.
 
@@ -380,9 +862,11 @@ def run_replay_multi(
         test_name: Name of the test case
         trace: Trace data with cg_trace list
         verbose: Print debug output
+        stop_at_first: Stop at the first turn with a mismatch
+        instrument: Phase timer, e.g. a profiling.TurnProfiler
 
     Returns: (mismatches, trajectory, turns)
-        mismatches: List of (turn, [mismatch_descriptions])
+        mismatches: List of (turn, [FieldDiff])
     """
     env, state = model.load_test_case(test_name)
     cg_trace = trace.get("cg_trace", [])
@@ -397,11 +881,15 @@ def run_replay_multi(
         commands = entry.get("commands", [])
         if not commands or all(c is None for c in commands):
             # No commands = initial state or no action
-            diffs = model.compare_state(state, entry)
+            with _phase(instrument, "compare"):
+                diffs = model.diff_state(state, entry)
+            _end_turn(instrument)
             if diffs:
                 mismatches.append((turn, diffs))
                 if verbose:
-                    print(f"T{turn}: MISMATCH - {diffs}")
+                    print(f"T{turn}: MISMATCH - {'; '.join(map(str, diffs))}")
+                if stop_at_first:
+                    break
             elif verbose:
                 print(f"T{turn}: (initial) -> OK")
             continue
@@ -411,7 +899,8 @@ def run_replay_multi(
         for pid in order:
             if pid < len(commands) and commands[pid] is not None:
                 try:
-                    ctrl = model.parse_output(commands[pid])
+                    with _phase(instrument, "parse"):
+                        ctrl = model.parse_output(commands[pid])
                     ctrl.player_id = pid
                     controls.append(ctrl)
                 except (ValueError, IndexError) as e:
@@ -423,7 +912,8 @@ def run_replay_multi(
 
         # Simulate
         try:
-            state, result = model.simulate(state, controls, env)
+            with _phase(instrument, "simulate"):
+                state, result = model.simulate(state, controls, env)
             trajectory.append(state)
         except Exception as e:
             if verbose:
@@ -431,12 +921,16 @@ def run_replay_multi(
             break
 
         # Compare state
-        diffs = model.compare_state(state, entry)
+        with _phase(instrument, "compare"):
+            diffs = model.diff_state(state, entry)
+        _end_turn(instrument)
         if diffs:
             mismatches.append((turn, diffs))
             if verbose:
                 cmd_str = ", ".join(str(c) if c else "None" for c in commands)
-                print(f"T{turn}: MISMATCH - {diffs}")
+                print(f"T{turn}: MISMATCH - {'; '.join(map(str, diffs))}")
+            if stop_at_first:
+                break
         elif verbose:
             cmd_str = ", ".join(str(c) if c else "None" for c in commands)
             print(f"T{turn}: [{cmd_str}] -> OK")
@@ -447,3 +941,19 @@ def run_replay_multi(
             break
 
     return mismatches, trajectory, len(cg_trace)
+
+
+def replay_trace(
+    model: GameModel,
+    test_name: str,
+    trace: dict,
+    verbose: bool = False,
+    stop_at_first: bool = False,
+    instrument: Any = None
+) -> Tuple[List[Tuple[int, List[FieldDiff]]], List[Any], int]:
+    """Replay a trace with run_replay or run_replay_multi, depending on its format."""
+    cg_trace = trace.get("cg_trace")
+    # Multi-agent traces have a "commands" field
+    if cg_trace and "commands" in cg_trace[0]:
+        return run_replay_multi(model, test_name, trace, verbose, stop_at_first, instrument)
+    return run_replay(model, test_name, trace, verbose, stop_at_first, instrument)
@@ -0,0 +1,196 @@
+"""Bomb-position sweeps for Shadows of the Knight.
+
+Runs one agent against every (or a stratified sample of) bomb position of a
+building, with test cases synthesized on the fly, and summarizes jumps used
+and failures as a text heatmap.
+"""
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import models
+import runner
+
+SWEEP_MODELS = ("shadows_of_the_knight_1", "shadows_of_the_knight_2")
+
+# Heatmap shades from few to many jumps; failures are drawn as 'X'
+HEATMAP_SHADES = " .:-=+*#%@"
+
+# One model instance per worker process, reused across positions
+_worker_models: Dict[str, models.GameModel] = {}
+
+
+def default_max_jumps(width: int, height: int) -> int:
+    """Jump budget of a plain binary search over the building, plus one."""
+    return math.ceil(math.log2(max(2, width * height))) + 1
+
+
+def sweep_positions(
+    width: int,
+    height: int,
+    start: Tuple[int, int],
+    sample: Optional[int] = None,
+    seed: int = 0
+) -> List[Tuple[int, int]]:
+    """
+    Bomb positions to test, excluding the start cell.
+
+    Returns every cell, or with ``sample`` a stratified sample: the building
+    is cut into about ``sample`` equal tiles and one random cell is picked in
+    each, so the whole area is covered evenly.
+    """
+    total = width * height
+    if sample is None or sample >= total - 1:
+        return [(x, y) for y in range(height) for x in range(width) if (x, y) != start]
+
+    rng = random.Random(seed)
+    tiles_x = max(1, min(width, round(math.sqrt(sample * width / height))))
+    tiles_y = max(1, min(height, math.ceil(sample / tiles_x)))
+    positions = []
+    for ty in range(tiles_y):
+        y0, y1 = ty * height // tiles_y, (ty + 1) * height // tiles_y
+        for tx in range(tiles_x):
+            x0, x1 = tx * width // tiles_x, (tx + 1) * width // tiles_x
+            if x1 <= x0 or y1 <= y0:
+                continue
+            pos = (rng.randrange(x0, x1), rng.randrange(y0, y1))
+            if pos == start:
+                continue
+            positions.append(pos)
+    return positions
+
+
+def run_position(job: tuple) -> Tuple[int, int, str, int]:
+    """Run one game in a worker. Returns (bomb_x, bomb_y, result, turns)."""
+    model_name, program_cmd, width, height, max_jumps, start, bomb, turn_timeout_ms = job
+
+    model = _worker_models.get(model_name)
+    if model is None:
+        model = models.get_model(model_name)
+        # Candidate tracking is not needed for a sweep
+        model.track_candidates = False
+        _worker_models[model_name] = model
+
+    # One name for every game, so the worker's model holds a single sweep case
+    test_name = "sweep"
+    model.add_test_case(test_name, {
+        "name": f"Sweep bomb at ({bomb[0]}, {bomb[1]})",
+        "width": width,
+        "height": height,
+        "max_jumps": max_jumps,
+        "start_x": start[0],
+        "start_y": start[1],
+        "bomb_x": bomb[0],
+        "bomb_y": bomb[1],
+    })
+    try:
+        result, _, turns = runner.run_program(
+            model, program_cmd, test_name, max_turns=max_jumps + 1, turn_timeout_ms=turn_timeout_ms
+        )
+    except (ValueError, OSError) as e:  # Bad sweep parameters, or the agent could not be started
+        return bomb[0], bomb[1], f"failure: {e}", 0
+    return bomb[0], bomb[1], result, turns
+
+
+def run_sweep(
+    model_name: str,
+    program_cmd: List[str],
+    width: int,
+    height: int,
+    max_jumps: int,
+    start: Tuple[int, int],
+    positions: List[Tuple[int, int]],
+    workers: Optional[int] = None,
+    turn_timeout_ms: int = 150,
+    progress: bool = False
+) -> List[Tuple[int, int, str, int]]:
+    """
+    Run the agent against each bomb position in parallel worker processes.
+
+    Returns a list of (bomb_x, bomb_y, result, turns).
+    """
+    jobs = [(model_name, program_cmd, width, height, max_jumps, start, pos, turn_timeout_ms)
+            for pos in positions]
+    workers = workers or os.cpu_count() or 1
+    results = []
+
+    if workers == 1:
+        outcomes = map(run_position, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=runner.configure,
+                                       initargs=runner.worker_config())
+        chunksize = max(1, len(jobs) // (workers * 8))
+        outcomes = executor.map(run_position, jobs, chunksize=chunksize)
+
+    try:
+        for i, outcome in enumerate(outcomes, 1):
+            results.append(outcome)
+            if progress and (i % 100 == 0 or i == len(jobs)):
+                print(f"  {i}/{len(jobs)} positions", end='\r', flush=True)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if progress:
+        print()
+    return results
+
+
+def format_heatmap(
+    results: List[Tuple[int, int, str, int]],
+    width: int,
+    height: int,
+    max_jumps: int,
+    max_cols: int = 64,
+    max_rows: int = 32
+) -> List[str]:
+    """
+    Render results as a text heatmap of the building.
+
+    Each character covers a block of cells and shades the worst jump count
+    among the tested positions in it ('X' if any failed, blank if untested).
+    """
+    cols = min(width, max_cols)
+    rows = min(height, max_rows)
+    worst: List[List[Optional[int]]] = [[None] * cols for _ in range(rows)]
+
+    for bx, by, result, turns in results:
+        c = bx * cols // width
+        r = by * rows // height
+        jumps = turns if result == 'success' else -1
+        current = worst[r][c]
+        if current is None or (current != -1 and (jumps == -1 or jumps > current)):
+            worst[r][c] = jumps
+
+    lines = []
+    for row in worst:
+        chars = []
+        for jumps in row:
+            if jumps is None:
+                chars.append(' ')
+            elif jumps == -1:
+                chars.append('X')
+            else:
+                shade = min(len(HEATMAP_SHADES) - 1, jumps * len(HEATMAP_SHADES) // (max_jumps + 1))
+                chars.append(HEATMAP_SHADES[max(1, shade)])
+        lines.append('|' + ''.join(chars) + '|')
+    return lines
+
+
+def summarize(results: List[Tuple[int, int, str, int]]) -> dict:
+    """Aggregate counts and jump statistics."""
+    jumps = sorted(turns for _, _, result, turns in results if result == 'success')
+    failures = [(bx, by, result) for bx, by, result, _ in results if result != 'success']
+    summary = {
+        "positions": len(results),
+        "successes": len(jumps),
+        "failures": len(failures),
+        "first_failures": failures[:10],
+    }
+    if jumps:
+        summary["mean_jumps"] = sum(jumps) / len(jumps)
+        summary["median_jumps"] = jumps[len(jumps) // 2]
+        summary["max_jumps"] = jumps[-1]
+    return summary
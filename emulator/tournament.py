@@ -0,0 +1,224 @@
+"""Round-robin tournaments for two-player games (Cellularena).
+
+Every pair of bots plays every test case in both seat orders. Games run in
+parallel worker processes and each finished game is appended to a JSON
+Lines state file, so an interrupted tournament resumes where it stopped. Results are
+summarized as a win/loss/draw table, a head-to-head matrix and Elo ratings.
+"""
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import models
+import runner
+
+TOURNAMENT_MODELS = ("cellularena",)
+
+ELO_START = 1500.0
+ELO_K = 16.0
+ELO_PASSES = 20  # Passes over all games; makes ratings independent of game order
+
+# Runner statuses that blame one player, e.g. 'timeout: P1 turn 3 exceeded 150ms'
+PLAYER_FAULT = re.compile(r"^\w+: P(\d+)\b")
+
+# One model instance per worker process, reused across games
+_worker_models: Dict[str, models.GameModel] = {}
+
+
+def game_id(bot_a: str, bot_b: str, test_name: str) -> str:
+    return f"{bot_a} | {bot_b} | {test_name}"
+
+
+def schedule(bots: List[str], test_names: List[str]) -> List[Tuple[str, str, str]]:
+    """All (seat 0 bot, seat 1 bot, test case) games of a double round robin."""
+    games = []
+    for i, bot_a in enumerate(bots):
+        for bot_b in bots[i + 1:]:
+            for test_name in test_names:
+                games.append((bot_a, bot_b, test_name))
+                games.append((bot_b, bot_a, test_name))
+    return games
+
+
+def run_game(job: tuple) -> dict:
+    """Play one game in a worker. Returns the game record logged to the state file."""
+    model_name, seats, programs, test_name, max_turns, turn_timeout_ms = job
+
+    model = _worker_models.get(model_name)
+    if model is None:
+        model = _worker_models[model_name] = models.get_model(model_name)
+
+    try:
+        status, trajectory, turns = runner.run_program_multi(
+            model, list(programs), test_name, max_turns=max_turns, turn_timeout_ms=turn_timeout_ms
+        )
+    except (ValueError, OSError) as e:  # Unknown test case, or the game could not be set up
+        return {"bots": list(seats), "test": test_name, "status": f"error: {e}", "turns": 0,
+                "scores": [0] * len(seats), "points": [1.0 / len(seats)] * len(seats)}
+    scores = model.get_scores(trajectory[-1]) or [0] * len(seats)
+
+    fault = PLAYER_FAULT.match(status)
+    if fault and int(fault.group(1)) < len(seats):
+        loser = int(fault.group(1))
+        points = [0.0 if seat == loser else 1.0 for seat in range(len(seats))]
+    else:
+        winner = model.get_winner(trajectory[-1])
+        if winner is None:
+            points = [1.0 / len(seats)] * len(seats)
+        else:
+            points = [1.0 if seat == winner else 0.0 for seat in range(len(seats))]
+
+    return {
+        "bots": list(seats),
+        "test": test_name,
+        "status": status,
+        "turns": turns,
+        "scores": scores,
+        "points": points,
+    }
+
+
+def load_state(path: Optional[str]) -> dict:
+    """Rebuild the tournament state from the saved game log, or an empty state."""
+    games = {}
+    if path and os.path.exists(path):
+        with open(path, 'r+', encoding='utf-8') as f:
+            complete = 0
+            for line in iter(f.readline, ''):
+                if not line.endswith("\n"):
+                    f.truncate(complete)  # Cut short by an interruption: drop it before appending
+                    break
+                complete = f.tell()
+                game = json.loads(line)
+                games[game_id(game["bots"][0], game["bots"][1], game["test"])] = game
+    return {"games": games}
+
+
+def save_game(path: Optional[str], game: dict) -> None:
+    """Append one finished game to the log (one JSON object per line)."""
+    if not path:
+        return
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(game) + "\n")
+
+
+def run_tournament(
+    model_name: str,
+    programs: Dict[str, runner.Program],
+    test_names: List[str],
+    state_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    max_turns: int = 100,
+    turn_timeout_ms: int = 150,
+    progress: bool = False
+) -> dict:
+    """
+    Play all games not yet in the state file and return the updated state.
+
+    Args:
+        programs: {bot name: command or agent factory}
+        state_path: JSON Lines log of finished games; read on start and
+                    appended to after every game
+    """
+    state = load_state(state_path)
+    games = state["games"]
+    pending = [(a, b, t) for a, b, t in schedule(list(programs), test_names)
+               if game_id(a, b, t) not in games]
+    jobs = [(model_name, (a, b), (programs[a], programs[b]), t, max_turns, turn_timeout_ms)
+            for a, b, t in pending]
+    workers = workers or os.cpu_count() or 1
+
+    def record(result: dict, done: int):
+        games[game_id(result["bots"][0], result["bots"][1], result["test"])] = result
+        save_game(state_path, result)
+        if progress:
+            print(f"  {done}/{len(jobs)} games", end='\r', flush=True)
+
+    if workers == 1:
+        for done, job in enumerate(jobs, 1):
+            record(run_game(job), done)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=runner.configure,
+                                 initargs=runner.worker_config()) as executor:
+            futures = [executor.submit(run_game, job) for job in jobs]
+            for done, future in enumerate(as_completed(futures), 1):
+                record(future.result(), done)
+    if progress and jobs:
+        print()
+    return state
+
+
+def standings(state: dict, bots: List[str]) -> Dict[str, dict]:
+    """Per-bot wins, losses, draws and points over the saved games."""
+    table = {bot: {"games": 0, "wins": 0, "losses": 0, "draws": 0, "points": 0.0} for bot in bots}
+    for game in state["games"].values():
+        for bot, points in zip(game["bots"], game["points"]):
+            if bot not in table:
+                continue
+            row = table[bot]
+            row["games"] += 1
+            row["points"] += points
+            if points == 1.0:
+                row["wins"] += 1
+            elif points == 0.0:
+                row["losses"] += 1
+            else:
+                row["draws"] += 1
+    return table
+
+
+def head_to_head(state: dict, bots: List[str]) -> Dict[Tuple[str, str], float]:
+    """{(bot, opponent): points scored by bot against opponent}."""
+    matrix = {}
+    for game in state["games"].values():
+        (a, b), (pa, pb) = game["bots"], game["points"]
+        if a in bots and b in bots:
+            matrix[(a, b)] = matrix.get((a, b), 0.0) + pa
+            matrix[(b, a)] = matrix.get((b, a), 0.0) + pb
+    return matrix
+
+
+def elo_ratings(state: dict, bots: List[str]) -> Dict[str, float]:
+    """Elo ratings fitted over all games.
+
+    Sequential Elo depends on game order; replaying the games in a fixed
+    order over several passes with a shrinking K converges close to the
+    order-independent maximum likelihood ratings.
+    """
+    ratings = {bot: ELO_START for bot in bots}
+    games = [state["games"][key] for key in sorted(state["games"])]
+    games = [g for g in games if all(bot in ratings for bot in g["bots"])]
+    for n in range(ELO_PASSES):
+        k = ELO_K / (1 + n)
+        for game in games:
+            a, b = game["bots"]
+            expected_a = 1.0 / (1.0 + 10 ** ((ratings[b] - ratings[a]) / 400.0))
+            delta = k * (game["points"][0] - expected_a)
+            ratings[a] += delta
+            ratings[b] -= delta
+    return ratings
+
+
+def format_standings(state: dict, bots: List[str]) -> List[str]:
+    """Table sorted by Elo, followed by the head-to-head points matrix."""
+    table = standings(state, bots)
+    ratings = elo_ratings(state, bots)
+    order = sorted(bots, key=lambda bot: -ratings[bot])
+    width = max(len(bot) for bot in bots)
+
+    lines = [f"{'#':>2}  {'bot':<{width}}  {'Elo':>6}  {'games':>5}  {'W':>4}  {'L':>4}  {'D':>4}  {'points':>6}"]
+    for rank, bot in enumerate(order, 1):
+        row = table[bot]
+        lines.append(f"{rank:>2}  {bot:<{width}}  {ratings[bot]:6.0f}  {row['games']:5}  {row['wins']:4}  "
+                     f"{row['losses']:4}  {row['draws']:4}  {row['points']:6.1f}")
+
+    matrix = head_to_head(state, bots)
+    lines.append("")
+    lines.append("Head to head (points of row bot against column bot):")
+    lines.append(f"{'':>{width}}  " + "  ".join(f"{i:>5}" for i in range(1, len(order) + 1)))
+    for rank, bot in enumerate(order, 1):
+        cells = ["    -" if bot == other else f"{matrix.get((bot, other), 0.0):5.1f}" for other in order]
+        lines.append(f"{bot:>{width}}  " + "  ".join(cells) + f"  ({rank})")
+    return lines
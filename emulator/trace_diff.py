@@ -0,0 +1,137 @@
+"""Structured trace diffs and parallel bisection of trace divergences.
+
+diff_traces replays traces and records, per mismatching turn, every field
+whose value differs from the CG trace with both typed values, ready to be
+dumped as JSON.
+
+bisect_commits finds the commit that broke a set of traces. Each probed
+commit is extracted with ``git archive`` into a temporary directory, gets
+the current trace files copied in (so traces added after the commit are
+checked too) and runs ``emulator.py --test-traces`` there. Every round
+probes up to ``workers`` evenly spaced commits in parallel, so the range
+shrinks by a factor of workers + 1 per round instead of 2.
+"""
+import io
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import models
+import runner
+from models.base import FieldDiff
+
+EMULATOR_DIR = Path(__file__).parent
+
+# Per commit limit for --test-traces, generous for a cold checkout
+CHECK_TIMEOUT = 600
+
+
+def diff_to_json(turn: int, diffs: List[FieldDiff]) -> dict:
+    return {
+        "turn": turn,
+        "diffs": [{"field": d.field, "actual": d.actual, "expected": d.expected} for d in diffs],
+    }
+
+
+def diff_traces(model: models.GameModel, trace_names: List[str], stop_at_first: bool = False) -> Dict[str, List[dict]]:
+    """{trace name: [{"turn", "diffs": [{"field", "actual", "expected"}]}]}, empty lists for matching traces."""
+    report = {}
+    for trace_name in trace_names:
+        trace = model.load_trace(trace_name)
+        if not trace:
+            raise ValueError(f"Trace '{trace_name}' not found for model {model.name}")
+        mismatches, _, _ = runner.replay_trace(model, trace_name, trace, stop_at_first=stop_at_first)
+        report[trace_name] = [diff_to_json(turn, diffs) for turn, diffs in mismatches]
+    return report
+
+
+def git(*args: str) -> str:
+    result = subprocess.run(["git", *args], cwd=EMULATOR_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ValueError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout.strip()
+
+
+def list_commits(good: str, bad: str) -> List[str]:
+    """First-parent commits after good up to and including bad, oldest first."""
+    return git("rev-list", "--first-parent", "--reverse", f"{good}..{bad}").split()
+
+
+def check_commit(commit: str, model_name: str, trace_names: List[str]) -> bool:
+    """True if the traces replay without mismatches at commit."""
+    top = Path(git("rev-parse", "--show-toplevel"))
+    prefix = git("rev-parse", "--show-prefix")  # emulator dir within the repo, e.g. "emulator/"
+    archive = subprocess.run(["git", "archive", "--format=tar", commit, prefix or "."],
+                             cwd=top, capture_output=True, check=True).stdout
+
+    model = models.get_model(model_name)
+    traces_dir = model.get_traces_dir()
+    tmp = tempfile.mkdtemp(prefix="bisect-")
+    try:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(tmp)
+        tree = Path(tmp) / prefix
+        dest = tree / traces_dir.relative_to(EMULATOR_DIR)
+        shutil.rmtree(dest, ignore_errors=True)
+        dest.mkdir(parents=True)
+        for trace_name in trace_names:
+            shutil.copy(traces_dir / f"{trace_name}.json", dest)
+        result = subprocess.run([sys.executable, "emulator.py", "-m", model_name, "--test-traces"],
+                                cwd=tree, capture_output=True, timeout=CHECK_TIMEOUT)
+        return result.returncode == 0
+    except subprocess.TimeoutExpired:
+        return False
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bisect_commits(
+    model_name: str,
+    trace_names: List[str],
+    good: str,
+    bad: str = "HEAD",
+    workers: int = 4,
+    progress: bool = False
+) -> Tuple[Optional[str], Dict[str, bool]]:
+    """
+    Find the first commit between good and bad where the traces stop matching.
+
+    Returns (first bad commit or None if bad still passes, {commit: passed}
+    for every probed commit).
+    """
+    commits = list_commits(good, bad)
+    if not commits:
+        raise ValueError(f"No commits between {good} and {bad}")
+    checked: Dict[str, bool] = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def probe(indices: List[int]) -> None:
+            outcomes = executor.map(lambda i: check_commit(commits[i], model_name, trace_names), indices)
+            for i, passed in zip(indices, outcomes):
+                checked[commits[i]] = passed
+                if progress:
+                    print(f"  {commits[i][:10]}: {'good' if passed else 'bad'}")
+
+        probe([len(commits) - 1])
+        if checked[commits[-1]]:
+            return None, checked
+
+        # The first bad commit is in commits[lo..hi]; commits[hi] is bad
+        lo, hi = 0, len(commits) - 1
+        while lo < hi:
+            span = hi - lo
+            count = min(workers, span)
+            indices = sorted({lo + span * (n + 1) // (count + 1) for n in range(count)})
+            probe(indices)
+            for i in indices:
+                if checked[commits[i]]:
+                    lo = i + 1
+                else:
+                    hi = i
+                    break
+    return commits[hi], checked